@@ -0,0 +1,126 @@
+"""
+Alert Pipeline
+Queue-connected stages behind the fetch workers: each scored symbol is
+evaluated against the per-symbol alert rules, and its alerts are sent, as
+soon as its own response is in instead of after the slowest symbol of the
+cycle.
+"""
+
+import queue
+import threading
+from collections import deque
+
+from tail_latency import percentile
+
+
+class StagedPipeline:
+    """
+    A chain of stages, each a queue served by its own daemon threads.
+
+    stages is a list of (name, handler, workers). handler(item) returns an
+    iterable of items for the next stage (None or empty for none); what the
+    last stage returns is dropped. A handler exception is passed to
+    on_error(stage_name, item, exc) and the item is dropped.
+    """
+
+    def __init__(self, stages, on_error=None):
+        self.on_error = on_error
+        self._stages = [(name, handler, workers, queue.Queue()) for name, handler, workers in stages]
+        self._index = {name: index for index, (name, _, _, _) in enumerate(self._stages)}
+        self._pending = 0                  # items queued or being handled, all stages
+        self._idle = threading.Condition()
+        self._threads = []
+        self._processed = {name: 0 for name, _, _, _ in self._stages}
+
+    @property
+    def running(self):
+        return bool(self._threads)
+
+    def start(self):
+        if self._threads:
+            return
+        for index, (name, _, workers, _) in enumerate(self._stages):
+            for i in range(workers):
+                thread = threading.Thread(target=self._serve, args=(index,), name=f"{name}-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _put(self, index, item):
+        with self._idle:
+            self._pending += 1
+        self._stages[index][3].put(item)
+
+    def submit(self, item, stage=None):
+        """Queue an item for the first stage, or the named one (starting the threads on first use)."""
+        if not self._threads:
+            self.start()
+        self._put(0 if stage is None else self._index[stage], item)
+
+    def _serve(self, index):
+        name, handler, _, inbox = self._stages[index]
+        last = index == len(self._stages) - 1
+        while True:
+            item = inbox.get()
+            if item is None:
+                return
+            try:
+                outputs = handler(item)
+                if outputs and not last:
+                    for output in outputs:
+                        self._put(index + 1, output)
+            except Exception as e:
+                if self.on_error is not None:
+                    self.on_error(name, item, e)
+            finally:
+                with self._idle:
+                    self._processed[name] += 1
+                    self._pending -= 1
+                    if self._pending == 0:
+                        self._idle.notify_all()
+
+    def drain(self, timeout=None):
+        """Wait until every queued item went through all stages; False if `timeout` passed first."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def queue_depths(self):
+        return {name: inbox.qsize() for name, _, _, inbox in self._stages}
+
+    def processed(self):
+        with self._idle:
+            return dict(self._processed)
+
+    def shutdown(self):
+        """Stop the stage threads once their queues are empty (items still queued are handled first)."""
+        for _, _, workers, inbox in self._stages:
+            for _ in range(workers):
+                inbox.put(None)
+        self._threads = []
+
+
+class AlertLatency:
+    """Seconds from depth response to alert decision and to alert delivery, over a rolling window."""
+
+    def __init__(self, window=500):
+        self._lock = threading.Lock()
+        self._decided = deque(maxlen=window)
+        self._delivered = deque(maxlen=window)
+
+    def record(self, kind, seconds):
+        """kind is 'decided' (every evaluated symbol) or 'delivered' (every alert sent)."""
+        with self._lock:
+            (self._decided if kind == "decided" else self._delivered).append(seconds)
+
+    def take_stats(self):
+        """
+        Percentiles of the samples since the previous call.
+
+        Returns:
+            dict: {'decided': (count, p50, max), 'delivered': (count, p50, max)}, None when empty
+        """
+        with self._lock:
+            samples = {'decided': sorted(self._decided), 'delivered': sorted(self._delivered)}
+            self._decided.clear()
+            self._delivered.clear()
+        return {kind: (len(values), percentile(values, 0.5), values[-1]) if values else None
+                for kind, values in samples.items()}
@@ -0,0 +1,129 @@
+"""
+Asyncio Fetch Engine
+Issues a whole cycle of market-depth requests from one event loop with bounded concurrency.
+"""
+
+import asyncio
+import threading
+
+import http_session
+
+try:
+    import aiohttp
+    AIOHTTP_ENABLED = True
+except ImportError:
+    aiohttp = None
+    AIOHTTP_ENABLED = False
+
+
+class AsyncFetchEngine:
+    """
+    Long-lived event loop running on a background thread.
+
+    Jobs from every cycle share one loop, one semaphore and (with aiohttp)
+    one keep-alive connector, so thousands of symbols cost coroutines
+    rather than OS threads. Without aiohttp, and for hosts that
+    http_session serves over HTTP/2, the blocking pooled session is used
+    through an executor capped at the same number of in-flight slots.
+
+    Hedged duplicates get `hedge_slots` extra in-flight slots of their own,
+    so they are not stuck behind the primaries they are meant to overtake.
+    """
+
+    def __init__(self, max_concurrency=64, hedge_slots=None):
+        self.max_concurrency = max_concurrency
+        self.hedge_slots = hedge_slots if hedge_slots is not None else max(4, max_concurrency // 8)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="async-fetch-loop", daemon=True)
+        self._thread.start()
+        self._semaphore = None
+        self._hedge_semaphore = None
+        self._session = None
+        self._executor = None
+        self._call(self._setup())
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def _setup(self):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._hedge_semaphore = asyncio.Semaphore(self.hedge_slots)
+        total_slots = self.max_concurrency + self.hedge_slots
+        if AIOHTTP_ENABLED:
+            connector = aiohttp.TCPConnector(limit=total_slots, keepalive_timeout=60)
+            # New connections feed http_session's per-host reuse counters, like the pooled sessions
+            trace = aiohttp.TraceConfig()
+            trace.on_request_start.append(self._on_request_start)
+            trace.on_connection_create_end.append(self._on_connection_created)
+            self._session = aiohttp.ClientSession(connector=connector, trace_configs=[trace])
+        # Threads start on first use, so with aiohttp this only costs anything for HTTP/2 hosts
+        import concurrent.futures
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=total_slots, thread_name_prefix="async-fetch-io")
+
+    @staticmethod
+    async def _on_request_start(session, context, params):
+        context.url = str(params.url)
+
+    @staticmethod
+    async def _on_connection_created(session, context, params):
+        http_session.count_connect(context.url)
+
+    async def get(self, url, headers=None, timeout=5, hedge=False):
+        """Bounded GET returning (status, body bytes, response headers)."""
+        async with (self._hedge_semaphore if hedge else self._semaphore):
+            if self._session is not None and not http_session.uses_http2(url):
+                client_timeout = aiohttp.ClientTimeout(total=timeout)
+                with http_session.track_request(url):
+                    async with self._session.get(url, headers=headers, timeout=client_timeout) as response:
+                        return response.status, await response.read(), response.headers
+
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(
+                self._executor, lambda: http_session.get(url, headers=headers, timeout=timeout))
+            return response.status_code, response.content, response.headers
+
+    def run_batch(self, jobs, job_coro, timeout=None):
+        """
+        Run job_coro(job, engine) for every job and block until all finish
+        or `timeout` seconds pass; unfinished jobs are cancelled.
+
+        Returns:
+            list: (job, exception or None) for each finished job.
+            list: jobs that were still running at the timeout.
+        """
+        async def _guarded(job):
+            try:
+                await job_coro(job, self)
+                return job, None
+            except Exception as e:
+                return job, e
+
+        async def _run():
+            tasks = {asyncio.ensure_future(_guarded(job)): job for job in jobs}
+            if not tasks:
+                return [], []
+            done, pending = await asyncio.wait(tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            return [task.result() for task in done], [tasks[task] for task in pending]
+
+        return self._call(_run())
+
+    def close(self):
+        """Close the connector and stop the loop thread."""
+        async def _teardown():
+            if self._session is not None:
+                await self._session.close()
+        try:
+            self._call(_teardown())
+        finally:
+            self._executor.shutdown(wait=False)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
@@ -0,0 +1,108 @@
+"""
+Batch Scoring
+NumPy version of price_depth.calculate_signal_score that scores every
+symbol of a cycle in one pass over feature arrays. Each registered factor
+(scoring_factors.py) is applied with the same threshold, weight and cap
+arithmetic, in the same order, so scores are bit-for-bit identical to the
+scalar ones.
+"""
+
+import time
+
+from history_store import FIELDS, FIELD_INDEX
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+WINDOW = 4  # longest look-back of any built-in factor (consistency uses the last 4 ratios)
+
+
+def _cap(values, cap):
+    """Python's min(cap, x) elementwise: x only when x < cap (so NaN gives cap, like the scalar code)."""
+    return np.where(values < cap, values, cap)
+
+
+def gather(histories):
+    """
+    Feature arrays for score_arrays() from per-symbol snapshot histories
+    (sequences of snapshot dicts, newest last).
+
+    Returns:
+        dict: 'length' (N,), 'ratios' (N, WINDOW) oldest..newest, NaN-padded on the left,
+              'imbalance', 'prev_mid', 'mid', 'spread_pct', 'levels' (N,)
+    """
+    n = len(histories)
+    length = np.zeros(n, dtype=np.int64)
+    ratios = np.full((n, WINDOW), np.nan)
+    current = np.zeros((n, 5))   # imbalance, prev_mid, mid, spread_pct, levels
+    for i, history in enumerate(histories):
+        size = len(history)
+        length[i] = size
+        if size < 2:
+            continue
+        tail = [history[j] for j in range(max(0, size - WINDOW), size)]
+        ratios[i, WINDOW - len(tail):] = [snap['ratio'] for snap in tail]
+        snap = tail[-1]
+        current[i] = (snap.get('weighted_imbalance', 1), tail[-2].get('mid_price', 0), snap.get('mid_price', 0),
+                      snap.get('spread_pct', 0), snap.get('bid_levels', 0) + snap.get('ask_levels', 0))
+    return {'length': length, 'ratios': ratios, 'imbalance': current[:, 0], 'prev_mid': current[:, 1],
+            'mid': current[:, 2], 'spread_pct': current[:, 3], 'levels': current[:, 4]}
+
+
+def gather_store(store, codes):
+    """
+    gather() for symbols in a history_store.HistoryStore: their newest
+    WINDOW rows are joined into one buffer and viewed as an N x WINDOW x field
+    array, so no snapshot dict is built.
+    """
+    buffer, lengths = store.stack_windows(codes, WINDOW)
+    rows = np.frombuffer(buffer).reshape(len(codes), WINDOW, len(FIELDS))
+    newest = rows[:, -1]
+    return {'length': np.array(lengths, dtype=np.int64), 'ratios': rows[:, :, FIELD_INDEX['ratio']],
+            'imbalance': newest[:, FIELD_INDEX['weighted_imbalance']],
+            'prev_mid': rows[:, -2, FIELD_INDEX['mid_price']], 'mid': newest[:, FIELD_INDEX['mid_price']],
+            'spread_pct': newest[:, FIELD_INDEX['spread_pct']],
+            'levels': newest[:, FIELD_INDEX['bid_levels']] + newest[:, FIELD_INDEX['ask_levels']]}
+
+
+def factor_points(factor, values):
+    """Factor.points() over an array of measured values (NaN scores nothing)."""
+    points = np.where(values > factor.threshold, _cap((values - factor.threshold) * factor.weight, factor.cap), 0.0)
+    return points if factor.sign == 1 else factor.sign * points
+
+
+def score_arrays(features, factors, timings=None):
+    """
+    Composite 0-100 score per row from gather() features, adding each
+    factor's points in factor order as the scalar scorer does (adding 0.0
+    leaves a sum unchanged). Rows with fewer than 2 snapshots score 0.
+    Nanoseconds per factor are appended to `timings` when given.
+    """
+    length = features['length']
+    zero = np.zeros(len(length))
+    score = zero
+    with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+        for factor in factors:
+            started = time.perf_counter_ns()
+            score = score + factor_points(factor, factor.measure_batch(features))
+            if timings is not None:
+                timings.append(time.perf_counter_ns() - started)
+    return np.where((length >= 2) & (score > 0), score, zero)
+
+
+def score_histories(histories, factors):
+    """Scores for a list of snapshot histories, as a list of floats in the same order."""
+    if not histories:
+        return []
+    return score_arrays(gather(histories), factors).tolist()
+
+
+def score_store(store, codes, factors, timings=None):
+    """Scores for `codes` straight from a HistoryStore, as a list of floats in the same order."""
+    if not codes:
+        return []
+    return score_arrays(gather_store(store, codes), factors, timings).tolist()
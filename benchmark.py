@@ -0,0 +1,779 @@
+"""
+Performance Benchmarks
+Local benchmarks for the fetch engines and analysis hot paths.
+Everything runs against an in-process mock_server.py; nothing talks to the real APIs.
+
+Usage:
+    python benchmark.py engines --symbols 66 1000 --latency-ms 40
+    python benchmark.py decode --levels 20 500
+    python benchmark.py reducer --levels 5 20 100 500
+    python benchmark.py hedge --symbols 66 --slow-fraction 0.03 --slow-ms 800
+    python benchmark.py shards --symbols 2000 --workers 1 2 4
+    python benchmark.py http2 --symbols 66 1000
+    python benchmark.py dispatch --symbols 66 --slow 6 --slow-ms 600
+    python benchmark.py tokens --symbols 120 --per-token-rate 20 --tokens 1 3
+    python benchmark.py funnel --universe 1000 --core 66 --cycles 30
+    python benchmark.py alerts --symbols 66 --latency lognormal:60:0.8
+    python benchmark.py scoring --symbols 66 1000 10000
+    python benchmark.py history --sizes 10 100 500
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import signal
+import socket
+import statistics
+import threading
+import time
+import timeit
+
+from book_reducer import reduce_book
+from scoring_factors import Factor
+from mock_server import make_depth_payload, start_mock_server
+from synthetic_data import synthetic_history
+
+# price_depth reads STOCKS.csv and the token file relative to the project folder
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_monitor(rate_limited=False):
+    """
+    Import price_depth with file logging silenced so benchmarks don't touch the log,
+    and set up its connection pools (init() does that for the monitor itself).
+    Unless rate_limited, the shared API limiter is opened wide to measure raw engine speed.
+    """
+    import price_depth
+    from rate_limiter import AdaptiveRateLimiter
+    price_depth.log_notification = lambda msg: None
+    price_depth.init_http()
+    if not rate_limited:
+        price_depth.api_limiter = AdaptiveRateLimiter(initial_rate=1e6, max_rate=1e6, burst=1e6)
+    return price_depth
+
+
+def client_thread_count():
+    """Live threads excluding the mock server's per-connection handlers."""
+    return sum(1 for t in threading.enumerate() if "process_request" not in t.name)
+
+
+class ThreadSampler:
+    """Records the peak number of live client threads while a benchmark runs."""
+
+    def __init__(self):
+        self.peak = client_thread_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, client_thread_count())
+            time.sleep(0.005)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def bench_engines(args):
+    """Compare the per-cycle thread engine with the asyncio engine."""
+    pd = load_monitor()
+    # Static books without ETags: every request is a full 200 response
+    server = start_mock_server(latency=f"fixed:{args.latency_ms}", error_rate=args.error_rate, etags=False)
+    pd.price_depth_url = server.depth_url
+
+    print(f"Mock latency {args.latency_ms}ms, {args.error_rate*100:.1f}% 5xx | thread workers={pd.MAX_WORKERS} | "
+          f"async concurrency={pd.ASYNC_MAX_CONCURRENCY}")
+    print(f"{'symbols':>8} {'engine':>7} {'cycle s':>9} {'sym/s':>9} {'peak threads':>13}")
+    for n in args.symbols:
+        rows = [[f"SYM{i}", f"id-{i}"] for i in range(n)]
+        for engine in ("thread", "async"):
+            pd.FETCH_ENGINE = engine
+            pd.run_fetch_cycle(rows[:min(n, 20)])  # warm connections and the loop
+            timings = []
+            with ThreadSampler() as sampler:
+                for _ in range(args.cycles):
+                    start = time.perf_counter()
+                    pd.run_fetch_cycle(rows)
+                    timings.append(time.perf_counter() - start)
+            best = min(timings)
+            print(f"{n:>8} {engine:>7} {best:>9.3f} {n / best:>9.0f} {sampler.peak:>13}")
+
+    pd.shutdown_fetch_engines()
+    print(f"Mock server responses: {server.stats()}")
+    server.stop()
+
+
+def bench_hedge(args):
+    """Cycle makespan with fixed vs latency-adaptive timeouts and hedged requests, on a tailed server."""
+    from tail_latency import LatencyTracker, HedgeBudget
+    pd = load_monitor()
+    server = start_mock_server(latency=f"fixed:{args.latency_ms}", slow_ms=args.slow_ms,
+                               slow_fraction=args.slow_fraction, etags=False)
+    pd.price_depth_url = server.depth_url
+    rows = [[f"SYM{i}", f"id-{i}"] for i in range(args.symbols)]
+
+    print(f"Mock latency {args.latency_ms}ms, {args.slow_fraction*100:.0f}% at {args.slow_ms}ms | "
+          f"{args.symbols} symbols | hedge cap {pd.HEDGE_MAX_EXTRA_LOAD*100:.0f}%")
+    print(f"{'engine':>7} {'hedging':>8} {'median s':>9} {'p90 s':>7} {'max s':>7} {'hedges':>7} {'won':>5} {'extra':>7}")
+    for engine in ("thread", "async"):
+        pd.FETCH_ENGINE = engine
+        for hedging in (False, True):
+            pd.HEDGED_REQUESTS = hedging
+            pd.latency_tracker = LatencyTracker(window=pd.LATENCY_WINDOW, timeout_multiplier=pd.TIMEOUT_P95_MULTIPLIER,
+                                                min_timeout=pd.REQUEST_TIMEOUT_MIN, max_timeout=pd.REQUEST_TIMEOUT)
+            pd.hedge_budget = HedgeBudget(max_extra_ratio=pd.HEDGE_MAX_EXTRA_LOAD)
+            for _ in range(2):
+                pd.run_fetch_cycle(rows)  # warm connections and latency windows
+            pd.hedge_budget.take_stats()
+            timings = []
+            for _ in range(args.cycles):
+                start = time.perf_counter()
+                pd.run_fetch_cycle(rows)
+                timings.append(time.perf_counter() - start)
+            h = pd.hedge_budget.take_stats()
+            timings.sort()
+            p90 = timings[min(len(timings) - 1, int(len(timings) * 0.9))]
+            print(f"{engine:>7} {'on' if hedging else 'off':>8} {statistics.median(timings):>9.3f} {p90:>7.3f} "
+                  f"{timings[-1]:>7.3f} {h['hedges']:>7} {h['hedge_wins']:>5} {h['extra_load']*100:>6.1f}%")
+
+    pd.shutdown_fetch_engines()
+    server.stop()
+
+
+def bench_http2(args):
+    """
+    Thread and async engines over the HTTP/1.1 pool vs one multiplexed
+    HTTP/2 connection, checking that both transports produce the same
+    analysis; then the automatic fallback against an HTTP/1.1-only server.
+    """
+    import http_session
+    if not http_session.HTTP2_AVAILABLE:
+        print("httpx[http2] is not installed; nothing to compare")
+        return
+    pd = load_monitor()
+    server = start_mock_server(latency=f"fixed:{args.latency_ms}", etags=False, http2=True)
+    pd.price_depth_url = server.depth_url
+
+    print(f"Mock latency {args.latency_ms}ms | thread workers={pd.MAX_WORKERS} | "
+          f"async concurrency={pd.ASYNC_MAX_CONCURRENCY}")
+    print(f"{'symbols':>8} {'engine':>7} {'transport':>9} {'cycle s':>9} {'sym/s':>9} {'stream p50':>11} {'p95':>7}")
+    analyses = {}
+    for transport in ("HTTP/1.1", "HTTP/2"):
+        if transport == "HTTP/2":
+            http_session.enable_http2(server.depth_url)
+        for n in args.symbols:
+            rows = [[f"SYM{i}", f"id-{i}"] for i in range(n)]
+            for engine in ("thread", "async"):
+                pd.FETCH_ENGINE = engine
+                # Scores depend on history, so every run starts from the same empty state
+                for state in (pd.stock_history, pd.book_fingerprints, pd.book_validators, pd.analysis_cache):
+                    state.clear()
+                pd.run_fetch_cycle(rows[:min(n, 20)])  # warm connections and the loop
+                timings = []
+                for _ in range(args.cycles):
+                    start = time.perf_counter()
+                    pd.run_fetch_cycle(rows)
+                    timings.append(time.perf_counter() - start)
+                analyses[transport, n, engine] = dict(pd.analysis_cache)
+                best = min(timings)
+                h2 = http_session.get_http2_stats().get(http_session._host_key(server.depth_url))
+                p50 = f"{h2['p50']*1000:.0f}ms" if h2 and h2['p50'] is not None else "-"
+                p95 = f"{h2['p95']*1000:.0f}ms" if h2 and h2['p95'] is not None else "-"
+                print(f"{n:>8} {engine:>7} {transport:>9} {best:>9.3f} {n / best:>9.0f} {p50:>11} {p95:>7}")
+    for (transport, n, engine), analysis in analyses.items():
+        assert len(analysis) == n, f"{transport} {engine}: {len(analysis)}/{n} symbols analyzed"
+        assert analysis == analyses["HTTP/1.1", n, engine], f"{transport} {engine}: analysis differs"
+    stats = server.stats()
+    print(f"Same analysis over both transports | h2 connections: {stats.get('h2_connections', 0)}, "
+          f"h2 streams: {stats.get('h2_streams', 0)}")
+    pd.shutdown_fetch_engines()
+    server.stop()
+
+    # An HTTP/1.1-only server: the first request fails the h2c handshake and the host moves to the pool
+    plain = start_mock_server(latency=f"fixed:{args.latency_ms}", etags=False)
+    pd.price_depth_url = plain.depth_url
+    http_session.enable_http2(plain.depth_url)
+    rows = [[f"SYM{i}", f"id-{i}"] for i in range(args.symbols[0])]
+    pd.FETCH_ENGINE = "thread"
+    pd.analysis_cache.clear()
+    pd.run_fetch_cycle(rows)
+    assert len(pd.analysis_cache) == len(rows), "fallback cycle lost symbols"
+    print(f"Fallback: {len(pd.analysis_cache)}/{len(rows)} symbols analyzed over HTTP/1.1, "
+          f"uses_http2={http_session.uses_http2(plain.depth_url)}")
+    pd.shutdown_fetch_engines()
+    plain.stop()
+
+
+def bench_dispatch(args):
+    """Fetch makespan in CSV order vs longest-expected-first, with the slow symbols at the end of the CSV."""
+    pd = load_monitor()
+    rows = [[f"SYM{i}", f"id-{i}"] for i in range(args.symbols)]
+    slow = [row[0] for row in rows[-args.slow:]] if args.slow else []
+    server = start_mock_server(latency=f"fixed:{args.latency_ms}", slow_ms=args.slow_ms, slow_symbols=slow,
+                               etags=False, stocks=rows)
+    pd.price_depth_url = server.depth_url
+    pd.stocks_list = rows
+
+    print(f"Mock latency {args.latency_ms}ms, {len(slow)} slow symbols at {args.slow_ms}ms (last in CSV) | "
+          f"{args.symbols} symbols")
+    print(f"{'engine':>7} {'order':>8} {'median s':>9} {'max s':>7} {'predicted s':>12}")
+    for engine in ("thread", "async"):
+        pd.FETCH_ENGINE = engine
+        for order in ("csv", "longest"):
+            pd.DISPATCH_ORDER = order
+            timings, predicted = [], []
+            for cycle in range(args.cycles + 1):
+                pd.begin_cycle()
+                cycle_rows = pd.select_cycle_rows()
+                start = time.perf_counter()
+                pd.run_fetch_cycle(cycle_rows)
+                if cycle:  # the first cycle warms connections and cost estimates
+                    timings.append(time.perf_counter() - start)
+                    predicted.append(pd.dispatch_plan['ordered' if order == "longest" else 'input'])
+            print(f"{engine:>7} {order:>8} {statistics.median(timings):>9.3f} {max(timings):>7.3f} "
+                  f"{statistics.median(predicted):>12.3f}")
+
+    pd.shutdown_fetch_engines()
+    server.stop()
+
+
+def bench_tokens(args):
+    """Fresh symbols per second with 1..N rotated tokens against a per-token rate limit, then with one token revoked."""
+    from rate_limiter import AdaptiveRateLimiter
+    from token_pool import TokenPool
+    pd = load_monitor(rate_limited=True)
+    rows = [[f"SYM{i}", f"id-{i}"] for i in range(args.symbols)]
+    pool_tokens = [f"bench-token-{i}" for i in range(max(args.tokens))]
+    revoked = pool_tokens[-1]
+    server = start_mock_server(latency=f"fixed:{args.latency_ms}", etags=False, stocks=rows, require_auth=True,
+                               rate_limit=args.per_token_rate, rate_limit_per_token=True)
+    pd.price_depth_url = server.depth_url
+    pd.stocks_list = rows
+    pd.FETCH_ENGINE = "thread"
+    pd.INTERVAL_SECONDS = args.seconds  # one cycle per run: the deadline is 0.8 x interval
+    pd.RATE_LIMIT_INITIAL = pd.RATE_LIMIT_MAX = args.per_token_rate
+
+    print(f"Mock limit {args.per_token_rate:.0f} req/s per token | {args.symbols} symbols | "
+          f"{pd.MAX_WORKERS} workers | {args.seconds:.0f}s of cycles per run")
+    print(f"{'tokens':>7} {'revoked':>8} {'fresh/s':>8} {'429s':>6} {'401s':>6} {'limiter rate':>13}")
+    for n in args.tokens:
+        for revoke in ((False, True) if n > 1 else (False,)):
+            server.revoked_tokens = {revoked} if revoke else set()
+            pd.token_pool = TokenPool(pool_tokens[:n] if not revoke else pool_tokens[-n:],
+                                      throttle_cooldown=pd.TOKEN_THROTTLE_COOLDOWN)
+            pd.api_limiter = AdaptiveRateLimiter(initial_rate=args.per_token_rate, min_rate=pd.RATE_LIMIT_MIN,
+                                                 max_rate=args.per_token_rate, burst=pd.MAX_WORKERS)
+            pd.rate_ceiling_tokens = 1
+            pd.token_expired = False
+            for code in list(pd.analysis_cache):
+                pd.analysis_cache.pop(code)
+            fresh, start = 0, time.perf_counter()
+            while time.perf_counter() - start < args.seconds:
+                last_values = pd.begin_cycle()
+                cycle_rows = pd.select_cycle_rows()
+                late = pd.run_fetch_cycle(cycle_rows)
+                pd.finish_cycle(cycle_rows, late, last_values)
+                fresh += pd.cycle_stats.get('fresh', 0)
+            elapsed = time.perf_counter() - start
+            stats = pd.token_pool.stats().values()
+            print(f"{n:>7} {'yes' if revoke else 'no':>8} {fresh / elapsed:>8.1f} "
+                  f"{sum(e['throttled'] for e in stats):>6} {sum(e['rejected'] for e in stats):>6} "
+                  f"{pd.api_limiter.rate:>13.1f}")
+
+    pd.shutdown_fetch_engines()
+    server.stop()
+
+
+def bench_funnel(args):
+    """Requests and promotion churn with the two-tier screening funnel vs polling the whole universe at depth."""
+    from screening_funnel import ScreeningFunnel
+    pd = load_monitor()
+    rows = [[f"SYM{i}", f"id-{i}"] for i in range(args.universe)]
+    core = rows[:args.core]
+    server = start_mock_server(latency=f"fixed:{args.latency_ms}", etags=False, stocks=rows,
+                               book_period=args.book_period)
+    pd.price_depth_url = server.depth_url
+    pd.QUOTE_API_URL = server.quote_url
+    pd.FETCH_ENGINE = "thread"
+    pd.SCREEN_PASS_SECONDS = args.pass_seconds
+    pd.FUNNEL_COOLDOWN_SECONDS = args.cooldown
+
+    # Full-depth reference: one cycle over the whole universe, with no deadline cutting it short
+    pd.stocks_list = rows
+    deadline, pd.CYCLE_DEADLINE_SECONDS, pd.INTERVAL_SECONDS = pd.CYCLE_DEADLINE_SECONDS, 600, 600
+    pd.begin_cycle()
+    start = time.perf_counter()
+    pd.run_fetch_cycle(pd.select_cycle_rows())
+    all_depth_seconds = time.perf_counter() - start
+    pd.CYCLE_DEADLINE_SECONDS, pd.INTERVAL_SECONDS = deadline, args.interval
+    baseline_counts = server.stats()
+
+    pd.core_stocks, pd.stocks_list = core, list(core)
+    pd.screening_funnel = ScreeningFunnel(rows, core_codes=[row[0] for row in core], min_ratio=args.min_ratio,
+                                          min_move_pct=pd.SCREEN_MIN_MOVE_PCT, cooldown=args.cooldown,
+                                          max_promoted=pd.FUNNEL_MAX_PROMOTED)
+    print(f"Mock latency {args.latency_ms}ms, books change every {args.book_period}s | universe {args.universe}, "
+          f"core {args.core} | {args.interval}s cycles, screen pass {args.pass_seconds}s, cooldown {args.cooldown}s")
+    print(f"{'cycle':>6} {'depth':>6} {'screened':>9} {'promoted':>9} {'+':>4} {'-':>4} {'cycle s':>8}")
+    timings = []
+    for cycle in range(1, args.cycles + 1):
+        start = time.perf_counter()
+        pd.run_screening_pass()
+        last_values = pd.begin_cycle()
+        cycle_rows = pd.select_cycle_rows()
+        late = pd.run_fetch_cycle(cycle_rows)
+        pd.finish_cycle(cycle_rows, late, last_values)
+        pd.update_funnel(len(cycle_rows))
+        elapsed = time.perf_counter() - start
+        timings.append(elapsed)
+        f = pd.screening_funnel.take_stats()
+        print(f"{cycle:>6} {len(cycle_rows):>6} {f['screened']:>9} {f['promoted_now']:>9} {f['promoted']:>4} "
+              f"{f['demoted']:>4} {elapsed:>8.3f}")
+        time.sleep(max(0.0, args.interval - elapsed))
+
+    counts = server.stats()
+    depth = counts.get("depth", 0) - baseline_counts.get("depth", 0)
+    quotes = counts.get("getBook5", 0) - baseline_counts.get("getBook5", 0)
+    all_depth = args.cycles * args.universe
+    totals = f['totals']
+    print(f"Server saw {depth} depth + {quotes} getBook5 = {depth + quotes} requests vs {all_depth} polling "
+          f"everything at depth ({(depth + quotes - all_depth) / all_depth * 100:+.0f}%)")
+    print(f"Churn: {totals['promoted']} promotions, {totals['demoted']} demotions, {totals['capped']} capped | "
+          f"cycle median {statistics.median(timings):.3f}s vs {all_depth_seconds:.3f}s for an all-depth cycle")
+
+    pd.shutdown_fetch_engines()
+    server.stop()
+
+
+def bench_alerts(args):
+    """Response-to-decision and response-to-Telegram latency with streamed vs cycle-end alert evaluation."""
+    pd = load_monitor()
+    rows = [[f"SYM{i}", f"id-{i}"] for i in range(args.symbols)]
+    server = start_mock_server(latency=args.latency, etags=False, stocks=rows)
+    pd.price_depth_url = server.depth_url
+    pd.stocks_list = rows
+    pd.FETCH_ENGINE = "thread"
+    pd.cooldown_minutes = 0
+    # Every --strong-every'th symbol scores in the STRONG range (it alerts when its ratio is > 1.2 too);
+    # Telegram is replaced by a fixed-cost stand-in so nothing leaves the machine
+    strong = {row[0] for row in rows[::args.strong_every]}
+    pd.calculate_signal_score = lambda code, snapshot: 80.0 if code in strong else 50.0
+    pd.send_telegram_notification = lambda *alert: time.sleep(args.telegram_ms / 1000)
+    pd.send_telegram_summary = lambda *summary: None
+    pd.format_alert_stats = lambda: ""  # keep the samples for the table below
+
+    print(f"Mock latency {args.latency} | {args.symbols} symbols, {len(strong)} scoring STRONG | "
+          f"Telegram stand-in {args.telegram_ms:.0f}ms | {args.cycles} cycles per mode")
+    print(f"{'mode':>10} {'decided p50':>12} {'decided max':>12} {'alerts':>7} {'sent p50':>9} {'sent max':>9}")
+    for streaming in (False, True):
+        pd.alert_stream_live = streaming
+        pd.alert_latency.take_stats()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(args.cycles + 1):
+                last_values = pd.begin_cycle()
+                cycle_rows = pd.select_cycle_rows()
+                late = pd.run_fetch_cycle(cycle_rows)
+                pd.finish_cycle(cycle_rows, late, last_values)
+                pd.process_notifications()
+                pd.last_recommendations.clear()
+        s = pd.alert_latency.take_stats()
+        decided, sent = s['decided'], s['delivered'] or (0, 0.0, 0.0)
+        print(f"{'streamed' if streaming else 'cycle end':>10} {decided[1]*1000:>10.0f}ms {decided[2]*1000:>10.0f}ms "
+              f"{sent[0]:>7} {sent[1]*1000:>7.0f}ms {sent[2]*1000:>7.0f}ms")
+
+    pd.shutdown_fetch_engines()
+    server.stop()
+
+
+def bench_scoring(args):
+    """Scalar calculate_signal_score vs the NumPy batch engine: exact equivalence, then time per cycle."""
+    import batch_scoring
+    if not batch_scoring.NUMPY_AVAILABLE:
+        print("numpy is not installed; nothing to compare")
+        return
+    from history_store import HistoryStore
+    pd = load_monitor()
+    rng = random.Random(7)
+
+    # Equivalence: every history length, many random books, compared as exact float bit patterns,
+    # for both the snapshot-dict path and the ring-buffer path
+    histories = [synthetic_history(rng, rng.randint(0, pd.HISTORY_SIZE * 2)) for _ in range(args.check)]
+    pd.stock_history = store = HistoryStore(pd.HISTORY_SIZE)
+    codes = []
+    for i, history in enumerate(histories):
+        codes.append(f"EQ{i}")
+        for snapshot in history:
+            store.append(codes[-1], snapshot)
+    stored = [code for code in codes if code in store]
+    # The built-in factors, then with an extra registered factor that has a batch form
+    tight_spread = Factor("tight_spread", lambda history, snapshot: 1 - snapshot.get('spread_pct', 0), threshold=0.5,
+                          weight=10, cap=5, explain=lambda value, points: f"TightSpread (+{points:.1f})",
+                          measure_batch=lambda f: 1 - f['spread_pct'])
+    for label, extra in (("built-in factors", None), ("+ registered factor", tight_spread)):
+        if extra is not None:
+            pd.factor_registry.register(extra)
+        factors = pd.factor_registry.factors
+        scalar = [float(pd.calculate_signal_score(code, h[-1])) if h else 0.0 for code, h in zip(codes, histories)]
+        from_store = dict(zip(stored, batch_scoring.score_store(store, stored, factors)))
+        from_dicts = batch_scoring.score_histories([h[-pd.HISTORY_SIZE:] for h in histories], factors)
+        mismatches = [(code, a, b, c) for code, a, b, c in zip(codes, scalar, from_dicts, (from_store.get(c, 0.0) for c in codes))
+                      if not a.hex() == b.hex() == c.hex()]
+        print(f"Equivalence ({label}): {len(scalar) - len(mismatches)}/{len(scalar)} scores bit-identical "
+              f"(dict and ring paths)" + (f", first mismatch {mismatches[0]}" if mismatches else ""))
+        assert not mismatches, "batch scores differ from calculate_signal_score"
+    pd.factor_registry.unregister("tight_spread")
+    factors = pd.factor_registry.factors
+
+    print(f"{'symbols':>8} {'scalar ms':>10} {'vector ms':>10} {'of which gather':>16} {'speed-up':>9}")
+    for n in args.symbols:
+        pd.stock_history = store = HistoryStore(pd.HISTORY_SIZE)
+        codes = [f"SYM{i}" for i in range(n)]
+        for code in codes:
+            for snapshot in synthetic_history(rng, pd.HISTORY_SIZE):
+                store.append(code, snapshot)
+        last = {code: store[code][-1] for code in codes}
+        pd.factor_registry.take_stats()
+        scalar_s = min(timeit.repeat(lambda: [pd.calculate_signal_score(c, last[c]) for c in codes],
+                                     number=1, repeat=args.repeat))
+        scalar_factors = pd.format_factor_stats()
+        vector_s = min(timeit.repeat(lambda: batch_scoring.score_store(store, codes, factors), number=1, repeat=args.repeat))
+        gather_s = min(timeit.repeat(lambda: batch_scoring.gather_store(store, codes), number=1, repeat=args.repeat))
+        print(f"{n:>8} {scalar_s*1000:>10.2f} {vector_s*1000:>10.2f} {gather_s*1000:>16.2f} {scalar_s / vector_s:>8.1f}x")
+    print(f"Scalar factor cost: {scalar_factors}")
+
+
+def _deep_size(obj):
+    """sys.getsizeof of a deque of snapshot dicts including the dicts and their values (keys are interned)."""
+    import sys
+    return sys.getsizeof(obj) + sum(sys.getsizeof(snap) + sum(sys.getsizeof(v) for v in snap.values()) for snap in obj)
+
+
+def bench_history(args):
+    """
+    Memory per symbol and scoring time per symbol: deque of dicts vs the
+    ring-buffer history, by HISTORY_SIZE. Then the rolling statistics are
+    checked against recomputing them over the window, with their append cost.
+    """
+    from collections import deque
+    from datetime import datetime
+    from history_store import HistoryStore
+    pd = load_monitor()
+    rng = random.Random(3)
+    print(f"{'history':>8} {'deque KB/sym':>13} {'ring KB/sym':>12} {'list copies us':>15} {'ring score us':>14}")
+    for size in args.sizes:
+        snapshots = synthetic_history(rng, size)
+        for snapshot in snapshots:
+            snapshot['timestamp'] = datetime.now()
+        legacy = deque(snapshots, maxlen=size)
+        pd.stock_history = store = HistoryStore(size)
+        for snapshot in snapshots:
+            store.append("SYM", snapshot)
+        # What the old scorer copied per call, vs the whole scorer on the ring
+        copies = min(timeit.repeat(lambda: (list(legacy)[-3:], list(legacy)[-4:]), number=2000, repeat=5)) / 2000
+        score = min(timeit.repeat(lambda: pd.calculate_signal_score("SYM", snapshots[-1]), number=2000, repeat=5)) / 2000
+        print(f"{size:>8} {_deep_size(legacy) / 1024:>13.1f} {store.memory_per_symbol() / 1024:>12.1f} "
+              f"{copies * 1e6:>15.2f} {score * 1e6:>14.2f}")
+
+    # Rolling statistics vs recomputing them over the window after every append
+    print(f"{'history':>8} {'appends':>8} {'max abs error':>14} {'append us':>10} {'recompute us':>13}")
+    for size in args.sizes:
+        store = HistoryStore(size)
+        snapshots = synthetic_history(rng, size * 20)
+        worst = 0.0
+        for i, snapshot in enumerate(snapshots):
+            store.append("SYM", snapshot)
+            window = snapshots[max(0, i + 1 - size):i + 1]
+            if len(window) < 2:
+                continue
+            stats = store["SYM"].stats
+            ratios, mids = [s['ratio'] for s in window], [s['mid_price'] for s in window]
+            n, mean_x = len(ratios), (len(ratios) - 1) / 2
+            slope = (sum((x - mean_x) * y for x, y in enumerate(ratios))
+                     / sum((x - mean_x) ** 2 for x in range(n)))
+            worst = max(worst, abs(stats.slope() - slope),
+                        abs(stats.mean('ratio') - statistics.fmean(ratios)), abs(stats.std('ratio') - statistics.stdev(ratios)),
+                        abs(stats.mean('mid') - statistics.fmean(mids)), abs(stats.std('mid') - statistics.stdev(mids)))
+        ring = store["SYM"]
+        append = min(timeit.repeat(lambda: ring.append(snapshots[-1]), number=2000, repeat=5)) / 2000
+        recompute = min(timeit.repeat(lambda: (statistics.fmean(ring.column('ratio', size)), statistics.stdev(ring.column('ratio', size)),
+                                               statistics.fmean(ring.column('mid_price', size)), statistics.stdev(ring.column('mid_price', size))),
+                                      number=200, repeat=5)) / 200
+        print(f"{size:>8} {len(snapshots):>8} {worst:>14.2e} {append * 1e6:>10.2f} {recompute * 1e6:>13.2f}")
+
+
+def _serve_mock(port, options):
+    start_mock_server(port=port, **options)
+    while True:
+        time.sleep(3600)
+
+
+def bench_shards(args):
+    """Cycle throughput with SHARD_WORKERS processes, then a worker kill and restart."""
+    import multiprocessing
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    # The mock runs in its own process so it doesn't share the coordinator's GIL
+    server = multiprocessing.get_context("spawn").Process(
+        target=_serve_mock, args=(port, {"latency": f"fixed:{args.latency_ms}", "etags": False}), daemon=True)
+    server.start()
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            break
+        except OSError:
+            time.sleep(0.1)
+
+    # Workers are spawned and read their configuration from the environment at import
+    os.environ.update(DEPTH_API_BASE_URL=f"http://127.0.0.1:{port}/assets-service/market-depth/",
+                      RATE_LIMIT_INITIAL="1000000", RATE_LIMIT_MAX="1000000", NOTIFICATION_LOG=os.devnull)
+    pd = load_monitor()
+    pd.stocks_list = [[f"SYM{i}", f"id-{i}"] for i in range(args.symbols)]
+
+    results = []
+    for workers in args.workers:
+        pd.SHARD_WORKERS = workers
+        pd.start_shard_workers()
+        pd.run_sharded_cycle()  # warm connections in every worker
+        timings = []
+        for _ in range(args.cycles):
+            start = time.perf_counter()
+            polled, late = pd.run_sharded_cycle()
+            timings.append(time.perf_counter() - start)
+        results.append((workers, min(timings), polled, len(late), pd.format_shard_stats()))
+        if workers != args.workers[-1]:
+            pd.shutdown_fetch_engines()
+
+    victim = pd.shard_coordinator._workers[0].process
+    os.kill(victim.pid, signal.SIGTERM)
+    victim.join()
+    polled_after_kill, late_after_kill = pd.run_sharded_cycle()
+    kill_stats = pd.format_shard_stats()
+    deadline = time.monotonic() + 60
+    while len(pd.shard_coordinator.ready_ids()) < args.workers[-1] and time.monotonic() < deadline:
+        pd.run_sharded_cycle()
+    polled_recovered, late_recovered = pd.run_sharded_cycle()
+    recovered_stats = pd.format_shard_stats()
+    pd.shutdown_fetch_engines()
+    server.terminate()
+
+    print(f"\nMock latency {args.latency_ms}ms | {args.symbols} symbols | {os.cpu_count()} CPU core(s)")
+    print(f"{'workers':>8} {'cycle s':>9} {'sym/s':>9} {'late':>6}  shards")
+    for workers, best, polled, late, stats in results:
+        print(f"{workers:>8} {best:>9.3f} {polled / best:>9.0f} {late:>6}  {stats}")
+    print(f"Killed worker 0: next cycle fetched {polled_after_kill}, late {len(late_after_kill)} | {kill_stats}")
+    print(f"After restart:   fetched {polled_recovered}, late {len(late_recovered)} | {recovered_stats}")
+
+
+def _legacy_to_number(val, default=0):
+    # to_number as it was before depth_decoder (kept here as the baseline)
+    try:
+        if val is None:
+            return default
+        if isinstance(val, (int, float)):
+            return float(val)
+        s = str(val).strip()
+        if s == '':
+            return default
+        if s.replace('.', '', 1).isdigit():
+            return float(s)
+        return default
+    except Exception:
+        return default
+
+
+def legacy_book_metrics(content):
+    """Pre-decoder path: json.loads, then walk the level dicts with to_number."""
+    data = json.loads(content)
+    bids_data = data.get("bids_per_price", [])
+    asks_data = data.get("asks_per_price", [])
+    best_bid = max([_legacy_to_number(bid.get("order_price", 0)) for bid in bids_data], default=0)
+    best_ask = min([_legacy_to_number(ask.get("order_price", float('inf'))) for ask in asks_data], default=0)
+    weighted_bid = sum(_legacy_to_number(bid.get("volume_traded", 0)) * (1 / (i + 1))
+                       for i, bid in enumerate(bids_data[:5]))
+    weighted_ask = sum(_legacy_to_number(ask.get("volume_traded", 0)) * (1 / (i + 1))
+                       for i, ask in enumerate(asks_data[:5]))
+    return best_bid, best_ask, weighted_bid, weighted_ask, len(bids_data), len(asks_data)
+
+
+def decoded_book_metrics(content):
+    """Typed path: depth_decoder straight from bytes, then array reads."""
+    from depth_decoder import decode_depth
+    book = decode_depth(content)
+    bids, asks = book.bids, book.asks
+    best_bid = max(bids.prices, default=0)
+    best_ask = min(asks.prices, default=0)
+    weighted_bid = sum(volume * (1 / (i + 1)) for i, volume in enumerate(bids.volumes[:5]))
+    weighted_ask = sum(volume * (1 / (i + 1)) for i, volume in enumerate(asks.volumes[:5]))
+    return best_bid, best_ask, weighted_bid, weighted_ask, len(bids), len(asks)
+
+
+def _per_call_us(fn, arg, min_seconds=0.3):
+    timer = timeit.Timer(lambda: fn(arg))
+    number, _ = timer.autorange()
+    number = max(number, int(number * min_seconds / 0.2))
+    return min(timer.repeat(repeat=3, number=number)) / number * 1e6
+
+
+def bench_decode(args):
+    """Compare the dict-walking parse path with the typed decoder."""
+    from depth_decoder import JSON_BACKEND
+    print(f"JSON backend: {JSON_BACKEND}")
+    print(f"{'levels':>7} {'fields':>8} {'legacy us':>10} {'decoder us':>11} {'speedup':>8}")
+    for levels in args.levels:
+        for as_strings in (False, True):
+            content = json.dumps(make_depth_payload(levels, seed=7, as_strings=as_strings)).encode()
+            if not as_strings:
+                assert legacy_book_metrics(content) == decoded_book_metrics(content), "decoder mismatch"
+            legacy = _per_call_us(legacy_book_metrics, content)
+            decoded = _per_call_us(decoded_book_metrics, content)
+            kind = "strings" if as_strings else "numbers"
+            print(f"{levels:>7} {kind:>8} {legacy:>10.1f} {decoded:>11.1f} {legacy / decoded:>7.2f}x")
+
+
+def separate_pass_metrics(book):
+    """analyze_bid_ask's book metrics as computed before book_reducer: one pass per metric."""
+    bids, asks = book.bids, book.asks
+    best_bid = max(bids.prices, default=0)
+    best_ask = min(asks.prices, default=0)
+    weighted_bid = sum(volume * (1 / (i + 1)) for i, volume in enumerate(bids.volumes[:5]))
+    weighted_ask = sum(volume * (1 / (i + 1)) for i, volume in enumerate(asks.volumes[:5]))
+    mid_price = (best_bid + best_ask) / 2 if best_bid and best_ask else 0
+    spread = best_ask - best_bid if best_bid and best_ask else 0
+    spread_pct = (spread / mid_price * 100) if mid_price else 0
+    imbalance = (weighted_bid / weighted_ask) if weighted_ask else 0
+    return best_bid, best_ask, mid_price, spread, spread_pct, imbalance, len(bids), len(asks)
+
+
+def reduced_metrics(book):
+    """The same tuple from book_reducer.reduce_book."""
+    m = reduce_book(book)
+    return (m.best_bid, m.best_ask, m.mid_price, m.spread, m.spread_pct, m.weighted_imbalance,
+            m.bid_levels, m.ask_levels)
+
+
+def bench_reducer(args):
+    """
+    Per-snapshot cost of deriving the book metrics from a decoded book: one
+    pass per metric vs book_reducer (checked identical), then the reducer
+    with an extra registered top-of-book metric.
+    """
+    import book_reducer
+    from depth_decoder import book_from_dict
+    print(f"{'levels':>7} {'passes us':>10} {'reducer us':>11} {'saving':>7} {'+1 metric us':>13}")
+    for levels in args.levels:
+        book = book_from_dict(make_depth_payload(levels, seed=11))
+        assert separate_pass_metrics(book) == reduced_metrics(book), "reducer mismatch"
+        separate = reduced = float("inf")
+        for _ in range(args.rounds):  # interleaved, best of each
+            separate = min(separate, _per_call_us(separate_pass_metrics, book))
+            reduced = min(reduced, _per_call_us(reduce_book, book))
+        # Top-5 VWAP registered as an extension: read from the fold state, no extra walk over the ladder
+        book_reducer.register_side_metric("top_vwap", lambda fold:
+                                          fold.top_notional / fold.top_volume if fold.top_volume else 0)
+        extended = min(_per_call_us(reduce_book, book) for _ in range(args.rounds))
+        book_reducer._side_metrics.clear()
+        print(f"{levels:>7} {separate:>10.2f} {reduced:>11.2f} {(separate - reduced) / separate:>7.0%} {extended:>13.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stock analysis performance benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    engines = sub.add_parser("engines", help="thread vs asyncio fetch engine")
+    engines.add_argument("--symbols", type=int, nargs="+", default=[66, 1000])
+    engines.add_argument("--latency-ms", type=float, default=40)
+    engines.add_argument("--cycles", type=int, default=3)
+    engines.add_argument("--error-rate", type=float, default=0.0, help="share of mock responses that are 5xx")
+    engines.set_defaults(func=bench_engines)
+
+    decode = sub.add_parser("decode", help="legacy dict parsing vs typed depth decoder")
+    decode.add_argument("--levels", type=int, nargs="+", default=[20, 500])
+    decode.set_defaults(func=bench_decode)
+
+    reducer = sub.add_parser("reducer", help="per-metric passes vs the single order-book reduction")
+    reducer.add_argument("--levels", type=int, nargs="+", default=[5, 20, 100, 500])
+    reducer.add_argument("--rounds", type=int, default=5)
+    reducer.set_defaults(func=bench_reducer)
+
+    hedge = sub.add_parser("hedge", help="cycle makespan with and without hedged requests")
+    hedge.add_argument("--symbols", type=int, default=66)
+    hedge.add_argument("--latency-ms", type=float, default=20)
+    hedge.add_argument("--slow-ms", type=float, default=800)
+    hedge.add_argument("--slow-fraction", type=float, default=0.03)
+    hedge.add_argument("--cycles", type=int, default=10)
+    hedge.set_defaults(func=bench_hedge)
+
+    shards = sub.add_parser("shards", help="SHARD_WORKERS throughput and worker restart")
+    shards.add_argument("--symbols", type=int, default=2000)
+    shards.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    shards.add_argument("--latency-ms", type=float, default=5)
+    shards.add_argument("--cycles", type=int, default=3)
+    shards.set_defaults(func=bench_shards)
+
+    http2 = sub.add_parser("http2", help="HTTP/1.1 pool vs multiplexed HTTP/2, plus fallback")
+    http2.add_argument("--symbols", type=int, nargs="+", default=[66, 1000])
+    http2.add_argument("--latency-ms", type=float, default=40)
+    http2.add_argument("--cycles", type=int, default=3)
+    http2.set_defaults(func=bench_http2)
+
+    dispatch = sub.add_parser("dispatch", help="CSV order vs longest-expected-first dispatch")
+    dispatch.add_argument("--symbols", type=int, default=66)
+    dispatch.add_argument("--slow", type=int, default=6, help="symbols at the end of the CSV served at --slow-ms")
+    dispatch.add_argument("--slow-ms", type=float, default=600)
+    dispatch.add_argument("--latency-ms", type=float, default=40)
+    dispatch.add_argument("--cycles", type=int, default=5)
+    dispatch.set_defaults(func=bench_dispatch)
+
+    tokens = sub.add_parser("tokens", help="request ceiling with a rotating token pool")
+    tokens.add_argument("--symbols", type=int, default=120)
+    tokens.add_argument("--tokens", type=int, nargs="+", default=[1, 3])
+    tokens.add_argument("--per-token-rate", type=float, default=20)
+    tokens.add_argument("--latency-ms", type=float, default=20)
+    tokens.add_argument("--seconds", type=float, default=10)
+    tokens.set_defaults(func=bench_tokens)
+
+    funnel = sub.add_parser("funnel", help="two-tier screening funnel vs full depth for a large universe")
+    funnel.add_argument("--universe", type=int, default=1000)
+    funnel.add_argument("--core", type=int, default=66, help="symbols always fetched at full depth")
+    funnel.add_argument("--cycles", type=int, default=30)
+    funnel.add_argument("--interval", type=float, default=2.0, help="seconds per cycle")
+    funnel.add_argument("--min-ratio", type=float, default=2.0, help="top-5 volume ratio that promotes (mock books are random)")
+    funnel.add_argument("--pass-seconds", type=float, default=20, help="seconds to screen the whole universe once")
+    funnel.add_argument("--cooldown", type=float, default=10, help="seconds a quiet promoted symbol stays at depth")
+    funnel.add_argument("--book-period", type=float, default=5, help="seconds between new mock books")
+    funnel.add_argument("--latency-ms", type=float, default=20)
+    funnel.set_defaults(func=bench_funnel)
+
+    alerts = sub.add_parser("alerts", help="streamed vs cycle-end alert evaluation latency")
+    alerts.add_argument("--symbols", type=int, default=66)
+    alerts.add_argument("--latency", default="lognormal:60:0.8", help="mock latency spec")
+    alerts.add_argument("--strong-every", type=int, default=5, help="every Nth symbol scores STRONG")
+    alerts.add_argument("--telegram-ms", type=float, default=150, help="cost of one Telegram send")
+    alerts.add_argument("--cycles", type=int, default=5)
+    alerts.set_defaults(func=bench_alerts)
+
+    scoring = sub.add_parser("scoring", help="scalar vs NumPy batch scoring, with an exact equivalence check")
+    scoring.add_argument("--symbols", type=int, nargs="+", default=[66, 1000, 10000])
+    scoring.add_argument("--check", type=int, default=20000, help="random histories compared bit for bit")
+    scoring.add_argument("--repeat", type=int, default=5)
+    scoring.set_defaults(func=bench_scoring)
+
+    history = sub.add_parser("history", help="memory and scoring cost of the history store by HISTORY_SIZE")
+    history.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500])
+    history.set_defaults(func=bench_history)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Book Reducer
+Derives every order-book metric analyze_bid_ask and the scorer use from a
+decoded OrderBook in one fold per side: a single walk over the price and
+volume ladder accumulates the best price, the plain, weighted and notional
+top-level volumes and the level count together. Registered metrics read
+that fold's state instead of slicing or walking the ladder again.
+"""
+
+TOP_LEVELS = 5
+# Level weights of the weighted imbalance, 1 / (i + 1) exactly as computed per level before
+LEVEL_WEIGHTS = tuple(1 / (i + 1) for i in range(TOP_LEVELS))
+
+# name -> fn(fold) for metrics added with register_side_metric
+_side_metrics = {}
+
+
+def register_side_metric(name, fn):
+    """
+    Add a per-side metric. fn(fold) gets the side's finished SideFold (best
+    price, level count, top-level volume, weighted volume and notional, plus
+    the BookSide itself); BookMetrics.extra[name] holds its (bid, ask) results.
+    """
+    _side_metrics[name] = fn
+
+
+class SideFold:
+    """
+    State of one fold over a book side, in API level order. The top
+    TOP_LEVELS levels feed the volume sums; every level feeds the best price
+    and the level count.
+    """
+
+    __slots__ = ("side", "best", "levels", "top_levels", "top_volume", "weighted_volume", "top_notional")
+
+    def __init__(self, side, is_bid):
+        prices = iter(side.prices)
+        best = None
+        top_levels = 0
+        top_volume = weighted_volume = top_notional = 0
+        # Sums run in level order from 0, so they match sum() over the same levels bit for bit
+        for weight, price, volume in zip(LEVEL_WEIGHTS, prices, side.volumes):
+            if best is None or (price > best if is_bid else price < best):
+                best = price
+            top_levels += 1
+            top_volume += volume
+            weighted_volume += volume * weight
+            top_notional += price * volume
+        if top_levels == TOP_LEVELS:
+            # The same price iterator carries on below the top levels: only the best price is left to fold
+            deeper = (max if is_bid else min)(prices, default=best)
+            if deeper > best if is_bid else deeper < best:
+                best = deeper
+        self.side = side
+        self.best = 0 if best is None else best
+        self.levels = len(side.prices)
+        self.top_levels = top_levels
+        self.top_volume = top_volume
+        self.weighted_volume = weighted_volume
+        self.top_notional = top_notional
+
+
+class BookMetrics:
+    """Everything analyze_bid_ask derives from one OrderBook; built by reduce_book."""
+
+    __slots__ = ("best_bid", "best_ask", "bid_levels", "ask_levels", "weighted_bid_volume", "weighted_ask_volume",
+                 "top_bid_volume", "top_ask_volume", "ratio", "mid_price", "spread", "spread_pct",
+                 "weighted_imbalance", "extra")
+
+
+def reduce_book(book):
+    """
+    Fold each side of `book` once and derive the book metrics from the two folds.
+
+    Returns:
+        BookMetrics: with extra = {name: (bid, ask)} when metrics are registered, else None
+    """
+    bid_fold, ask_fold = SideFold(book.bids, True), SideFold(book.asks, False)
+    m = BookMetrics()
+    best_bid = m.best_bid = bid_fold.best
+    best_ask = m.best_ask = ask_fold.best
+    m.bid_levels, m.ask_levels = bid_fold.levels, ask_fold.levels
+    m.weighted_bid_volume = bid_fold.weighted_volume
+    weighted_ask = m.weighted_ask_volume = ask_fold.weighted_volume
+    m.top_bid_volume, m.top_ask_volume = bid_fold.top_volume, ask_fold.top_volume
+    m.ratio = (book.total_bids / book.total_asks) if book.total_asks else 0
+    mid_price = m.mid_price = (best_bid + best_ask) / 2 if best_bid and best_ask else 0
+    spread = m.spread = best_ask - best_bid if best_bid and best_ask else 0
+    m.spread_pct = (spread / mid_price * 100) if mid_price else 0
+    m.weighted_imbalance = (bid_fold.weighted_volume / weighted_ask) if weighted_ask else 0
+    m.extra = None
+    if _side_metrics:
+        m.extra = {name: (fn(bid_fold), fn(ask_fold)) for name, fn in _side_metrics.items()}
+    return m
@@ -0,0 +1,120 @@
+"""
+Per-Endpoint Circuit Breakers
+Stops spending requests, retries and worker time on endpoints that keep
+failing (5xx / timeouts), probing them again at growing intervals.
+"""
+
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitBreaker:
+    """
+    closed     requests flow; consecutive failures are counted
+    open       requests are refused until the reset timeout passes
+    half-open  one probe request is let through; success closes the
+               breaker, failure re-opens it with a doubled timeout
+    """
+
+    def __init__(self, name, failure_threshold=3, reset_timeout=60, max_reset_timeout=600,
+                 on_transition=None, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.on_transition = on_transition
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.reset_timeout = reset_timeout
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+
+    def _transition(self, new_state, reason):
+        old_state, self.state = self.state, new_state
+        if self.on_transition and old_state != new_state:
+            self.on_transition(self.name, old_state, new_state, reason)
+
+    def allow_request(self):
+        """True if a request may be sent now (claims the probe slot when half-open)."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if self._clock() - self._opened_at < self.reset_timeout:
+                    return False
+                self._transition(HALF_OPEN, f"probing after {self.reset_timeout:.0f}s")
+            now = self._clock()
+            # A probe that never reported back (cancelled, carried over) frees its slot after reset_timeout
+            if self._probe_in_flight and now - self._probe_started < self.reset_timeout:
+                return False
+            self._probe_in_flight = True
+            self._probe_started = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probe_in_flight = False
+            if self.state != CLOSED:
+                self.reset_timeout = self.base_reset_timeout
+                self._transition(CLOSED, "probe succeeded")
+
+    def record_failure(self, reason="failure"):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == HALF_OPEN:
+                self.reset_timeout = min(self.max_reset_timeout, self.reset_timeout * 2)
+                self._opened_at = self._clock()
+                self._transition(OPEN, f"probe failed ({reason}), next probe in {self.reset_timeout:.0f}s")
+            elif self.state == CLOSED and self.failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+                self._transition(OPEN, f"{self.failures} consecutive failures ({reason})")
+
+    @property
+    def is_open(self):
+        return self.state == OPEN
+
+
+class BreakerRegistry:
+    """One CircuitBreaker per endpoint name, created on first use."""
+
+    def __init__(self, on_transition=None, **breaker_kwargs):
+        self._breakers = {}
+        self._lock = threading.Lock()
+        self._on_transition = on_transition
+        self._breaker_kwargs = breaker_kwargs
+        self._transitions = []   # (name, old, new, reason) since the last take_transitions()
+
+    def _record_transition(self, name, old_state, new_state, reason):
+        with self._lock:
+            self._transitions.append((name, old_state, new_state, reason))
+        if self._on_transition:
+            self._on_transition(name, old_state, new_state, reason)
+
+    def get(self, name):
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(name)
+                if breaker is None:
+                    breaker = CircuitBreaker(name, on_transition=self._record_transition, **self._breaker_kwargs)
+                    self._breakers[name] = breaker
+        return breaker
+
+    def take_transitions(self):
+        with self._lock:
+            transitions, self._transitions = self._transitions, []
+        return transitions
+
+    def names_in_state(self, state):
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return sorted(b.name for b in breakers if b.state == state)
@@ -0,0 +1,127 @@
+"""
+Fixed-Rate Cycle Scheduler
+Fires trading cycles on fixed wall-clock ticks using the monotonic clock,
+so the period does not drift by the time spent fetching and notifying.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+
+CATCH_UP_POLICIES = ("skip", "coalesce")
+
+
+class FixedRateScheduler:
+    """
+    Ticks at anchor + k * period.
+
+    If a cycle overruns past one or more ticks, the catch-up policy decides
+    what happens next:
+        skip      wait for the next future tick (missed ticks are dropped)
+        coalesce  start one cycle immediately for all missed ticks, then
+                  continue on the original grid
+
+    Period and jitter statistics cover the last `window` cycles since the
+    previous take_stats(), so they stay bounded when nobody reads them (e.g.
+    outside trading hours); the counters cover every cycle.
+    """
+
+    def __init__(self, period, catch_up="skip", clock=time.monotonic, wall_clock=time.time, sleep=time.sleep,
+                 window=500):
+        if catch_up not in CATCH_UP_POLICIES:
+            raise ValueError(f"catch_up must be one of {CATCH_UP_POLICIES}, got {catch_up!r}")
+        self.period = float(period)
+        self.catch_up = catch_up
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self._sleep = sleep
+        self.window = window
+        self._lock = threading.Lock()
+        self._session_cycles = 0
+        self._session_overruns = 0
+        self._reset_counters()
+        self.reset()
+
+    def _reset_counters(self):
+        self._cycles = 0
+        self._overruns = 0
+        self._missed_ticks = 0
+        self._periods = deque(maxlen=self.window)   # actual start-to-start seconds
+        self._jitters = deque(maxlen=self.window)   # actual start minus scheduled tick, seconds
+
+    def reset(self):
+        """Re-anchor on the next wall-clock multiple of the period (e.g. hh:mm:00, :10, :20)."""
+        now = self._clock()
+        wall = self._wall_clock()
+        to_boundary = math.ceil(wall / self.period) * self.period - wall
+        self._anchor = now + to_boundary
+        self._tick_index = 0
+        self._last_start = None
+
+    def _tick_time(self, index):
+        return self._anchor + index * self.period
+
+    def wait_next(self):
+        """
+        Sleep until the next cycle should start.
+
+        Returns:
+            dict: {'scheduled', 'started', 'jitter', 'missed_ticks', 'overrun'}
+        """
+        now = self._clock()
+        target = self._tick_time(self._tick_index)
+        missed = 0
+        overrun = now > target
+        if overrun:
+            # Number of whole ticks already behind us
+            behind = int((now - self._anchor) // self.period) - self._tick_index + 1
+            if self.catch_up == "skip":
+                self._tick_index += behind
+                missed = behind
+                target = self._tick_time(self._tick_index)
+            else:
+                # Every tick passed is folded into the catch-up cycle, which itself takes the last one
+                missed = behind
+                self._tick_index += behind - 1
+
+        delay = target - self._clock()
+        if delay > 0:
+            self._sleep(delay)
+
+        started = self._clock()
+        # Coalesced cycles start late on purpose; jitter is measured against when they could start
+        scheduled = max(target, now) if overrun and self.catch_up == "coalesce" else target
+        jitter = started - scheduled
+        with self._lock:
+            self._cycles += 1
+            self._session_cycles += 1
+            if overrun:
+                self._overruns += 1
+                self._session_overruns += 1
+                self._missed_ticks += missed
+            if self._last_start is not None:
+                self._periods.append(started - self._last_start)
+            self._jitters.append(jitter)
+        self._last_start = started
+        self._tick_index += 1
+        return {'scheduled': target, 'started': started, 'jitter': jitter,
+                'missed_ticks': missed, 'overrun': overrun}
+
+    def take_stats(self):
+        """Period, jitter and overrun statistics since the previous call (plus session totals)."""
+        with self._lock:
+            periods, jitters = self._periods, self._jitters
+            stats = {
+                'cycles': self._cycles,
+                'overruns': self._overruns,
+                'missed_ticks': self._missed_ticks,
+                'period_avg': sum(periods) / len(periods) if periods else 0.0,
+                'period_max': max(periods, default=0.0),
+                'jitter_avg': sum(jitters) / len(jitters) if jitters else 0.0,
+                'jitter_max': max(jitters, default=0.0),
+                'session_cycles': self._session_cycles,
+                'session_overruns': self._session_overruns,
+            }
+            self._reset_counters()
+        return stats
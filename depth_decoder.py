@@ -0,0 +1,108 @@
+"""
+Market Depth Decoder
+Turns raw market-depth response bytes into compact typed order-book arrays.
+Uses orjson when installed and falls back to the standard json module.
+"""
+
+import json
+import math
+from array import array
+from operator import itemgetter
+
+try:
+    import orjson
+    _loads = orjson.loads
+    JSON_BACKEND = "orjson"
+except ImportError:
+    _loads = json.loads
+    JSON_BACKEND = "json"
+
+
+def parse_number(val, default=0.0):
+    """
+    Numeric field -> float. Accepts ints, floats and numeric strings
+    (including negatives and exponents); anything else, and values that are
+    not finite (nan, inf, 1e400), returns `default`.
+    """
+    if val is None:
+        return default
+    try:
+        number = float(val) if isinstance(val, (int, float)) else float(str(val).strip())
+    except (ValueError, OverflowError):
+        return default
+    return number if math.isfinite(number) else default
+
+
+class BookSide:
+    """One side of the book as parallel float arrays, in API level order."""
+
+    __slots__ = ("prices", "volumes", "splits", "cum_volumes")
+
+    def __init__(self):
+        self.prices = array("d")
+        self.volumes = array("d")
+        self.splits = array("d")
+        self.cum_volumes = array("d")
+
+    def __len__(self):
+        return len(self.prices)
+
+
+class OrderBook:
+    """Typed market-depth snapshot."""
+
+    __slots__ = ("total_bids", "total_asks", "bids", "asks")
+
+    def __init__(self, total_bids, total_asks, bids, asks):
+        self.total_bids = total_bids
+        self.total_asks = total_asks
+        self.bids = bids
+        self.asks = asks
+
+
+_FIELDS = (
+    ("prices", "order_price"),
+    ("volumes", "volume_traded"),
+    ("splits", "split"),
+    ("cum_volumes", "volume_traded_cum_sum"),
+)
+
+
+def _decode_side(levels, missing_price):
+    side = BookSide()
+    if not levels:
+        return side
+    for name, key in _FIELDS:
+        getter = itemgetter(key)
+        missing = missing_price if name == "prices" else 0.0
+        try:
+            # Fast path: every level carries the field as a JSON number
+            values = array("d", map(getter, levels))
+        except (KeyError, TypeError, AttributeError, OverflowError):
+            try:
+                # Numeric strings
+                values = array("d", map(float, map(getter, levels)))
+            except (KeyError, TypeError, ValueError, AttributeError, OverflowError):
+                values = None
+        if values is None or not all(map(math.isfinite, values)):
+            # Nulls, blanks, missing keys or nan/inf/1e400: parse level by level
+            values = array("d", [parse_number(level.get(key), missing) for level in levels])
+        setattr(side, name, values)
+    return side
+
+
+def book_from_dict(data):
+    """Build an OrderBook from an already-decoded market-depth dict."""
+    totals = data.get("total_bids_and_asks") or {}
+    return OrderBook(
+        parse_number(totals.get("total_bids", 0)),
+        parse_number(totals.get("total_asks", 0)),
+        # A missing bid price sorts below every real bid, a missing ask above every real ask
+        _decode_side(data.get("bids_per_price"), 0.0),
+        _decode_side(data.get("asks_per_price"), float("inf")),
+    )
+
+
+def decode_depth(content):
+    """Decode response bytes straight into an OrderBook (raises ValueError on bad JSON)."""
+    return book_from_dict(_loads(content))
@@ -0,0 +1,303 @@
+"""
+History Store
+Per-symbol snapshot history in preallocated array('d') ring buffers
+instead of a deque of dicts. Appends are O(1), and the last k snapshots
+(or one field of them) are exposed as zero-copy memoryviews. Indexing and
+iteration still hand out snapshot dicts, so code written against
+deque(maxlen=HISTORY_SIZE) keeps working. Each ring also keeps running
+statistics of its ratio and mid price, updated in O(1) per append.
+"""
+
+import math
+import sys
+from array import array
+from datetime import datetime
+
+# Snapshot fields kept per row, in storage order (see analyze_bid_ask)
+FIELDS = ('timestamp', 'ratio', 'bid_volume', 'ask_volume', 'best_bid', 'best_ask', 'mid_price',
+          'spread', 'spread_pct', 'weighted_imbalance', 'bid_levels', 'ask_levels')
+FIELD_INDEX = {name: i for i, name in enumerate(FIELDS)}
+INT_FIELDS = {'bid_levels', 'ask_levels'}
+NAN = float('nan')
+
+
+def _welford_add(n, mean, m2, x):
+    """Welford update for adding x; n is the count after adding."""
+    delta = x - mean
+    mean += delta / n
+    return mean, m2 + delta * (x - mean)
+
+
+def _welford_remove(n, mean, m2, x):
+    """Inverse Welford update for removing x; n is the count after removing."""
+    if n == 0:
+        return 0.0, 0.0
+    delta = x - mean
+    mean -= delta / n
+    return mean, m2 - delta * (x - mean)
+
+
+class RollingStats:
+    """
+    Running statistics of ratio and mid price over a ring's window (its
+    last `window` snapshots), updated by SnapshotRing.append in O(1):
+
+    - sums of y and i*y for the least-squares slope of the ratio per snapshot
+    - run: consecutive snapshots with a non-decreasing ratio (not limited to the window)
+    - EWMA of ratio and mid price (span = window)
+    - Welford mean/variance of ratio and mid price, evicting the row that
+      falls out of the window
+
+    Sliding sums drift with rounding, so SnapshotRing re-sums them from
+    the buffer once per `window` appends (amortized O(1)).
+    """
+
+    __slots__ = ("window", "alpha", "count", "run", "ratio", "mid", "ratio_ewma", "mid_ewma",
+                 "_sum", "_sum_index", "_ratio_mean", "_ratio_m2", "_mid_mean", "_mid_m2")
+
+    def __init__(self, window):
+        self.window = window
+        self.alpha = 2 / (window + 1)
+        self.count = 0     # snapshots in the window
+        self.run = 0
+        self.ratio = self.mid = NAN   # newest values
+        self.ratio_ewma = self.mid_ewma = NAN
+        self._sum = self._sum_index = 0.0
+        self._ratio_mean = self._ratio_m2 = self._mid_mean = self._mid_m2 = 0.0
+
+    def push(self, ratio, mid, evicted=None):
+        """Add the newest snapshot's values; evicted is the (ratio, mid) leaving a full window."""
+        if evicted is not None:
+            old_ratio, old_mid = evicted
+            self.count -= 1
+            self._sum -= old_ratio
+            self._sum_index -= self._sum   # every remaining row moves one position down
+            self._ratio_mean, self._ratio_m2 = _welford_remove(self.count, self._ratio_mean, self._ratio_m2, old_ratio)
+            self._mid_mean, self._mid_m2 = _welford_remove(self.count, self._mid_mean, self._mid_m2, old_mid)
+        self._sum_index += self.count * ratio
+        self._sum += ratio
+        self.count += 1
+        self._ratio_mean, self._ratio_m2 = _welford_add(self.count, self._ratio_mean, self._ratio_m2, ratio)
+        self._mid_mean, self._mid_m2 = _welford_add(self.count, self._mid_mean, self._mid_m2, mid)
+        self.run = self.run + 1 if ratio >= self.ratio else 1
+        if self.ratio_ewma == self.ratio_ewma:
+            self.ratio_ewma += self.alpha * (ratio - self.ratio_ewma)
+            self.mid_ewma += self.alpha * (mid - self.mid_ewma)
+        else:
+            self.ratio_ewma, self.mid_ewma = ratio, mid
+        self.ratio, self.mid = ratio, mid
+
+    def resync(self, ratios, mids):
+        """Recompute the window sums exactly from the ratio and mid columns (oldest first)."""
+        self.count = len(ratios)
+        self._sum = math.fsum(ratios)
+        self._sum_index = math.fsum(i * y for i, y in enumerate(ratios))
+        self._ratio_mean = self._ratio_m2 = self._mid_mean = self._mid_m2 = 0.0
+        for n, (ratio, mid) in enumerate(zip(ratios, mids), 1):
+            self._ratio_mean, self._ratio_m2 = _welford_add(n, self._ratio_mean, self._ratio_m2, ratio)
+            self._mid_mean, self._mid_m2 = _welford_add(n, self._mid_mean, self._mid_m2, mid)
+
+    def slope(self):
+        """Least-squares slope of the ratio per snapshot over the window (0.0 below 2 snapshots)."""
+        n = self.count
+        if n < 2:
+            return 0.0
+        sum_x = n * (n - 1) / 2
+        sum_xx = (n - 1) * n * (2 * n - 1) / 6
+        return (n * self._sum_index - sum_x * self._sum) / (n * sum_xx - sum_x * sum_x)
+
+    def mean(self, name):
+        """Window mean of 'ratio' or 'mid'."""
+        return self._ratio_mean if name == 'ratio' else self._mid_mean
+
+    def std(self, name):
+        """Window sample standard deviation of 'ratio' or 'mid' (0.0 below 2 snapshots)."""
+        if self.count < 2:
+            return 0.0
+        m2, mean = (self._ratio_m2, self._ratio_mean) if name == 'ratio' else (self._mid_m2, self._mid_mean)
+        # A flat window leaves rounding residue in m2; below that scale the deviation is 0, not noise
+        if m2 <= 1e-12 * self.count * mean * mean:
+            return 0.0
+        return math.sqrt(m2 / (self.count - 1))
+
+    def zscores(self):
+        """
+        Z-score variants of the ratio, price and velocity factors, against
+        this symbol's own window (0.0 while the deviation is 0).
+
+        Returns:
+            dict: 'ratio' and 'mid' (newest value vs window mean, in std units),
+                  'slope' (ratio slope per snapshot, in ratio std units)
+        """
+        ratio_std, mid_std = self.std('ratio'), self.std('mid')
+        return {'ratio': (self.ratio - self._ratio_mean) / ratio_std if ratio_std else 0.0,
+                'mid': (self.mid - self._mid_mean) / mid_std if mid_std else 0.0,
+                'slope': self.slope() / ratio_std if ratio_std else 0.0}
+
+
+class SnapshotRing:
+    """
+    Fixed-capacity snapshot history for one symbol.
+
+    Every row is written twice, at slot i and i + capacity, so the newest
+    k rows always sit next to each other and window()/column() can return
+    a plain slice of the buffer. Unwritten rows are NaN. `stats` holds the
+    RollingStats of the rows in the ring.
+    """
+
+    __slots__ = ("capacity", "width", "stats", "_data", "_view", "_count")
+
+    def __init__(self, capacity, width=len(FIELDS)):
+        self.capacity = capacity
+        self.width = width
+        self._data = array('d', [NAN]) * (2 * capacity * width)
+        self._view = memoryview(self._data)
+        self._count = 0   # snapshots appended so far (may exceed capacity)
+        self.stats = RollingStats(capacity)
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    def append(self, snapshot):
+        """Store a snapshot dict (missing fields are NaN; timestamp is kept as POSIX seconds)."""
+        row = [NAN] * self.width
+        for name, value in snapshot.items():
+            index = FIELD_INDEX.get(name)
+            if index is not None:
+                row[index] = value.timestamp() if name == 'timestamp' else value
+        slot = self._count % self.capacity
+        start = slot * self.width
+        evicted = None
+        if self._count >= self.capacity:
+            evicted = (self._data[start + FIELD_INDEX['ratio']], self._data[start + FIELD_INDEX['mid_price']])
+        self._data[start:start + self.width] = array('d', row)
+        mirror = start + self.capacity * self.width
+        self._data[mirror:mirror + self.width] = self._data[start:start + self.width]
+        self._count += 1
+        self.stats.push(row[FIELD_INDEX['ratio']], row[FIELD_INDEX['mid_price']], evicted)
+        if evicted is not None and slot == self.capacity - 1:
+            self.stats.resync(self.column('ratio', self.capacity), self.column('mid_price', self.capacity))
+
+    def _end_row(self):
+        """Row index (in the mirrored half) of the newest snapshot."""
+        return (self._count - 1) % self.capacity + self.capacity
+
+    def window(self, k):
+        """
+        Zero-copy view of the newest k rows (oldest first), flattened
+        row-major, width values per row. Rows older than the first snapshot
+        are NaN, so the view is always k rows long (k <= capacity).
+        """
+        if k > self.capacity:
+            raise ValueError(f"window of {k} rows exceeds capacity {self.capacity}")
+        end = self._end_row() + 1 if self._count else self.capacity
+        return self._view[(end - k) * self.width:end * self.width]
+
+    def column(self, name, k):
+        """Zero-copy view of one field over the newest min(k, len) snapshots, oldest first."""
+        k = min(k, len(self))
+        if not k:
+            return self._view[0:0]
+        index = FIELD_INDEX[name]
+        end = self._end_row()
+        return self._view[(end - k + 1) * self.width + index:end * self.width + index + 1:self.width]
+
+    def value(self, position, name):
+        """One field of one snapshot, position counted like a list index (-1 = newest)."""
+        size = len(self)
+        if position < 0:
+            position += size
+        if not 0 <= position < size:
+            raise IndexError("snapshot index out of range")
+        return self._data[(self._end_row() - (size - 1 - position)) * self.width + FIELD_INDEX[name]]
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        size = len(self)
+        if position < 0:
+            position += size
+        if not 0 <= position < size:
+            raise IndexError("snapshot index out of range")
+        start = (self._end_row() - (size - 1 - position)) * self.width
+        snapshot = dict(zip(FIELDS, self._data[start:start + self.width]))
+        timestamp = snapshot['timestamp']
+        snapshot['timestamp'] = datetime.fromtimestamp(timestamp) if timestamp == timestamp else None
+        for name in INT_FIELDS:
+            if snapshot[name] == snapshot[name]:
+                snapshot[name] = int(snapshot[name])
+        return snapshot
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+    def __bool__(self):
+        return self._count > 0
+
+    def nbytes(self):
+        """Bytes held by this ring (buffer plus object headers)."""
+        return sys.getsizeof(self._data) + sys.getsizeof(self) + sys.getsizeof(self._view) + sys.getsizeof(self.stats)
+
+
+class HistoryStore:
+    """
+    stock_code -> SnapshotRing, with the dict methods the monitor uses
+    (get, [], in, pop, values, clear). Rings are created on first append.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._rings = {}
+
+    def append(self, code, snapshot):
+        ring = self._rings.get(code)
+        if ring is None:
+            ring = self._rings.setdefault(code, SnapshotRing(self.capacity))
+        ring.append(snapshot)
+
+    def __getitem__(self, code):
+        return self._rings[code]
+
+    def __contains__(self, code):
+        return code in self._rings
+
+    def __len__(self):
+        return len(self._rings)
+
+    def __iter__(self):
+        return iter(self._rings)
+
+    def get(self, code, default=None):
+        return self._rings.get(code, default)
+
+    def pop(self, code, default=None):
+        return self._rings.pop(code, default)
+
+    def values(self):
+        return self._rings.values()
+
+    def items(self):
+        return self._rings.items()
+
+    def clear(self):
+        self._rings.clear()
+
+    def stack_windows(self, codes, k):
+        """
+        The newest k rows of every code's ring concatenated into one bytes
+        buffer (N x k x len(FIELDS) doubles, NaN where a symbol has fewer
+        than k snapshots), for numpy.frombuffer. One C-level join, no per-field work.
+
+        Returns:
+            bytes: the stacked windows
+            list: snapshots held per code
+        """
+        rings = [self._rings[code] for code in codes]
+        return b"".join([ring.window(k) for ring in rings]), [len(ring) for ring in rings]
+
+    def memory_per_symbol(self):
+        """Average bytes per symbol held by the rings (0 when empty)."""
+        if not self._rings:
+            return 0
+        return sum(ring.nbytes() for ring in self._rings.values()) / len(self._rings)
@@ -0,0 +1,321 @@
+"""
+Shared HTTP Session Layer
+Pooled keep-alive sessions reused by every outbound call (market depth, quotes, Telegram).
+Hosts registered with enable_http2() are served over one multiplexed HTTP/2
+connection instead, falling back to the HTTP/1.1 pool if the server can't.
+"""
+
+import contextlib
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from tail_latency import percentile
+
+try:
+    import httpx
+    import h2  # noqa: F401  httpx only speaks HTTP/2 when h2 is installed
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Exceptions that mean a GET ran into its timeout, over either transport
+TIMEOUT_ERRORS = (requests.exceptions.Timeout, TimeoutError) + ((httpx.TimeoutException,) if HTTP2_AVAILABLE else ())
+
+# Default connections kept alive per host; price_depth.py resizes this to MAX_WORKERS
+DEFAULT_POOL_SIZE = 12
+
+_sessions = {}           # host -> requests.Session
+_sessions_lock = threading.Lock()
+_pool_size = DEFAULT_POOL_SIZE
+
+_counters = {}           # host -> {'requests', 'connects', 'completed', 'failed', 'in_flight'}
+_counters_lock = threading.Lock()
+
+_h2_clients = {}         # host -> httpx.Client for hosts registered with enable_http2()
+_h2_fallback = {}        # host -> reason it was moved back to HTTP/1.1
+_h2_streams = {}         # host -> {'streams': int, 'latency': deque of seconds per stream}
+_h2_lock = threading.Lock()
+H2_LATENCY_WINDOW = 500
+
+
+def _entry(host):
+    # Call with _counters_lock held
+    entry = _counters.get(host)
+    if entry is None:
+        entry = _counters[host] = {'requests': 0, 'connects': 0, 'completed': 0, 'failed': 0, 'in_flight': 0}
+    return entry
+
+
+def _count(host, field):
+    with _counters_lock:
+        _entry(host)[field] += 1
+
+
+def count_connect(url):
+    """Record a new TCP/TLS connection to the host of `url` (for clients that don't use the pooled sessions)."""
+    _count(_host_key(url), 'connects')
+
+
+@contextlib.contextmanager
+def track_request(url):
+    """
+    Count one request to the host of `url` in get_pool_stats(): in flight
+    while the block runs, then completed, or failed if it raised (timeouts
+    and cancellation included). Every client counts through here: the
+    pooled sessions and async_fetch's aiohttp connector.
+    """
+    key = _host_key(url)
+    with _counters_lock:
+        entry = _entry(key)
+        entry['requests'] += 1
+        entry['in_flight'] += 1
+    outcome = 'failed'
+    try:
+        yield
+        outcome = 'completed'
+    finally:
+        with _counters_lock:
+            entry['in_flight'] -= 1
+            entry[outcome] += 1
+
+
+class _CountingHTTPConnection(HTTPConnection):
+    def connect(self):
+        _count(f"http://{self.host}:{self.port}", 'connects')
+        super().connect()
+
+
+class _CountingHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        _count(f"https://{self.host}:{self.port}", 'connects')
+        super().connect()
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CountingHTTPConnection
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CountingHTTPSConnection
+
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools count every real TCP/TLS connect."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool,
+        }
+
+
+def configure_pools(pool_size):
+    """Set the per-host pool size. Existing sessions are rebuilt on next use."""
+    global _pool_size
+    with _sessions_lock:
+        if pool_size == _pool_size:
+            return
+        _pool_size = pool_size
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def _host_key(url):
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    return f"{parts.scheme}://{parts.hostname}:{port}"
+
+
+def get_session(url):
+    """Return the shared keep-alive session for the host of `url`."""
+    key = _host_key(url)
+    session = _sessions.get(key)
+    if session is not None:
+        return session
+
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            # Connections beyond pool_maxsize are opened and discarded after use,
+            # so they show up as misses in get_pool_stats()
+            adapter = _PooledAdapter(pool_connections=1, pool_maxsize=_pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[key] = session
+        return session
+
+
+def enable_http2(url, max_connections=1):
+    """
+    Send GETs for the host of `url` over HTTP/2, multiplexing concurrent
+    requests as streams on `max_connections` connection(s). https negotiates
+    h2 through ALPN; plain http uses h2c with prior knowledge. On a shared
+    connection a read timeout means the whole connection went quiet, and
+    httpx reconnects on the next request.
+
+    Returns:
+        bool: False when httpx/h2 are not installed (the host stays on HTTP/1.1)
+    """
+    if not HTTP2_AVAILABLE:
+        return False
+    key = _host_key(url)
+    with _h2_lock:
+        if key not in _h2_clients and key not in _h2_fallback:
+            limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+            _h2_clients[key] = httpx.Client(http2=True, http1=key.startswith("https://"), limits=limits)
+    return True
+
+
+def uses_http2(url):
+    """True while the host of `url` is being served over HTTP/2."""
+    return _host_key(url) in _h2_clients
+
+
+def _fall_back(key, reason):
+    """Move a host back to the HTTP/1.1 pool for the rest of the run."""
+    with _h2_lock:
+        client = _h2_clients.pop(key, None)
+        if client is None:
+            return
+        _h2_fallback[key] = reason
+    print(f"⚠️ HTTP/2 unavailable for {urlsplit(key).hostname}, falling back to HTTP/1.1: {reason}")
+    client.close()
+
+
+def _record_stream(key, seconds):
+    with _h2_lock:
+        entry = _h2_streams.get(key)
+        if entry is None:
+            entry = _h2_streams[key] = {'streams': 0, 'latency': deque(maxlen=H2_LATENCY_WINDOW)}
+        entry['streams'] += 1
+        entry['latency'].append(seconds)
+
+
+def _h2_get(key, client, url, kwargs):
+    """GET over HTTP/2; None when the host had to fall back and the caller should use HTTP/1.1."""
+    start = time.monotonic()
+    try:
+        response = client.get(url, params=kwargs.get('params'), headers=kwargs.get('headers'),
+                              timeout=kwargs.get('timeout'))
+    except (httpx.RemoteProtocolError, httpx.LocalProtocolError, httpx.UnsupportedProtocol) as e:
+        # Only a host that never completed an h2 stream is written off; after that a
+        # protocol error is a per-request failure like any other network error
+        if key in _h2_streams:
+            raise
+        _fall_back(key, f"{type(e).__name__}: {e}")
+        return None
+    if response.http_version != "HTTP/2":
+        _fall_back(key, f"server negotiated {response.http_version}")
+        return response
+    _record_stream(key, time.monotonic() - start)
+    return response
+
+
+def get(url, **kwargs):
+    """Pooled equivalent of requests.get (over HTTP/2 for hosts registered with enable_http2)."""
+    key = _host_key(url)
+    client = _h2_clients.get(key)
+    if client is not None:
+        response = _h2_get(key, client, url, kwargs)
+        if response is not None:
+            return response
+    session = get_session(url)
+    with track_request(url):
+        return session.get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    """Pooled equivalent of requests.post."""
+    session = get_session(url)
+    with track_request(url):
+        return session.post(url, **kwargs)
+
+
+def get_pool_stats():
+    """
+    Connection reuse and request outcome counters per host.
+
+    Returns:
+        dict: host -> {'requests', 'hits', 'misses', 'hit_rate', 'completed', 'failed', 'in_flight'}
+              A miss is a request that had to open a new TCP/TLS connection
+              (first use, pool overflow, or a server-side keep-alive close).
+    """
+    with _counters_lock:
+        snapshot = {host: dict(entry) for host, entry in _counters.items()}
+
+    stats = {}
+    for host, entry in snapshot.items():
+        requests_made = entry['requests']
+        misses = min(entry['connects'], requests_made)
+        hits = requests_made - misses
+        stats[host] = {
+            'requests': requests_made,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': (hits / requests_made) if requests_made else 0.0,
+            'completed': entry['completed'],
+            'failed': entry['failed'],
+            'in_flight': entry['in_flight'],
+        }
+    return stats
+
+
+def get_http2_stats():
+    """
+    HTTP/2 stream counters per host.
+
+    Returns:
+        dict: host -> {'streams', 'p50', 'p95'} (latencies in seconds over the
+              last H2_LATENCY_WINDOW streams), plus 'fallback' with the reason
+              for hosts that were moved back to HTTP/1.1
+    """
+    with _h2_lock:
+        snapshot = {host: (entry['streams'], sorted(entry['latency'])) for host, entry in _h2_streams.items()}
+        fallback = dict(_h2_fallback)
+    stats = {}
+    for host, (streams, ordered) in snapshot.items():
+        stats[host] = {'streams': streams, 'p50': percentile(ordered, 0.50), 'p95': percentile(ordered, 0.95)}
+    for host, reason in fallback.items():
+        stats.setdefault(host, {'streams': 0, 'p50': None, 'p95': None})['fallback'] = reason
+    return stats
+
+
+def format_pool_stats():
+    """One-line summary of pool hit/miss counters (and HTTP/2 streams) for logs."""
+    parts = []
+    for host, s in get_pool_stats().items():
+        line = (f"{urlsplit(host).hostname}: {s['hits']}/{s['requests']} reused, "
+                f"{s['misses']} new ({s['hit_rate']*100:.0f}%)")
+        if s['failed'] or s['in_flight']:
+            line += f", {s['failed']} failed, {s['in_flight']} in flight"
+        parts.append(line)
+    for host, s in get_http2_stats().items():
+        if 'fallback' in s:
+            parts.append(f"{urlsplit(host).hostname}: h2 fell back to HTTP/1.1")
+        elif s['streams']:
+            parts.append(f"{urlsplit(host).hostname}: h2 {s['streams']} streams, "
+                         f"p50 {s['p50']*1000:.0f}ms p95 {s['p95']*1000:.0f}ms")
+    return "; ".join(parts) if parts else "no pooled connections yet"
+
+
+def close_all():
+    """Close every pooled connection (used at system shutdown)."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+    with _h2_lock:
+        clients = list(_h2_clients.values())
+        _h2_clients.clear()
+    for client in clients:
+        client.close()
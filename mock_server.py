@@ -0,0 +1,475 @@
+"""
+Mock Market Server
+Local stand-in for the market-depth and getBook5 APIs, for load and fault
+testing without touching production. Serves realistic books for any
+symbol, with configurable latency, 429 bursts, 5xx errors and token expiry.
+
+Usage:
+    python mock_server.py --port 8765 --write-stocks 1000 mock_stocks.csv \
+        --latency lognormal:40:0.5 --error-rate 0.01 --burst-every 60 --burst-length 5
+
+Then point the monitor at it:
+    DEPTH_API_BASE_URL=http://127.0.0.1:8765/assets-service/market-depth/ \
+    QUOTE_API_URL=http://127.0.0.1:8765/EGXAPI-V2 \
+    STOCKS_FILE=mock_stocks.csv python price_depth.py
+
+With --http2 (needs the h2 package) the same port also accepts h2c
+(HTTP/2 with prior knowledge); HTTP/1.1 clients are still served.
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import math
+import random
+import socket
+import threading
+import time
+import uuid
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.events
+    import h2.exceptions
+    H2_AVAILABLE = True
+except ImportError:
+    H2_AVAILABLE = False
+
+DEPTH_PATH = "/assets-service/market-depth/"
+QUOTE_PATH = "/EGXAPI-V2"
+STATS_PATH = "/__stats"
+H2_PREFACE = b"PRI * HTTP/2.0\r\n\r\nSM\r\n\r\n"
+
+
+def make_depth_payload(levels=20, seed=None, as_strings=False, mid=None):
+    """
+    Build a market-depth payload shaped like the assets-service response.
+    as_strings renders level fields as numeric strings, which the API also sends.
+    mid fixes the midpoint (random between 1 and 100 by default).
+    """
+    rng = random.Random(seed)
+    mid = rng.uniform(1, 100) if mid is None else mid
+    tick = round(mid * 0.001, 3) or 0.001
+    bids, asks = [], []
+    bid_cum = ask_cum = 0
+    for i in range(levels):
+        bid_vol = rng.randint(100, 50000)
+        ask_vol = rng.randint(100, 50000)
+        bid_cum += bid_vol
+        ask_cum += ask_vol
+        bids.append({"order_price": round(mid - (i + 1) * tick, 3), "volume_traded": bid_vol,
+                     "split": rng.randint(1, 20), "volume_traded_cum_sum": bid_cum})
+        asks.append({"order_price": round(mid + (i + 1) * tick, 3), "volume_traded": ask_vol,
+                     "split": rng.randint(1, 20), "volume_traded_cum_sum": ask_cum})
+    if as_strings:
+        for level in bids + asks:
+            for key, value in level.items():
+                level[key] = str(value)
+    return {
+        "total_bids_and_asks": {"total_bids": bid_cum, "total_asks": ask_cum},
+        "bids_per_price": bids,
+        "asks_per_price": asks,
+    }
+
+
+def make_book5_payload(symbol, depth):
+    """getBook5-style quote for `symbol`, consistent with its depth payload."""
+    bids, asks = depth["bids_per_price"][:5], depth["asks_per_price"][:5]
+    best_bid = bids[0]["order_price"] if bids else 0
+    best_ask = asks[0]["order_price"] if asks else 0
+    return {"data": {
+        "symbol": symbol,
+        "lastPrice": round((best_bid + best_ask) / 2, 3) if bids and asks else best_bid or best_ask,
+        "bestBid": best_bid,
+        "bestAsk": best_ask,
+        "bids": [{"price": b["order_price"], "volume": b["volume_traded"]} for b in bids],
+        "asks": [{"price": a["order_price"], "volume": a["volume_traded"]} for a in asks],
+    }}
+
+
+def parse_latency(spec):
+    """
+    Latency spec -> function returning seconds:
+        fixed:MS | uniform:LO_MS:HI_MS | lognormal:MEDIAN_MS:SIGMA | exp:MEAN_MS
+    """
+    kind, *params = spec.split(":")
+    values = [float(p) for p in params]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0] / 1000
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal" and len(values) == 2:
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1]) / 1000
+    if kind == "exp" and len(values) == 1:
+        return lambda rng: rng.expovariate(1 / values[0]) / 1000
+    raise ValueError(f"bad latency spec {spec!r} (fixed:MS, uniform:LO:HI, lognormal:MEDIAN:SIGMA, exp:MEAN)")
+
+
+def write_stocks_file(path, count, prefix="MOCK"):
+    """Write a STOCKS.csv-style file (code,id) with `count` synthetic symbols; returns the rows."""
+    rows = [[f"{prefix}{i:04d}", str(uuid.uuid5(uuid.NAMESPACE_URL, f"mock-stock/{prefix}{i:04d}"))]
+            for i in range(count)]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(rows)
+    return rows
+
+
+def _has_h2_preface(sock):
+    """Peek (without consuming) whether a new connection opens with the HTTP/2 client preface."""
+    seen = b""
+    for _ in range(50):
+        seen = sock.recv(len(H2_PREFACE), socket.MSG_PEEK)
+        if not seen or not H2_PREFACE.startswith(seen):
+            return False
+        if len(seen) == len(H2_PREFACE):
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class _MockHTTPServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer that hands h2c connections to the mock's HTTP/2 loop."""
+
+    daemon_threads = True
+    mock = None
+
+    def finish_request(self, request, client_address):
+        if self.mock.http2 and _has_h2_preface(request):
+            self.mock._serve_h2(request)
+        else:
+            super().finish_request(request, client_address)
+
+
+class MockMarketServer:
+    """
+    Threaded keep-alive HTTP/1.1 server (plus h2c with http2=True).
+
+    Each response waits `latency`, or slow_ms for slow_symbols and for a
+    random slow_fraction of requests.
+
+    Faults, checked in this order for every request:
+        require_auth / token_ttl   401 without a token, or once a token is older than token_ttl
+        revoked_tokens             401 for these bearer tokens
+        burst_every / burst_length 429 for every request inside each burst window
+        rate_limit                 429 above this many requests/second (per bearer token
+                                   with rate_limit_per_token, like per-account API limits)
+        dead_symbols               503 always for these symbols / depth ids
+        error_rate                 random 500/502/503
+    Books stay fixed unless book_period is set, in which case every symbol
+    gets a new book each book_period seconds; with etags the server answers
+    If-None-Match with 304 while a book is unchanged.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, levels=20, latency="fixed:40", slow_ms=None, slow_fraction=0.0,
+                 slow_symbols=(), error_rate=0.0, dead_symbols=(), rate_limit=None, burst_every=None, burst_length=0.0,
+                 rate_limit_per_token=False, token_ttl=None, require_auth=False, revoked_tokens=(),
+                 book_period=None, etags=True, stocks=None, seed=1, http2=False):
+        if http2 and not H2_AVAILABLE:
+            raise RuntimeError("http2=True needs the h2 package (pip install h2)")
+        self.http2 = http2
+        self.levels = levels
+        self.latency = parse_latency(latency)
+        self.slow_ms = slow_ms
+        self.slow_fraction = slow_fraction
+        self.slow_symbols = set(slow_symbols)
+        self.error_rate = error_rate
+        self.dead_symbols = set(dead_symbols)
+        self.rate_limit = rate_limit
+        self.rate_limit_per_token = rate_limit_per_token
+        self.revoked_tokens = set(revoked_tokens)
+        self.burst_every = burst_every
+        self.burst_length = burst_length
+        self.token_ttl = token_ttl
+        self.require_auth = require_auth
+        self.book_period = book_period
+        self.etags = etags
+        self.symbol_by_id = {row[1]: row[0] for row in (stocks or []) if len(row) > 1}
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._books = {}          # symbol -> (epoch, depth dict, body bytes, etag)
+        self._token_seen = {}     # token -> monotonic time first seen
+        self._buckets = {}        # token (None unless rate_limit_per_token) -> (tokens left, last refill)
+        self._started = time.monotonic()
+        self._counts = {}
+
+        self._httpd = _MockHTTPServer((host, port), self._handler_class())
+        self._httpd.mock = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def depth_url(self):
+        return self.base_url + DEPTH_PATH
+
+    @property
+    def quote_url(self):
+        return self.base_url + QUOTE_PATH
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-market", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def _count(self, key):
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def _book(self, symbol):
+        epoch = int((time.monotonic() - self._started) // self.book_period) if self.book_period else 0
+        with self._lock:
+            cached = self._books.get(symbol)
+            if cached is not None and cached[0] == epoch:
+                return cached
+        # Each symbol keeps its own price level; every new book drifts around it (sigma 0.4%)
+        mid = random.Random(symbol).uniform(1, 100) * (1 + random.Random(f"{symbol}:{epoch}:mid").gauss(0, 0.004))
+        depth = make_depth_payload(self.levels, seed=f"{symbol}:{epoch}", mid=mid)
+        body = json.dumps(depth).encode()
+        etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+        entry = (epoch, depth, body, etag)
+        with self._lock:
+            self._books[symbol] = entry
+        return entry
+
+    def _fault(self, headers, symbol):
+        """Status code of the injected fault for this request, or None."""
+        now = time.monotonic()
+        auth = headers.get("Authorization")
+        if self.require_auth and not auth:
+            return 401
+        if auth and auth.split()[-1] in self.revoked_tokens:
+            return 401
+        if self.token_ttl is not None and auth:
+            with self._lock:
+                first_seen = self._token_seen.setdefault(auth, now)
+            if now - first_seen > self.token_ttl:
+                return 401
+        if self.burst_every and (now - self._started) % self.burst_every < self.burst_length:
+            return 429
+        if self.rate_limit:
+            with self._lock:
+                key = auth if self.rate_limit_per_token else None
+                tokens, last_refill = self._buckets.get(key, (float(self.rate_limit), now))
+                tokens = min(self.rate_limit, tokens + (now - last_refill) * self.rate_limit)
+                self._buckets[key] = (tokens - 1 if tokens >= 1 else tokens, now)
+                if tokens < 1:
+                    return 429
+        if symbol in self.dead_symbols:
+            return 503
+        with self._lock:
+            if self.error_rate and self._rng.random() < self.error_rate:
+                return self._rng.choice((500, 502, 503))
+        return None
+
+    def _delay(self, symbol=None):
+        with self._lock:
+            if symbol in self.slow_symbols:
+                return (self.slow_ms or 0) / 1000
+            if self.slow_ms is not None and self._rng.random() < self.slow_fraction:
+                return self.slow_ms / 1000
+            return self.latency(self._rng)
+
+    def _respond(self, target, headers):
+        """
+        Answer one GET for either transport.
+
+        Returns:
+            tuple: (status, body bytes, extra headers dict)
+        """
+        url = urlsplit(target)
+        if url.path == STATS_PATH:
+            return 200, json.dumps(self.stats(), default=str).encode(), {}
+        if url.path.startswith(DEPTH_PATH):
+            depth_id = url.path[len(DEPTH_PATH):]
+            symbol = self.symbol_by_id.get(depth_id, depth_id)
+        elif url.path == QUOTE_PATH:
+            symbol = parse_qs(url.query).get("symbol", [""])[0]
+        else:
+            return 404, b'{"error": "not found"}', {}
+
+        self._count("getBook5" if url.path == QUOTE_PATH else "depth")
+        time.sleep(self._delay(symbol))
+        fault = self._fault(headers, symbol)
+        if fault is not None:
+            return fault, json.dumps({"error": fault}).encode(), {"Retry-After": "1"} if fault == 429 else {}
+
+        _, depth, body, etag = self._book(symbol)
+        if url.path == QUOTE_PATH:
+            return 200, json.dumps(make_book5_payload(symbol, depth)).encode(), {}
+        if self.etags and headers.get("If-None-Match") == etag:
+            return 304, b"", {"ETag": etag}
+        return 200, body, {"ETag": etag} if self.etags else {}
+
+    def _handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                status, body, extra_headers = mock._respond(self.path, self.headers)
+                mock._count(status)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in extra_headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client gave up (timeout or cancelled hedge)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def _serve_h2(self, sock):
+        """
+        h2c connection loop: this thread reads frames, and each request runs
+        on its own thread so slow responses don't hold up other streams.
+        """
+        conn = h2.connection.H2Connection(
+            config=h2.config.H2Configuration(client_side=False, header_encoding="utf-8"))
+        cond = threading.Condition()   # guards conn and socket writes; notified on WINDOW_UPDATE
+        pending = {}                   # stream id -> request headers, until END_STREAM
+        closed = threading.Event()
+        self._count("h2_connections")
+
+        def serve_stream(stream_id, request_headers):
+            # Header names are lowercase in HTTP/2; _fault/_respond look them up HTTP/1.1-style
+            headers = {name.title(): value for name, value in request_headers.items()}
+            status, body, extra_headers = self._respond(request_headers.get(":path", "/"), headers)
+            self._count(status)
+            self._count("h2_streams")
+            response_headers = [(":status", str(status)), ("content-type", "application/json"),
+                                ("content-length", str(len(body)))]
+            response_headers += [(name.lower(), value) for name, value in extra_headers.items()]
+            try:
+                with cond:
+                    conn.send_headers(stream_id, response_headers, end_stream=not body)
+                    sock.sendall(conn.data_to_send())
+                    while body and not closed.is_set():
+                        window = min(conn.local_flow_control_window(stream_id), conn.max_outbound_frame_size)
+                        if window <= 0:
+                            cond.wait(timeout=1)
+                            continue
+                        chunk, body = body[:window], body[window:]
+                        conn.send_data(stream_id, chunk, end_stream=not body)
+                        sock.sendall(conn.data_to_send())
+            except (h2.exceptions.StreamClosedError, h2.exceptions.ProtocolError, OSError):
+                pass  # the client reset the stream (timeout or cancelled hedge) or went away
+
+        try:
+            with cond:
+                conn.initiate_connection()
+                sock.sendall(conn.data_to_send())
+            while True:
+                data = sock.recv(65535)
+                if not data:
+                    break
+                with cond:
+                    events = conn.receive_data(data)
+                    sock.sendall(conn.data_to_send())
+                    cond.notify_all()
+                for event in events:
+                    if isinstance(event, h2.events.RequestReceived):
+                        pending[event.stream_id] = dict(event.headers)
+                    elif isinstance(event, h2.events.StreamEnded) and event.stream_id in pending:
+                        threading.Thread(target=serve_stream, args=(event.stream_id, pending.pop(event.stream_id)),
+                                         name="mock-h2-stream", daemon=True).start()
+                    elif isinstance(event, h2.events.ConnectionTerminated):
+                        return
+        except (h2.exceptions.ProtocolError, OSError):
+            pass
+        finally:
+            closed.set()
+            with cond:
+                cond.notify_all()
+
+
+def start_mock_server(**options):
+    """Create and start a MockMarketServer on a free local port."""
+    return MockMarketServer(**options).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local market-depth / getBook5 stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--levels", type=int, default=20, help="price levels per book side")
+    parser.add_argument("--latency", default="fixed:40",
+                        help="fixed:MS | uniform:LO:HI | lognormal:MEDIAN:SIGMA | exp:MEAN")
+    parser.add_argument("--slow-ms", type=float, help="latency of the slow tail")
+    parser.add_argument("--slow-fraction", type=float, default=0.0, help="share of requests in the slow tail")
+    parser.add_argument("--slow-symbols", default="", help="comma-separated symbols always served at --slow-ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 5xx")
+    parser.add_argument("--dead-symbols", default="", help="comma-separated symbols that always return 503")
+    parser.add_argument("--rate-limit", type=float, help="requests/second above which 429 is returned")
+    parser.add_argument("--burst-every", type=float, help="seconds between 429 bursts")
+    parser.add_argument("--burst-length", type=float, default=0.0, help="seconds each 429 burst lasts")
+    parser.add_argument("--rate-limit-per-token", action="store_true", help="apply --rate-limit to each token")
+    parser.add_argument("--revoked-tokens", default="", help="comma-separated bearer tokens answered with 401")
+    parser.add_argument("--token-ttl", type=float, help="seconds a bearer token stays valid after first use")
+    parser.add_argument("--require-auth", action="store_true", help="401 for requests without a bearer token")
+    parser.add_argument("--book-period", type=float, help="seconds between book changes (default: static books)")
+    parser.add_argument("--no-etags", action="store_true", help="don't send ETag / answer 304")
+    parser.add_argument("--http2", action="store_true", help="also accept h2c (HTTP/2 prior knowledge); needs h2")
+    parser.add_argument("--stocks", help="existing STOCKS.csv, so depth ids map to symbols")
+    parser.add_argument("--write-stocks", nargs=2, metavar=("COUNT", "PATH"),
+                        help="write a stocks file with COUNT synthetic symbols and serve it")
+    args = parser.parse_args()
+
+    stocks = None
+    if args.write_stocks:
+        count, path = int(args.write_stocks[0]), args.write_stocks[1]
+        stocks = write_stocks_file(path, count)
+        print(f"📝 Wrote {count} symbols to {path}")
+    elif args.stocks:
+        with open(args.stocks, encoding="utf-8") as f:
+            stocks = [row for row in csv.reader(f) if row and not row[0].strip().startswith("#")]
+
+    server = MockMarketServer(
+        host=args.host, port=args.port, levels=args.levels, latency=args.latency,
+        slow_ms=args.slow_ms, slow_fraction=args.slow_fraction,
+        slow_symbols=[s for s in args.slow_symbols.split(",") if s], error_rate=args.error_rate,
+        dead_symbols=[s for s in args.dead_symbols.split(",") if s], rate_limit=args.rate_limit,
+        burst_every=args.burst_every, burst_length=args.burst_length, token_ttl=args.token_ttl,
+        rate_limit_per_token=args.rate_limit_per_token,
+        revoked_tokens=[t for t in args.revoked_tokens.split(",") if t], require_auth=args.require_auth,
+        book_period=args.book_period, etags=not args.no_etags, stocks=stocks, http2=args.http2,
+    ).start()
+    print(f"🧪 Mock market server on {server.base_url}")
+    print(f"   DEPTH_API_BASE_URL={server.depth_url}")
+    print(f"   QUOTE_API_URL={server.quote_url}")
+    if args.write_stocks:
+        print(f"   STOCKS_FILE={args.write_stocks[1]}")
+    print(f"   stats: {server.base_url}{STATS_PATH}")
+    try:
+        while True:
+            time.sleep(60)
+            print(f"📊 {server.stats()}")
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
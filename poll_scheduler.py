@@ -0,0 +1,127 @@
+"""
+Adaptive Polling Scheduler
+Picks which symbols to fetch on each tick: hot symbols (near the STRONG
+threshold or moving fast) are polled more often, dormant ones less, and
+the total request rate is kept within a configured budget.
+"""
+
+import threading
+import time
+
+
+class AdaptivePollScheduler:
+    """
+    Per-symbol poll intervals driven by the latest score and book activity.
+
+    Intervals (seconds) by tier:
+        hot      score >= hot_score                      -> min_interval
+        active   score >= active_score or moving fast    -> base_interval / 2
+        normal   everything else                         -> base_interval
+        dormant  empty book, or unchanged for dormant_after polls -> max_interval
+
+    When the summed demand (sum of 1/interval) exceeds request_budget
+    (requests/second), every interval is stretched by the same factor.
+    """
+
+    def __init__(self, base_interval=10, min_interval=2, max_interval=60, request_budget=10.0,
+                 hot_score=60, active_score=40, move_threshold=0.05, dormant_after=3):
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.request_budget = request_budget
+        self.hot_score = hot_score
+        self.active_score = active_score
+        self.move_threshold = move_threshold
+        self.dormant_after = dormant_after
+
+        self._lock = threading.Lock()
+        self._interval = {}      # code -> desired interval before budget stretch
+        self._tier = {}          # code -> tier name
+        self._next_due = {}      # code -> time.monotonic() of next poll
+        self._last_seen = {}     # code -> (ratio, mid_price) at last observation
+        self._quiet_polls = {}   # code -> consecutive polls without movement
+        self._stretch = 1.0
+
+    def register(self, codes):
+        """Add symbols at the base interval, due immediately."""
+        now = time.monotonic()
+        with self._lock:
+            for code in codes:
+                if code not in self._interval:
+                    self._interval[code] = self.base_interval
+                    self._tier[code] = "normal"
+                    self._next_due[code] = now
+            self._recompute_stretch()
+
+    def unregister(self, codes):
+        """Drop symbols that are no longer monitored, so they stop counting against the budget."""
+        with self._lock:
+            for code in codes:
+                for table in (self._interval, self._tier, self._next_due, self._last_seen, self._quiet_polls):
+                    table.pop(code, None)
+            self._recompute_stretch()
+
+    def _recompute_stretch(self):
+        demand = sum(1.0 / interval for interval in self._interval.values())
+        self._stretch = max(1.0, demand / self.request_budget) if self.request_budget else 1.0
+
+    def _classify(self, code, score, ratio, mid_price, empty_book):
+        last = self._last_seen.get(code)
+        moved = False
+        if last is not None:
+            last_ratio, last_mid = last
+            if last_ratio and abs(ratio - last_ratio) / last_ratio > self.move_threshold:
+                moved = True
+            if last_mid and mid_price != last_mid:
+                moved = True
+            quiet = 0 if (moved or ratio != last_ratio) else self._quiet_polls.get(code, 0) + 1
+        else:
+            quiet = 0
+        self._quiet_polls[code] = quiet
+        self._last_seen[code] = (ratio, mid_price)
+
+        if empty_book:
+            return "dormant", self.max_interval
+        if score >= self.hot_score:
+            return "hot", self.min_interval
+        if score >= self.active_score or moved:
+            return "active", max(self.min_interval, self.base_interval / 2)
+        if quiet >= self.dormant_after:
+            return "dormant", self.max_interval
+        return "normal", self.base_interval
+
+    def observe(self, code, score, ratio, mid_price, empty_book):
+        """Update a symbol's tier from its freshly analyzed snapshot."""
+        with self._lock:
+            tier, interval = self._classify(code, score, ratio, mid_price, empty_book)
+            self._tier[code] = tier
+            self._interval[code] = interval
+            self._recompute_stretch()
+
+    def due(self, codes, now=None, tolerance=0.5):
+        """Return the subset of `codes` whose next poll time has arrived, in input order."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return [code for code in codes if self._next_due.get(code, 0) <= now + tolerance]
+
+    def mark_polled(self, codes, now=None):
+        """Schedule the next poll for every code just fetched."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            for code in codes:
+                interval = self._interval.get(code, self.base_interval)
+                self._next_due[code] = now + interval * self._stretch
+
+    def stats(self):
+        """Tier counts and the planned request rate after the budget stretch."""
+        with self._lock:
+            tiers = {}
+            for tier in self._tier.values():
+                tiers[tier] = tiers.get(tier, 0) + 1
+            demand = sum(1.0 / interval for interval in self._interval.values())
+            return {
+                'tiers': tiers,
+                'stretch': self._stretch,
+                'planned_rate': demand / self._stretch,
+                'budget': self.request_budget,
+            }
@@ -1,15 +1,35 @@
 import os
 import json
-import requests
 from datetime import datetime
 import time
 import csv
 # import oracledb  # Commented out for GitHub Actions deployment
 import threading
 import concurrent.futures
+import asyncio
 from datetime import time as dtime
-from collections import deque
 import statistics
+import hashlib
+
+import http_session
+from async_fetch import AsyncFetchEngine
+from worker_pool import FetchWorkerPool
+from rate_limiter import AdaptiveRateLimiter
+from depth_decoder import decode_depth, book_from_dict, parse_number, OrderBook
+from book_reducer import reduce_book
+from poll_scheduler import AdaptivePollScheduler
+from cycle_scheduler import FixedRateScheduler
+from circuit_breaker import BreakerRegistry, OPEN, HALF_OPEN
+from tail_latency import LatencyTracker, HedgeBudget, hedged_call, hedged_await
+from quote_cache import Quote, QuoteCache
+from sharding import ShardCoordinator
+from dispatch_order import CostEstimator
+from token_pool import TokenPool, ACTIVE, THROTTLED, EXPIRED
+from screening_funnel import ScreeningFunnel
+from alert_pipeline import StagedPipeline, AlertLatency
+import batch_scoring
+from history_store import HistoryStore
+from scoring_factors import FactorRegistry, DEFAULT_FACTORS, explain, run_factors
 
 from datetime import datetime
 try:
@@ -20,7 +40,7 @@ except ImportError:
 
 # Telegram integration
 try:
-    from telegram_msg import send_telegram_message, format_stock_alert, format_market_summary
+    from telegram_msg import send_telegram_message, format_stock_alert, format_market_summary, report_config
     TELEGRAM_ENABLED = True
 except ImportError:
     TELEGRAM_ENABLED = False
@@ -28,23 +48,25 @@ except ImportError:
 
 # Token management system
 try:
-    from token_manager import wait_for_token_at_startup, check_for_new_token, get_api_token
+    from token_manager import wait_for_token_at_startup, check_for_new_token, get_api_token, load_token_pool
     TOKEN_MANAGER_ENABLED = True
 except ImportError:
     TOKEN_MANAGER_ENABLED = False
     print("⚠️ Token manager not available")
 
+NOTIFICATION_LOG = os.environ.get("NOTIFICATION_LOG", "notification_log.txt")
+
 def log_notification(msg):
-    with open("notification_log.txt", "a", encoding="utf-8") as f:
+    with open(NOTIFICATION_LOG, "a", encoding="utf-8") as f:
         f.write(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}: {msg}\n")
 
-def send_telegram_notification(stock_code, alert_type, score, ratio, change_pct):
-    """Send stock alert to Telegram if enabled."""
+def send_telegram_notification(stock_code, alert_type, score, ratio, change_pct, reasons=None):
+    """Send stock alert to Telegram if enabled (`reasons`: the score's factor breakdown, if any)."""
     if not TELEGRAM_ENABLED:
         return
     
     try:
-        message = format_stock_alert(stock_code, alert_type, score, ratio, change_pct)
+        message = format_stock_alert(stock_code, alert_type, score, ratio, change_pct, reasons)
         success = send_telegram_message(message)
         
         if success:
@@ -124,29 +146,38 @@ def send_start_of_day_message():
         log_notification(f"❌ Start-of-day message error: {e}")
 
 
-def get_current_stock_price(stock_code):
-    """Extract current stock price from the latest API data"""
+def request_book5(stock_code):
+    """One getBook5 request (rate limited, on the next pool token) -> its 'data' dict, or None."""
+    url = f"{QUOTE_API_URL}?market=EGX&action=getBook5&symbol={stock_code}"
+    api_limiter.acquire()
+    token, request_headers = auth_headers()
+    request_start = time.monotonic()
+    response = http_session.get(url, headers=request_headers, timeout=10)
+    record_rate_limit(response.status_code, time.monotonic() - request_start)
+    token_pool.record(token, response.status_code, response.headers.get('Retry-After'))
+    if response.status_code == 200:
+        data = response.json()
+        if data and 'data' in data and data['data']:
+            return data['data']
+    return None
+
+
+def quote_from_book5(stock_data):
+    """getBook5 'data' dict -> Quote (last price when present, otherwise the bid/ask midpoint, see Quote.price)."""
+    last = float(stock_data['lastPrice']) if stock_data.get('lastPrice') else None
+    bid = float(stock_data.get('bestBid', 0) or 0)
+    ask = float(stock_data.get('bestAsk', 0) or 0)
+    return Quote(bid, ask, last, source="getBook5")
+
+
+def fetch_book5_quote(stock_code):
+    """getBook5 request for one symbol -> Quote, used only when the quote cache has nothing fresh."""
     try:
-        # Make API request to get current stock data
-        url = f"https://xt4wgzrep2.execute-api.us-east-1.amazonaws.com/default/EGXAPI-V2?market=EGX&action=getBook5&symbol={stock_code}"
-        response = requests.get(url, headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            if data and 'data' in data and data['data']:
-                stock_data = data['data']
-                # Try to get last price, or use best bid/ask average
-                if 'lastPrice' in stock_data and stock_data['lastPrice']:
-                    return float(stock_data['lastPrice'])
-                elif 'bestBid' in stock_data and 'bestAsk' in stock_data:
-                    bid = float(stock_data.get('bestBid', 0))
-                    ask = float(stock_data.get('bestAsk', 0))
-                    if bid > 0 and ask > 0:
-                        return (bid + ask) / 2  # Midpoint price
-                    elif bid > 0:
-                        return bid
-                    elif ask > 0:
-                        return ask
+        stock_data = request_book5(stock_code)
+        if stock_data:
+            quote = quote_from_book5(stock_data)
+            if quote.price is not None:
+                return quote
         
         print(f"⚠️ Could not extract price for {stock_code}")
         return None
@@ -156,6 +187,12 @@ def get_current_stock_price(stock_code):
         return None
 
 
+def get_current_stock_price(stock_code):
+    """Current price from the quote cache (filled by every depth fetch); getBook5 only on a miss."""
+    quote = quote_cache.get(stock_code)
+    return quote.price if quote is not None else None
+
+
 def capture_end_of_day_prices():
     """Capture end-of-day prices for all stocks that had strong recommendations"""
     if not strong_recommendations:
@@ -163,16 +200,16 @@ def capture_end_of_day_prices():
         
     print("📊 Capturing end-of-day prices for strong recommendations...")
     
-    for stock_code in strong_recommendations.keys():
-        try:
-            end_price = get_current_stock_price(stock_code)
-            if end_price is not None:
-                end_of_day_prices[stock_code] = end_price
-                print(f"📈 End price for {stock_code}: {end_price:.3f}")
-            else:
-                print(f"⚠️ Could not capture end price for {stock_code}")
-        except Exception as e:
-            print(f"❌ Error capturing end price for {stock_code}: {e}")
+    # Trading has ended, so the last depth quote is the closing quote whatever its age;
+    # only symbols that were never quoted go to getBook5 (in parallel)
+    quotes = quote_cache.get_many(list(strong_recommendations), max_age=float('inf'))
+    for stock_code, quote in quotes.items():
+        end_price = quote.price if quote is not None else None
+        if end_price is not None:
+            end_of_day_prices[stock_code] = end_price
+            print(f"📈 End price for {stock_code}: {end_price:.3f} ({quote.source}, {quote.age():.0f}s old)")
+        else:
+            print(f"⚠️ Could not capture end price for {stock_code}")
 
 
 def send_end_of_day_summary():
@@ -299,256 +336,716 @@ daily_risers = {}      # stock_code -> list of positive % changes
 alert_counts = {}      # track different types of alerts sent
 strong_recommendations = {}  # track strong recommendations: {stock_code: {'alert_time': datetime, 'alert_price': float, 'score': float}}
 end_of_day_prices = {}      # store end-of-day prices for comparison
-token_expired = False
+token_expired = False  # True only once every token in the pool has been rejected
+token_expiry_notified = False  # the "token expired" Telegram message went out for the current outage
 lock = threading.Lock()  # protect shared writes
 
 # Enhanced decision-making state
-stock_history = {}     # stock_code -> deque of historical data
 signal_scores = {}     # stock_code -> latest composite score
 last_recommendations = {}  # stock_code -> timestamp of last recommendation
 cooldown_minutes = 1   # minimum time between recommendations for same stock
 
+# Per-cycle fetch control
+cycle_stats = {}       # counters for the current cycle (see begin_cycle)
+cycle_number = 0       # increments every trading cycle; late jobs compare against it
+cycle_deadline = None  # time.monotonic() cut-off for the current fetch phase
+retry_budget_left = 0  # retries still allowed this cycle
+carried_retries = {}   # stock_code -> attempts already spent, moved to the next cycle
+stale_symbols = set()  # symbols carried forward with their last snapshot this cycle
+unpolled_symbols = set()  # symbols the adaptive scheduler skipped this cycle (last values kept)
+breaker_skipped = set()   # symbols skipped this cycle because their circuit breaker is open
+
+# Order-book change detection
+book_fingerprints = {}  # stock_code -> digest of the last analyzed payload
+book_validators = {}    # stock_code -> {'ETag': ..., 'Last-Modified': ...} from the server
+analysis_cache = {}     # stock_code -> (ratio, score, bid_volume) from the last analysis
+analysis_seconds = {'total': 0.0, 'count': 0}  # running cost of analyze_bid_ask
+
+# Streaming alert evaluation (see publish_scored / process_notifications)
+alert_lock = threading.Lock()  # cooldowns, STRONG captures and streamed results
+alert_stream_live = False      # True during trading cycles when STREAMING_ALERTS is on
+streamed_alerts = {'evaluated': set(), 'strong': []}  # this cycle's streamed results, taken at cycle end
+scored_at = {}                 # stock_code -> time.monotonic() its latest scored response arrived
+alert_latency = AlertLatency()
+
 # Rolling buffer size for historical analysis
-HISTORY_SIZE = 10
+HISTORY_SIZE = max(4, int(os.environ.get("HISTORY_SIZE", "10")))  # snapshots kept per symbol; scoring looks back 4
 
 # Execution / performance configuration
-REQUEST_TIMEOUT = 5          # seconds per HTTP request
+REQUEST_TIMEOUT = 5          # upper bound per HTTP request; adaptive timeouts never exceed it
+REQUEST_TIMEOUT_MIN = 1.0    # adaptive timeouts never drop below this
+TIMEOUT_P95_MULTIPLIER = 3.0 # adaptive timeout = endpoint p95 latency x this
+LATENCY_WINDOW = 50          # recent responses kept per endpoint for p50/p95
+HEDGED_REQUESTS = os.environ.get("HEDGED_REQUESTS", "0") == "1"  # duplicate calls that run past their p95
+HEDGE_MAX_EXTRA_LOAD = 0.1   # hedges allowed per primary request (10% extra load)
 MAX_RETRIES = 5              # max attempts per stock per cycle
+CYCLE_DEADLINE_SECONDS = 8   # fetch phase cut-off; late symbols are carried forward as stale
+CYCLE_RETRY_BUDGET = 30      # retries shared by all symbols within one cycle
 BACKOFF_BASE = 2             # exponential backoff base
 MAX_WORKERS = 12             # thread pool size (avoid exhausting DB)
 INTERVAL_SECONDS = 10        # loop interval seconds
+FETCH_ENGINE = os.environ.get("FETCH_ENGINE", "thread")  # "thread" or "async"
+HTTP2_ENABLED = os.environ.get("HTTP2", "0") == "1"  # multiplex depth/getBook5 calls over HTTP/2 (needs httpx[http2])
+DISPATCH_ORDER = os.environ.get("DISPATCH_ORDER", "longest")  # "longest" expected cost first, or "csv"
+ASYNC_MAX_CONCURRENCY = int(os.environ.get("ASYNC_MAX_CONCURRENCY", "64"))  # in-flight requests for the async engine
+CATCH_UP_POLICY = os.environ.get("CATCH_UP_POLICY", "skip")  # after an overrun: "skip" missed ticks or "coalesce" them
+ADAPTIVE_POLLING = os.environ.get("ADAPTIVE_POLLING", "0") == "1"  # per-symbol poll intervals driven by score
+POLL_TICK_SECONDS = 2        # loop interval when ADAPTIVE_POLLING is on
+POLL_MIN_INTERVAL = 2        # hot symbols (near STRONG) are polled this often
+POLL_MAX_INTERVAL = 60       # dormant symbols / empty books
+POLL_REQUEST_BUDGET = 10.0   # requests/second the adaptive scheduler may plan for
+RATE_LIMIT_INITIAL = float(os.environ.get("RATE_LIMIT_INITIAL", "20"))  # starting requests/second shared by depth and getBook5 calls
+RATE_LIMIT_MIN = 1.0         # AIMD never drops below this
+RATE_LIMIT_MAX = float(os.environ.get("RATE_LIMIT_MAX", "100"))  # AIMD never climbs above this
+SHARD_WORKERS = int(os.environ.get("SHARD_WORKERS", "0"))  # >0: this process coordinates N fetch/score worker processes
+PREP_WARMUP = os.environ.get("PREP_WARMUP", "1") == "1"  # validate the token and seed history before the open
+PREP_SEED_SECONDS = 60       # pre-open snapshots are taken every cycle during this last part of PREP
+TOKEN_THROTTLE_COOLDOWN = 30    # a token answered with 429 rests this long (doubling on repeats)
+UNIVERSE_FILE = os.environ.get("UNIVERSE_FILE", "")  # code,id CSV screened via getBook5; passing symbols get full depth
+SCREEN_PASS_SECONDS = 60     # every universe symbol is screened about this often
+SCREEN_MIN_RATIO = 1.5       # top-5 bid/ask volume ratio that promotes a symbol to full depth
+SCREEN_MIN_MOVE_PCT = 1.0    # ...or this % price move since its previous screen
+FUNNEL_COOLDOWN_SECONDS = 300  # promoted symbols are demoted after this long without a MEDIUM+ reading
+FUNNEL_MAX_PROMOTED = 100    # promoted symbols at a time, on top of STOCKS_FILE
+STREAMING_ALERTS = os.environ.get("STREAMING_ALERTS", "1") == "1"  # per-symbol alert rules run as each snapshot is scored
+ALERT_DRAIN_SECONDS = 2      # cycle end waits this long for streamed alerts before the summary
+SCORING_ENGINE = os.environ.get("SCORING_ENGINE", "scalar")  # "scalar" per symbol, or "vector": NumPy batches of symbols
+QUOTE_TTL_SECONDS = 30       # cached best bid/ask older than this is re-fetched from getBook5
+BREAKER_FAILURE_THRESHOLD = 5    # consecutive 5xx/network failures that open a symbol's breaker
+BREAKER_RESET_SECONDS = 60       # first probe of an open breaker after this long
+BREAKER_MAX_RESET_SECONDS = 600  # probe interval doubles on each failed probe, up to this
 PREP_START_TIME = dtime(9, 45)   # 9:45 AM - preparation time
 TRADING_START_TIME = dtime(10, 0)  # 10:00 AM - actual trading start
 TRADING_END_TIME = dtime(14, 15)   # 2:15 PM - trading end
 SYSTEM_END_TIME = dtime(14, 30)    # 2:30 PM - system shutdown with summary
 
-# Dynamic Bearer token management
+# API endpoints and symbol list; override to run against mock_server.py
+DEPTH_API_BASE_URL = os.environ.get("DEPTH_API_BASE_URL", "https://prod.thndr.app/assets-service/market-depth/")
+QUOTE_API_URL = os.environ.get("QUOTE_API_URL", "https://xt4wgzrep2.execute-api.us-east-1.amazonaws.com/default/EGXAPI-V2")
+STOCKS_FILE = os.environ.get("STOCKS_FILE", "STOCKS.csv")
+
+def init_http():
+    """
+    One keep-alive connection per worker thread for each API host. With
+    HTTP2=1 the whole cycle shares one multiplexed connection per API host;
+    hosts that can't speak HTTP/2 fall back to the pools on first use.
+    """
+    http_session.configure_pools(MAX_WORKERS)
+    if HTTP2_ENABLED:
+        for api_url in (DEPTH_API_BASE_URL, QUOTE_API_URL):
+            if not http_session.enable_http2(api_url):
+                print("⚠️ HTTP2=1 but httpx[http2] is not installed; staying on HTTP/1.1")
+                break
+
+# Shared by every market-depth and getBook5 request; adapts to observed 429s
+api_limiter = AdaptiveRateLimiter(initial_rate=RATE_LIMIT_INITIAL, min_rate=RATE_LIMIT_MIN,
+                                  max_rate=RATE_LIMIT_MAX, burst=MAX_WORKERS)
+
+def on_breaker_transition(stock_code, old_state, new_state, reason):
+    print(f"🧯 Breaker {stock_code}: {old_state} -> {new_state} ({reason})")
+    log_notification(f"🧯 Breaker {stock_code}: {old_state} -> {new_state} ({reason})")
+
+# Best bid/ask from every depth fetch; alerts and the EOD summary read prices from here
+quote_cache = QuoteCache(ttl=QUOTE_TTL_SECONDS, loader=fetch_book5_quote, max_workers=MAX_WORKERS)
+
+# Per-endpoint response times drive request timeouts and hedging
+latency_tracker = LatencyTracker(window=LATENCY_WINDOW, timeout_multiplier=TIMEOUT_P95_MULTIPLIER,
+                                 min_timeout=REQUEST_TIMEOUT_MIN, max_timeout=REQUEST_TIMEOUT)
+# At most MAX_WORKERS hedged pairs unfinished, so hedges and the losers still running can't fill hedge_executor
+hedge_budget = HedgeBudget(max_extra_ratio=HEDGE_MAX_EXTRA_LOAD, max_in_flight=MAX_WORKERS)
+hedge_executor = None  # thread engine only; created on the first hedged request
+
+# stock_code -> ring buffer of its last HISTORY_SIZE snapshots
+stock_history = HistoryStore(HISTORY_SIZE)
+
+# Per-symbol fetch + analysis cost; slow symbols are dispatched first
+cost_estimator = CostEstimator()
+
+# SCORING_ENGINE=vector: analyzed symbols wait here and are scored together in score_pending_batch,
+# by the batch-score stage while alerts stream, otherwise at cycle end
+vector_scoring = SCORING_ENGINE == "vector" and batch_scoring.NUMPY_AVAILABLE
+if SCORING_ENGINE == "vector" and not vector_scoring:
+    print("⚠️ SCORING_ENGINE=vector needs numpy; scoring per symbol instead")
+pending_scores = {}            # stock_code -> time.monotonic() its response arrived (None until published)
+pending_fingerprints = {}      # stock_code -> (fingerprint, validators), stored once its batch score is cached
+batch_score_lock = threading.Lock()  # one score_pending_batch at a time (batch-score stage and cycle end)
+
+# Scoring factors; factor_registry.register(Factor(...)) adds one to both scoring engines
+factor_registry = FactorRegistry(DEFAULT_FACTORS)
+score_contributions = {}       # stock_code -> (factor, value, points) of its last per-symbol score, explained on demand
+
+# PREP-window warm-up progress for the current day (see run_prep_warmup)
+prep_warmup = {'token_checked': False, 'snapshots': 0}
+dispatch_plan = {}     # predicted makespan of this cycle's order vs CSV order (see select_cycle_rows)
+
+# One breaker per market-depth endpoint; open symbols are skipped until their probe
+depth_breakers = BreakerRegistry(on_transition=on_breaker_transition,
+                                 failure_threshold=BREAKER_FAILURE_THRESHOLD,
+                                 reset_timeout=BREAKER_RESET_SECONDS,
+                                 max_reset_timeout=BREAKER_MAX_RESET_SECONDS)
+
+# Dynamic Bearer token management: the saved token for now; init() waits for one via Telegram if there is none
 if TOKEN_MANAGER_ENABLED:
-    TOKEN = wait_for_token_at_startup()
+    TOKEN = get_api_token()
 else:
     # Fallback to static token
     TOKEN = 'eyJ0eXAiOiJKV1QiLCJhbGciOiJFUzI1NiIsImtpZCI6ImNFbURJUnMxV2J0WE9RX2lfYUdfMG5rUmEwSjh1ZWozbnN4eU1jSUxqVXMifQ.eyJzY29wZXMiOlsiYXNzZXRzOndyaXRlIiwib3JkZXI6cmVhZCIsInVzZXI6d3JpdGUiLCJtYXJrZXRfZWd5cHQ6cmVhZCIsImt5Y19jaGFsbGVuZ2U6d3JpdGUiLCJjaGFydHM6cmVhZCIsIm1hcmtldF9kZXB0aDpyZWFkIiwicG9zdDp3cml0ZSIsImZ1bmRpbmc6cmVhZCIsImZ1bmRpbmc6d3JpdGUiLCJ3YXRjaGxpc3Q6d3JpdGUiLCJmZWVkOnJlYWQiLCJtYXJrZXRfc2ltdWxhdG9yOndyaXRlIiwibm90aWZpY2F0aW9uczpyZWFkIiwiaW52ZXN0b3I6cmVhZCIsImFuYWx5c2lzOnJlYWQiLCJub3RpZmljYXRpb25zOndyaXRlIiwib3JkZXI6d3JpdGUiLCJmaWxlczp3cml0ZSIsImRvY3VtZW50OndyaXRlIiwiaW52ZXN0b3I6d3JpdGUiLCJtYXJrZXRfc2ltdWxhdG9yOnJlYWQiLCJ3YXRjaGxpc3Q6cmVhZCIsInN1YnNjcmlwdGlvbjp3cml0ZSIsInVzZXI6cmVhZCIsIm1hcmtldF9lZ3lwdDp3cml0ZSIsImFzc2V0czpyZWFkIiwicG9zdDpyZWFkIiwic3Vic2NyaXB0aW9uOnJlYWQiLCJreWNfY2hhbGxlbmdlOnJlYWQiXSwidWlkIjoiOXJOYlZRRGRTWk5zMzVDcDNoV09VV3BoMzVRMiIsImFscGFjYV9pZCI6bnVsbCwidXR5cGUiOiJ2ZXJpZmllZCIsImlhdCI6MTc2MDY0NzMyNCwiZXhwIjoxNzYwNjY4OTI0LCJkYXRhIjp7ImVtYWlsIjoiYWhtZWQueS5kYXdhbHlAZ21haWwuY29tIiwibmFtZSI6IkFobWVkIFlhc3NlciIsInVzZXJuYW1lIjoic3M4N2Y5aGZndiJ9fQ.g16qt5eXocLl5FJgb5_zhWYMHYvaOZFCMaNLX2ad_TgpScO25gk-nUOJWk0mVJUh77IRhalcRXjUTGu2nxRuig'
-    print("⚠️ Using static token (no token manager)")
 
-price_depth_url = 'https://prod.thndr.app/assets-service/market-depth/' 
+price_depth_url = DEPTH_API_BASE_URL
 price_url = 'https://web.thndr.app/assets/'
-stocks_list = []
-with open('STOCKS.csv', 'r', encoding='utf-8') as file:
-    reader = csv.reader(file)
-    for row in reader:
-        if not row:
-            continue
-        # Skip comment lines that start with #
-        if row[0].strip().startswith('#'):
-            continue
-        stocks_list.append(row)
 
-# De-duplicate stock codes preserving order
-seen_codes = set()
-deduped = []
-for row in stocks_list:
-    code = row[0]
-    if code not in seen_codes:
-        deduped.append(row)
-        seen_codes.add(code)
-stocks_list = deduped
+def load_stock_rows(path):
+    """code,id rows from a STOCKS.csv-style file, skipping blank and # lines and duplicate codes."""
+    rows = []
+    with open(path, 'r', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        for row in reader:
+            if not row:
+                continue
+            # Skip comment lines that start with #
+            if row[0].strip().startswith('#'):
+                continue
+            rows.append(row)
+
+    # De-duplicate stock codes preserving order
+    seen_codes = set()
+    deduped = []
+    for row in rows:
+        code = row[0]
+        if code not in seen_codes:
+            deduped.append(row)
+            seen_codes.add(code)
+    return deduped
+
+stocks_list = load_stock_rows(STOCKS_FILE)  # symbols fetched at full depth: core_stocks plus promoted ones
+core_stocks = list(stocks_list)
+
+# With UNIVERSE_FILE the rest of the universe is screened cheaply and only promising symbols get full depth
+screening_funnel = None
+funnel_requests = {'screen': 0, 'depth': 0, 'all_depth': 0.0}  # session request counts vs polling everything at depth
+if UNIVERSE_FILE:
+    screening_funnel = ScreeningFunnel(load_stock_rows(UNIVERSE_FILE), core_codes=[row[0] for row in core_stocks],
+                                       min_ratio=SCREEN_MIN_RATIO, min_move_pct=SCREEN_MIN_MOVE_PCT,
+                                       cooldown=FUNNEL_COOLDOWN_SECONDS, max_promoted=FUNNEL_MAX_PROMOTED)
+
+poll_scheduler = AdaptivePollScheduler(base_interval=INTERVAL_SECONDS, min_interval=POLL_MIN_INTERVAL,
+                                       max_interval=POLL_MAX_INTERVAL, request_budget=POLL_REQUEST_BUDGET)
+poll_scheduler.register([row[0] for row in stocks_list])
+
+def on_token_transition(label, old_state, new_state, reason):
+    print(f"🔑 Token {label}: {old_state} -> {new_state} ({reason})")
+    log_notification(f"🔑 Token {label}: {old_state} -> {new_state} ({reason})")
+    apply_token_rate_ceiling()
+
+# Requests rotate over every known token (current_api_token.txt plus api_tokens.txt);
+# throttled tokens rest, rejected ones leave the rotation until replaced
+token_pool = TokenPool(load_token_pool() if TOKEN_MANAGER_ENABLED else [TOKEN],
+                       throttle_cooldown=TOKEN_THROTTLE_COOLDOWN, on_transition=on_token_transition)
+if TOKEN and TOKEN not in token_pool.tokens():
+    token_pool.update([TOKEN] + token_pool.tokens())
+rate_limit_share = 1.0  # this process's share of the API rate (1/N in a shard worker)
+rate_ceiling_tokens = 1  # active tokens the limiter is currently sized for
+rate_ceiling_lock = threading.RLock()
+shard_token_stats = {}  # SHARD_WORKERS coordinator: token counters merged from the workers
+TOKEN_STATE_RANK = {ACTIVE: 0, THROTTLED: 1, EXPIRED: 2}
+
+def auth_headers():
+    """
+    Authorization for the next token in rotation.
+
+    Returns:
+        str: the token used (pass it to token_pool.record with the response status)
+        dict: request headers
+    """
+    token = token_pool.next_token() or TOKEN
+    return token, {"Authorization": f"Bearer {token}"}
+
+def apply_token_rate_ceiling():
+    """
+    Each account is rate limited separately: the limiter may climb to
+    RATE_LIMIT_MAX per active token, and its current rate follows the number
+    of active tokens up and down.
+    """
+    global rate_ceiling_tokens
+    with rate_ceiling_lock:  # re-entrant: counting can report a transition, which calls back here
+        tokens = max(1, token_pool.count(ACTIVE))
+        if tokens != rate_ceiling_tokens:
+            api_limiter.rescale(RATE_LIMIT_MAX * rate_limit_share * tokens, tokens / rate_ceiling_tokens)
+            rate_ceiling_tokens = tokens
+
+def refresh_token_pool():
+    """
+    Re-read the token files into the pool (after a Telegram update or an
+    edit of api_tokens.txt).
 
-# Define headers for the API request
-headers = {
-    "Authorization": f"Bearer {TOKEN}"
-}
+    Returns:
+        bool: True if the pool has live tokens again after a full expiry.
+    """
+    global TOKEN, token_expired, token_expiry_notified
+    if not TOKEN_MANAGER_ENABLED:
+        return False
+    current = get_api_token()
+    if current and current != TOKEN:
+        TOKEN = current
+        print(f"🔄 Token refreshed: {TOKEN[:20]}...")
+        log_notification("🔄 Token refreshed from Telegram")
+    before = set(token_pool.tokens())
+    token_pool.update(load_token_pool())
+    added = set(token_pool.tokens()) - before
+    if added:
+        print(f"🔑 Token pool: {len(added)} new token(s), {token_pool.live_count()} live")
+    if token_expired and not token_pool.all_expired:
+        token_expired = False
+        token_expiry_notified = False
+        return True
+    return False
 
 def to_number(val, default=0):
+    # Delegates to the decoder's parser, which also accepts negatives and exponents
+    return parse_number(val, default)
+
+def backoff_delay(attempt):
+    """Exponential backoff with cap shared by every fetch engine."""
+    return min(30, BACKOFF_BASE ** min(attempt, 6))
+
+def count_cycle_stat(name, amount=1):
+    with lock:
+        cycle_stats[name] = cycle_stats.get(name, 0) + amount
+
+def may_retry(stock_code, attempt, cycle_attempts, retry_delay, job_cycle):
+    """
+    Decide whether a failed attempt may be retried inside the current cycle.
+
+    A retry needs per-symbol attempts left (MAX_RETRIES), a share of the
+    cycle's CYCLE_RETRY_BUDGET, and enough time before the cycle deadline.
+    Otherwise the attempt count is carried to the next cycle.
+    """
+    global retry_budget_left
+    with lock:
+        if cycle_deadline is None:
+            # Called outside a trading cycle (e.g. fetch_stock_data): per-symbol cap only
+            return cycle_attempts < MAX_RETRIES
+        in_time = job_cycle == cycle_number and time.monotonic() + retry_delay < cycle_deadline
+        allowed = in_time and cycle_attempts < MAX_RETRIES and retry_budget_left > 0
+        if allowed:
+            retry_budget_left -= 1
+            cycle_stats['retries'] = cycle_stats.get('retries', 0) + 1
+            if cycle_attempts == 1:
+                cycle_stats['retried'] = cycle_stats.get('retried', 0) + 1
+        else:
+            carried_retries[stock_code] = attempt
+            cycle_stats['carried'] = cycle_stats.get('carried', 0) + 1
+    if not allowed:
+        log_notification(f"{stock_code} retry moved to next cycle after attempt {attempt}")
+    return allowed
+
+def record_rate_limit(status, latency):
+    """Feed a response into the shared AIMD limiter."""
+    if status == 429:
+        api_limiter.on_throttle()
+    elif status < 500:
+        api_limiter.on_success(latency)
+
+def record_breaker_result(stock_code, status=None, net_err=None):
+    """
+    Feed one depth attempt into the symbol's breaker: 5xx and transport errors
+    count as failures, 200/304 as success, other statuses are neutral.
+
+    Returns:
+        bool: True if the breaker is now open and the caller should stop retrying.
+    """
+    breaker = depth_breakers.get(stock_code)
+    if net_err is not None:
+        breaker.record_failure(type(net_err).__name__)
+    elif status >= 500:
+        breaker.record_failure(f"HTTP {status}")
+    elif status in (200, 304):
+        breaker.record_success()
+    return breaker.is_open
+
+def handle_network_error(stock_code, attempt, net_err):
+    """Log a transport failure and return how long to wait before retrying."""
+    log_notification(f"{stock_code} NET ERROR attempt {attempt}: {net_err}")
+    return backoff_delay(attempt)
+
+def payload_fingerprint(content):
+    return hashlib.blake2b(content, digest_size=16).digest()
+
+def conditional_headers(stock_code):
+    """(token, headers): the next pool token plus If-None-Match/If-Modified-Since when the server gave us validators."""
+    token, request_headers = auth_headers()
+    validators = book_validators.get(stock_code)
+    if not validators or stock_code not in analysis_cache:
+        return token, request_headers
+    if validators.get('ETag'):
+        request_headers['If-None-Match'] = validators['ETag']
+    if validators.get('Last-Modified'):
+        request_headers['If-Modified-Since'] = validators['Last-Modified']
+    return token, request_headers
+
+def reuse_cached_analysis(stock_code):
+    """Publish the previous analysis for an unchanged book; False if nothing is cached."""
+    cached = analysis_cache.get(stock_code)
+    if cached is None:
+        return False
+    ratio, score, bid_volume = cached
+    quote_cache.touch(stock_code)
+    with lock:
+        stock_ratios[stock_code] = ratio
+        signal_scores[stock_code] = score
+        volumes[stock_code] = bid_volume
+    return True
+
+def publish_scored(stock_code, received_at):
+    """A symbol has a fresh score: remember when its response arrived and, while streaming, evaluate it now."""
+    with lock:
+        batched = stock_code in pending_scores
+        if batched:
+            # Batch-scored; published by score_pending_batch once its score exists
+            pending_scores[stock_code] = received_at
+    if batched:
+        if alert_stream_live:
+            alert_pipeline.submit(stock_code, stage="batch-score")
+        return
+    scored_at[stock_code] = received_at
+    if alert_stream_live:
+        alert_pipeline.submit((stock_code, received_at), stage="alert-eval")
+
+def remember_book(stock_code, fingerprint, validators):
+    """Record what analysis_cache now holds for stock_code, so an identical payload or a 304 reuses it."""
+    book_fingerprints[stock_code] = fingerprint
+    if validators and any(validators.values()):
+        book_validators[stock_code] = validators
+
+def handle_depth_response(stock_code, status, content, attempt, response_headers=None):
+    """
+    Apply the market-depth status semantics shared by the thread and async engines.
+
+    Byte-identical payloads (or 304 Not Modified) reuse the cached analysis
+    instead of re-parsing and appending a duplicate snapshot.
+
+    Returns:
+        tuple: (done, retry_delay) - done is True on success or token expiry,
+               otherwise the caller waits retry_delay seconds and tries again.
+    """
+    global token_expired
+    received_at = time.monotonic()
+    if status == 304 and reuse_cached_analysis(stock_code):
+        count_cycle_stat('unchanged')
+        count_cycle_stat('not_modified')
+        publish_scored(stock_code, received_at)
+        return True, 0
+    if status == 200:
+        fingerprint = payload_fingerprint(content)
+        if book_fingerprints.get(stock_code) == fingerprint and reuse_cached_analysis(stock_code):
+            count_cycle_stat('unchanged')
+            publish_scored(stock_code, received_at)
+            return True, 0
+        try:
+            book = decode_depth(content)
+        except Exception as je:
+            log_notification(f"{stock_code} JSON decode error attempt {attempt}: {je}")
+            return False, 1
+        snapshot_timestamp = datetime.now()
+        
+        # === DATABASE STORAGE COMMENTED OUT FOR GITHUB ACTIONS ===
+        # try:
+        #     with oracledb.connect(user="AYD_ADMIN", password="MySecret123", dsn="localhost/XEPDB1") as connection:
+        #         cursor = connection.cursor()
+        #         total_bids_and_asks = data.get("total_bids_and_asks", {})
+        #         total_bids = to_number(total_bids_and_asks.get("total_bids", 0))
+        #         total_asks = to_number(total_bids_and_asks.get("total_asks", 0))
+        #         cursor.execute(
+        #             """
+        #             INSERT INTO STOCK_PRICE_DEPTH (STOCK_CODE, SNAPSHOT_TIMESTAMP, TOTAL_BIDS, TOTAL_ASKS)
+        #             VALUES (:1, :2, :3, :4)
+        #             """,
+        #             [stock_code, snapshot_timestamp, total_bids, total_asks]
+        #         )
+        #         cursor.execute(
+        #             "SELECT ID FROM STOCK_PRICE_DEPTH WHERE STOCK_CODE=:1 AND SNAPSHOT_TIMESTAMP=:2 ORDER BY ID DESC FETCH FIRST 1 ROWS ONLY",
+        #             [stock_code, snapshot_timestamp]
+        #         )
+        #         row = cursor.fetchone()
+        #         if not row:
+        #             raise RuntimeError("Failed to get inserted depth ID")
+        #         depth_id = row[0]
+        #
+        #         for bid in data.get("bids_per_price", []):
+        #             cursor.execute(
+        #                 """
+        #                 INSERT INTO BIDS_PER_PRICE (DEPTH_ID, ORDER_PRICE, VOLUME_TRADED, SPLIT, VOLUME_TRADED_CUM_SUM)
+        #                 VALUES (:1, :2, :3, :4, :5)
+        #                 """,
+        #                 [
+        #                     depth_id,
+        #                     to_number(bid.get("order_price")),
+        #                     to_number(bid.get("volume_traded")),
+        #                     to_number(bid.get("split")),
+        #                     to_number(bid.get("volume_traded_cum_sum"))
+        #                 ]
+        #             )
+        #         for ask in data.get("asks_per_price", []):
+        #             cursor.execute(
+        #                 """
+        #                 INSERT INTO ASKS_PER_PRICE (DEPTH_ID, ORDER_PRICE, VOLUME_TRADED, SPLIT, VOLUME_TRADED_CUM_SUM)
+        #                 VALUES (:1, :2, :3, :4, :5)
+        #                 """,
+        #                 [
+        #                     depth_id,
+        #                     to_number(ask.get("order_price")),
+        #                     to_number(ask.get("volume_traded")),
+        #                     to_number(ask.get("split")),
+        #                     to_number(ask.get("volume_traded_cum_sum"))
+        #                 ]
+        #             )
+        #         connection.commit()
+        #     analyze_bid_ask(stock_code, data)
+        #     return True, 0  # success
+        # except Exception as db_err:
+        #     log_notification(f"{stock_code} DB ERROR attempt {attempt}: {db_err}")
+        #     return False, backoff_delay(attempt)
+        
+        # Skip database storage and proceed directly to analysis
+        validators = None
+        if response_headers is not None:
+            validators = {name: response_headers.get(name) for name in ('ETag', 'Last-Modified')}
+        if vector_scoring:
+            # analysis_cache is only written with the batch score; until then a match must not reuse the old one
+            with lock:
+                pending_fingerprints[stock_code] = (fingerprint, validators)
+        if not analyze_bid_ask(stock_code, book):
+            # Fingerprint and validators stay as they were, so this book is analyzed again, not reused
+            if vector_scoring:
+                with lock:
+                    pending_fingerprints.pop(stock_code, None)
+            count_cycle_stat('analysis_failed')
+            return False, 1
+        if not vector_scoring:
+            remember_book(stock_code, fingerprint, validators)
+        publish_scored(stock_code, received_at)
+        count_cycle_stat('changed')
+        return True, 0  # success
+    elif status == 429:
+        # Rate limited; backoff and retry
+        return False, backoff_delay(attempt)
+    elif status in (401, 403) and not token_pool.all_expired:
+        # Only the token that made this request left the rotation; retry with the next one
+        log_notification(f"{stock_code} token rejected (HTTP {status}) attempt {attempt}; "
+                         f"{token_pool.live_count()} token(s) still live")
+        return False, 0
+    elif status in (401, 403):
+        msg = f"AUTH EXPIRED {stock_code} status={status}"
+        log_notification(msg)
+        if toaster:
+            toaster.show_toast("Stock Notification", msg, duration=8, threaded=True)
+        
+        # Send immediate Telegram notification about token expiration
+        if TELEGRAM_ENABLED:
+            try:
+                send_telegram_notification(stock_code, "TOKEN_EXPIRED", 0, 0, 0)
+                print(f"📱 Token expiry alert sent for {stock_code}")
+            except Exception as e:
+                print(f"❌ Failed to send token expiry alert: {e}")
+        
+        token_expired = True
+        return True, 0
+    else:
+        log_notification(f"{stock_code} HTTP {status} attempt {attempt}")
+        return False, backoff_delay(attempt)
+
+def depth_url(stock_row):
+    return price_depth_url + (stock_row[1] if len(stock_row) > 1 else '')
+
+def depth_get(stock_code, url):
+    """
+    GET one depth endpoint with its adaptive timeout; with HEDGED_REQUESTS a
+    duplicate is sent once the call passes the endpoint's p95.
+    """
+    global hedge_executor
+    timeout = latency_tracker.timeout_for(stock_code)
+
+    def send(hedge=False):
+        # Every attempt (hedges included) takes the next token in rotation
+        token, request_headers = conditional_headers(stock_code)
+        start = time.monotonic()
+        response = http_session.get(url, headers=request_headers, timeout=timeout)
+        token_pool.record(token, response.status_code, response.headers.get('Retry-After'))
+        return response, time.monotonic() - start
+
+    start = time.monotonic()
     try:
-        if val is None:
-            return default
-        if isinstance(val, (int, float)):
-            return float(val)
-        s = str(val).strip()
-        if s == '':
-            return default
-        if s.replace('.', '', 1).isdigit():
-            return float(s)
-        return default
-    except Exception:
-        return default
+        if not HEDGED_REQUESTS:
+            response, elapsed = send()
+        else:
+            if hedge_executor is None:
+                with lock:
+                    if hedge_executor is None:
+                        # Primaries plus hedge_budget's max_in_flight hedges or losing calls
+                        hedge_executor = concurrent.futures.ThreadPoolExecutor(
+                            max_workers=MAX_WORKERS * 2, thread_name_prefix="depth-hedge")
+            (response, elapsed), _ = hedged_call(hedge_executor, send, latency_tracker.hedge_delay(stock_code),
+                                                 hedge_budget, api_limiter.try_acquire)
+    except http_session.TIMEOUT_ERRORS:
+        latency_tracker.record_timeout(stock_code, time.monotonic() - start, timeout)
+        raise
+    # One sample per call: the winning request's own latency (a losing hedge pair member is not recorded)
+    latency_tracker.record(stock_code, elapsed)
+    cost_estimator.record_fetch(stock_code, elapsed)
+    return response
+
+async def depth_get_async(stock_code, url, engine):
+    """asyncio counterpart of depth_get; returns (status, content, headers)."""
+    timeout = latency_tracker.timeout_for(stock_code)
+
+    async def send(hedge=False):
+        token, request_headers = conditional_headers(stock_code)
+        start = time.monotonic()
+        result = await engine.get(url, headers=request_headers, timeout=timeout, hedge=hedge)
+        token_pool.record(token, result[0], result[2].get('Retry-After'))
+        return result, time.monotonic() - start
+
+    start = time.monotonic()
+    try:
+        if not HEDGED_REQUESTS:
+            result, elapsed = await send()
+        else:
+            (result, elapsed), _ = await hedged_await(send, latency_tracker.hedge_delay(stock_code),
+                                                      hedge_budget, api_limiter.try_acquire)
+    except (asyncio.TimeoutError,) + http_session.TIMEOUT_ERRORS:
+        latency_tracker.record_timeout(stock_code, time.monotonic() - start, timeout)
+        raise
+    latency_tracker.record(stock_code, elapsed)
+    cost_estimator.record_fetch(stock_code, elapsed)
+    return result
 
 def fetch_and_store_one(stock_row):
-    """Fetch depth for a single stock; retry indefinitely until success or token expired."""
-    global token_expired
+    """Fetch depth for a single stock; retry until success, token expiry, or the cycle's deadline/budget runs out."""
     stock_code = stock_row[0]
-    url = price_depth_url + (stock_row[1] if len(stock_row) > 1 else '')
-    attempt = 0
+    url = depth_url(stock_row)
+    job_cycle = cycle_number
+    carried = carried_retries.pop(stock_code, 0)
+    attempt = carried
     while True:
         if token_expired:
             return
         attempt += 1
+        api_limiter.acquire()
+        request_start = time.monotonic()
         try:
-            response = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+            response = depth_get(stock_code, url)
         except Exception as net_err:
-            log_notification(f"{stock_code} NET ERROR attempt {attempt}: {net_err}")
-            # Exponential backoff with cap
-            time.sleep(min(30, BACKOFF_BASE ** min(attempt, 6)))
-            continue
+            retry_delay = handle_network_error(stock_code, attempt, net_err)
+            breaker_open = record_breaker_result(stock_code, net_err=net_err)
+        else:
+            record_rate_limit(response.status_code, time.monotonic() - request_start)
+            breaker_open = record_breaker_result(stock_code, response.status_code)
+            done, retry_delay = handle_depth_response(stock_code, response.status_code, response.content,
+                                                      attempt, response.headers)
+            if done:
+                return
+        if breaker_open:
+            count_cycle_stat('breaker_tripped')
+            return
+        if not may_retry(stock_code, attempt, attempt - carried, retry_delay, job_cycle):
+            return
+        time.sleep(retry_delay)
 
-        status = response.status_code
-        if status == 200:
-            try:
-                data = response.json()
-            except Exception as je:
-                log_notification(f"{stock_code} JSON decode error attempt {attempt}: {je}")
-                time.sleep(1)
-                continue
-            snapshot_timestamp = datetime.now()
-            
-            # === DATABASE STORAGE COMMENTED OUT FOR GITHUB ACTIONS ===
-            # try:
-            #     with oracledb.connect(user="AYD_ADMIN", password="MySecret123", dsn="localhost/XEPDB1") as connection:
-            #         cursor = connection.cursor()
-            #         total_bids_and_asks = data.get("total_bids_and_asks", {})
-            #         total_bids = to_number(total_bids_and_asks.get("total_bids", 0))
-            #         total_asks = to_number(total_bids_and_asks.get("total_asks", 0))
-            #         cursor.execute(
-            #             """
-            #             INSERT INTO STOCK_PRICE_DEPTH (STOCK_CODE, SNAPSHOT_TIMESTAMP, TOTAL_BIDS, TOTAL_ASKS)
-            #             VALUES (:1, :2, :3, :4)
-            #             """,
-            #             [stock_code, snapshot_timestamp, total_bids, total_asks]
-            #         )
-            #         cursor.execute(
-            #             "SELECT ID FROM STOCK_PRICE_DEPTH WHERE STOCK_CODE=:1 AND SNAPSHOT_TIMESTAMP=:2 ORDER BY ID DESC FETCH FIRST 1 ROWS ONLY",
-            #             [stock_code, snapshot_timestamp]
-            #         )
-            #         row = cursor.fetchone()
-            #         if not row:
-            #             raise RuntimeError("Failed to get inserted depth ID")
-            #         depth_id = row[0]
-            #
-            #         for bid in data.get("bids_per_price", []):
-            #             cursor.execute(
-            #                 """
-            #                 INSERT INTO BIDS_PER_PRICE (DEPTH_ID, ORDER_PRICE, VOLUME_TRADED, SPLIT, VOLUME_TRADED_CUM_SUM)
-            #                 VALUES (:1, :2, :3, :4, :5)
-            #                 """,
-            #                 [
-            #                     depth_id,
-            #                     to_number(bid.get("order_price")),
-            #                     to_number(bid.get("volume_traded")),
-            #                     to_number(bid.get("split")),
-            #                     to_number(bid.get("volume_traded_cum_sum"))
-            #                 ]
-            #             )
-            #         for ask in data.get("asks_per_price", []):
-            #             cursor.execute(
-            #                 """
-            #                 INSERT INTO ASKS_PER_PRICE (DEPTH_ID, ORDER_PRICE, VOLUME_TRADED, SPLIT, VOLUME_TRADED_CUM_SUM)
-            #                 VALUES (:1, :2, :3, :4, :5)
-            #                 """,
-            #                 [
-            #                     depth_id,
-            #                     to_number(ask.get("order_price")),
-            #                     to_number(ask.get("volume_traded")),
-            #                     to_number(ask.get("split")),
-            #                     to_number(ask.get("volume_traded_cum_sum"))
-            #                 ]
-            #             )
-            #         connection.commit()
-            #     analyze_bid_ask(stock_code, data)
-            #     return  # success
-            # except Exception as db_err:
-            #     log_notification(f"{stock_code} DB ERROR attempt {attempt}: {db_err}")
-            #     time.sleep(min(30, BACKOFF_BASE ** min(attempt, 6)))
-            #     continue
-            
-            # Skip database storage and proceed directly to analysis
-            analyze_bid_ask(stock_code, data)
-            return  # success
-        elif status == 429:
-            # Rate limited; backoff and retry
-            time.sleep(min(30, BACKOFF_BASE ** min(attempt, 6)))
-            continue
-        elif status in (401, 403):
-            msg = f"AUTH EXPIRED {stock_code} status={status}"
-            log_notification(msg)
-            if toaster:
-                toaster.show_toast("Stock Notification", msg, duration=8, threaded=True)
-            
-            # Send immediate Telegram notification about token expiration
-            if TELEGRAM_ENABLED:
-                try:
-                    send_telegram_notification(stock_code, "TOKEN_EXPIRED", 0, 0, 0)
-                    print(f"📱 Token expiry alert sent for {stock_code}")
-                except Exception as e:
-                    print(f"❌ Failed to send token expiry alert: {e}")
-            
-            token_expired = True
+async def fetch_and_store_one_async(stock_row, engine):
+    """asyncio counterpart of fetch_and_store_one; same retry, 429 and 401/403 handling."""
+    stock_code = stock_row[0]
+    url = depth_url(stock_row)
+    job_cycle = cycle_number
+    carried = carried_retries.pop(stock_code, 0)
+    attempt = carried
+    while True:
+        if token_expired:
             return
+        attempt += 1
+        limiter_delay = api_limiter.reserve()
+        if limiter_delay > 0:
+            await asyncio.sleep(limiter_delay)
+        request_start = time.monotonic()
+        try:
+            status, content, response_headers = await depth_get_async(stock_code, url, engine)
+        except Exception as net_err:
+            retry_delay = handle_network_error(stock_code, attempt, net_err)
+            breaker_open = record_breaker_result(stock_code, net_err=net_err)
         else:
-            log_notification(f"{stock_code} HTTP {status} attempt {attempt}")
-            time.sleep(min(30, BACKOFF_BASE ** min(attempt, 6)))
-            continue
+            record_rate_limit(status, time.monotonic() - request_start)
+            breaker_open = record_breaker_result(stock_code, status)
+            done, retry_delay = handle_depth_response(stock_code, status, content, attempt, response_headers)
+            if done:
+                return
+        if breaker_open:
+            count_cycle_stat('breaker_tripped')
+            return
+        if not may_retry(stock_code, attempt, attempt - carried, retry_delay, job_cycle):
+            return
+        await asyncio.sleep(retry_delay)
 
-def analyze_bid_ask(stock_code, data):
+def analyze_bid_ask(stock_code, book):
     """
     Enhanced analysis with multiple decision factors.
+    `book` is a decoded OrderBook (a raw market-depth dict is also accepted).
+    Returns True when the snapshot was analyzed and cached.
     """
+    started = time.perf_counter()
     try:
+        if not isinstance(book, OrderBook):
+            book = book_from_dict(book)
         timestamp = datetime.now()
-        total_bids_and_asks = data.get("total_bids_and_asks", {})
-        total_bid_volume = total_bids_and_asks.get("total_bids", 0)
-        total_ask_volume = total_bids_and_asks.get("total_asks", 0)
-        ratio = (total_bid_volume / total_ask_volume) if total_ask_volume else 0
-        
-        # Extract order book data
-        bids_data = data.get("bids_per_price", [])
-        asks_data = data.get("asks_per_price", [])
-        
-        # Calculate best bid/ask and spread
-        best_bid = max([to_number(bid.get("order_price", 0)) for bid in bids_data], default=0)
-        best_ask = min([to_number(ask.get("order_price", float('inf'))) for ask in asks_data], default=0)
-        mid_price = (best_bid + best_ask) / 2 if best_bid and best_ask else 0
-        spread = best_ask - best_bid if best_bid and best_ask else 0
-        spread_pct = (spread / mid_price * 100) if mid_price else 0
-        
-        # Calculate multi-level imbalance (weighted by price level)
-        weighted_bid_volume = sum(to_number(bid.get("volume_traded", 0)) * (1 / (i + 1)) 
-                                 for i, bid in enumerate(bids_data[:5]))
-        weighted_ask_volume = sum(to_number(ask.get("volume_traded", 0)) * (1 / (i + 1)) 
-                                 for i, ask in enumerate(asks_data[:5]))
-        weighted_imbalance = (weighted_bid_volume / weighted_ask_volume) if weighted_ask_volume else 0
+        total_bid_volume = book.total_bids
+        
+        # Best prices, spread, level counts and weighted imbalance in one reduction per side
+        metrics = reduce_book(book)
+        ratio = metrics.ratio
+        quote_cache.put(stock_code, metrics.best_bid, metrics.best_ask)
         
         # Store current snapshot
         snapshot = {
             'timestamp': timestamp,
             'ratio': ratio,
             'bid_volume': total_bid_volume,
-            'ask_volume': total_ask_volume,
-            'best_bid': best_bid,
-            'best_ask': best_ask,
-            'mid_price': mid_price,
-            'spread': spread,
-            'spread_pct': spread_pct,
-            'weighted_imbalance': weighted_imbalance,
-            'bid_levels': len(bids_data),
-            'ask_levels': len(asks_data)
+            'ask_volume': book.total_asks,
+            'best_bid': metrics.best_bid,
+            'best_ask': metrics.best_ask,
+            'mid_price': metrics.mid_price,
+            'spread': metrics.spread,
+            'spread_pct': metrics.spread_pct,
+            'weighted_imbalance': metrics.weighted_imbalance,
+            'bid_levels': metrics.bid_levels,
+            'ask_levels': metrics.ask_levels
         }
         
-        # Initialize history if needed
-        if stock_code not in stock_history:
-            stock_history[stock_code] = deque(maxlen=HISTORY_SIZE)
+        stock_history.append(stock_code, snapshot)
         
-        stock_history[stock_code].append(snapshot)
-        
-        # Calculate enhanced features
-        score = calculate_signal_score(stock_code, snapshot)
-        signal_scores[stock_code] = score
+        if vector_scoring:
+            # Scored with the next batch in score_pending_batch
+            with lock:
+                pending_scores[stock_code] = None
+                stock_ratios[stock_code] = ratio
+                volumes[stock_code] = total_bid_volume
+        else:
+            # Calculate enhanced features
+            score = calculate_signal_score(stock_code, snapshot)
+            signal_scores[stock_code] = score
+            
+            # Update legacy variables for backward compatibility
+            stock_ratios[stock_code] = ratio
+            volumes[stock_code] = total_bid_volume
+            analysis_cache[stock_code] = (ratio, score, total_bid_volume)
         
-        # Update legacy variables for backward compatibility
-        stock_ratios[stock_code] = ratio
-        volumes[stock_code] = total_bid_volume
+        elapsed = time.perf_counter() - started
+        cost_estimator.record_analysis(stock_code, elapsed)
+        with lock:
+            analysis_seconds['total'] += elapsed
+            analysis_seconds['count'] += 1
+        return True
         
     except Exception as e:
         log_notification(f"Error analyzing bid/ask for {stock_code}: {str(e)}")
+        return False
 
 def calculate_signal_score(stock_code, current_snapshot):
     """
@@ -559,69 +1056,17 @@ def calculate_signal_score(stock_code, current_snapshot):
         if len(history) < 2:
             return 0  # Need at least 2 snapshots for trend analysis
         
-        score = 0
-        factors = []
-        
-        # Factor 1: Basic ratio strength (0-25 points)
-        ratio = current_snapshot['ratio']
-        if ratio > 1:
-            ratio_score = min(25, (ratio - 1) * 25)  # Cap at 25 points
-            score += ratio_score
-            factors.append(f"Ratio={ratio:.2f} (+{ratio_score:.1f})")
-        
-        # Factor 2: Ratio velocity/momentum (0-20 points)
-        if len(history) >= 3:
-            recent_ratios = [snap['ratio'] for snap in list(history)[-3:]]
-            if len(recent_ratios) >= 2:
-                velocity = (recent_ratios[-1] - recent_ratios[0]) / len(recent_ratios)
-                if velocity > 0:
-                    velocity_score = min(20, velocity * 50)  # Normalize velocity
-                    score += velocity_score
-                    factors.append(f"Velocity={velocity:.3f} (+{velocity_score:.1f})")
-        
-        # Factor 3: Weighted imbalance (0-20 points)
-        imbalance = current_snapshot.get('weighted_imbalance', 1)
-        if imbalance > 1:
-            imbalance_score = min(20, (imbalance - 1) * 20)
-            score += imbalance_score
-            factors.append(f"Imbalance={imbalance:.2f} (+{imbalance_score:.1f})")
-        
-        # Factor 4: Price momentum (0-15 points)
-        if len(history) >= 2:
-            prev_mid = history[-2].get('mid_price', 0)
-            curr_mid = current_snapshot.get('mid_price', 0)
-            if prev_mid > 0 and curr_mid > 0:
-                price_change = (curr_mid - prev_mid) / prev_mid
-                if price_change > 0:
-                    momentum_score = min(15, price_change * 1000)  # Scale for typical price changes
-                    score += momentum_score
-                    factors.append(f"PriceMomentum={price_change*100:.2f}% (+{momentum_score:.1f})")
-        
-        # Factor 5: Spread penalty (0 to -10 points)
-        spread_pct = current_snapshot.get('spread_pct', 0)
-        if spread_pct > 2:  # Penalize wide spreads
-            spread_penalty = min(10, (spread_pct - 2) * 2)
-            score -= spread_penalty
-            factors.append(f"SpreadPenalty={spread_pct:.2f}% (-{spread_penalty:.1f})")
-        
-        # Factor 6: Activity/depth bonus (0-10 points)
-        total_levels = current_snapshot.get('bid_levels', 0) + current_snapshot.get('ask_levels', 0)
-        if total_levels > 10:
-            activity_bonus = min(10, (total_levels - 10) * 0.5)
-            score += activity_bonus
-            factors.append(f"Depth={total_levels} (+{activity_bonus:.1f})")
-        
-        # Factor 7: Consistency bonus - ratio trending up over multiple snapshots (0-10 points)
-        if len(history) >= 4:
-            recent_ratios = [snap['ratio'] for snap in list(history)[-4:]]
-            if len(recent_ratios) >= 2 and all(recent_ratios[i] <= recent_ratios[i+1] for i in range(len(recent_ratios)-1)):
-                consistency_bonus = 10
-                score += consistency_bonus
-                factors.append(f"Consistency (+{consistency_bonus})")
+        # Every registered factor, in order; explanations are built only for the log line below
+        plan = factor_registry.plan
+        timings = [] if factor_registry.sample() else None
+        score, contributions = run_factors(plan, history, current_snapshot, timings)
+        if timings is not None:
+            factor_registry.record([entry[0] for entry in plan], timings)
+        score_contributions[stock_code] = contributions
         
         # Log the calculation for high-scoring stocks
-        if score > 30 and len(factors) > 0:
-            log_notification(f"{stock_code} Score={score:.1f}: {', '.join(factors)}")
+        if score > 30 and contributions:
+            log_notification(f"{stock_code} Score={score:.1f}: {explain(contributions)} | {format_zscores(history.stats)}")
         
         return max(0, score)  # Ensure non-negative score
         
@@ -631,12 +1076,791 @@ def calculate_signal_score(stock_code, current_snapshot):
         ratio = current_snapshot.get('ratio', 0)
         return min(50, (ratio - 1) * 25) if ratio > 1 else 0
 
+def score_explanation(stock_code):
+    """
+    Factor breakdown of the symbol's latest score, formatted on demand: from
+    its last per-symbol score, or recomputed from its newest snapshot when it
+    was batch-scored.
+    """
+    contributions = score_contributions.get(stock_code)
+    if contributions is None:
+        history = stock_history.get(stock_code)
+        if not history or len(history) < 2:
+            return ""
+        _, contributions = run_factors(factor_registry.plan, history, history[-1])
+    return explain(contributions)
+
+def format_factor_stats():
+    """Average CPU time per symbol of each scoring factor since the previous call."""
+    s = factor_registry.take_stats()
+    if not s['factors']:
+        return "no symbols scored"
+    costs = ", ".join(f"{name} {ns / 1000:.2f}us" for name, ns in s['factors'].items())
+    return f"{s['scored']} scored | per symbol: {costs} | total {sum(s['factors'].values()) / 1000:.2f}us"
+
+def format_zscores(stats):
+    """The symbol's z-score factor variants against its own HISTORY_SIZE window."""
+    z = stats.zscores()
+    return f"z: ratio {z['ratio']:+.1f}σ, price {z['mid']:+.1f}σ, slope {z['slope']:+.2f}σ/snap"
+
+def score_pending_batch(publish=True):
+    """
+    SCORING_ENGINE=vector: score every symbol analyzed since the previous
+    batch in one NumPy pass (same scores as calculate_signal_score), then
+    publish them to the alert pipeline. Symbols above 30 log their factor
+    breakdown like the scalar function. A registered factor without a batch
+    form makes the batch fall back to calculate_signal_score per symbol.
+    Batches run one at a time, so once a call returns every symbol analyzed
+    before it has its score.
+
+    Args:
+        publish: False to return the scored symbols instead of publishing them (the batch-score stage)
+
+    Returns:
+        list: (stock_code, received_at) of the scored symbols whose response has been handled
+    """
+    with batch_score_lock:
+        return _score_pending_batch(publish)
+
+def _score_pending_batch(publish):
+    with lock:
+        pending = dict(pending_scores)
+        pending_scores.clear()
+        books = {code: pending_fingerprints.pop(code) for code in pending if code in pending_fingerprints}
+        codes = [code for code in pending if stock_history.get(code)]
+    if not codes:
+        return []
+    factors = factor_registry.factors
+    batched = factor_registry.vectorizable()
+    started = time.perf_counter()
+    if batched:
+        timings = []
+        scores = batch_scoring.score_store(stock_history, codes, factors, timings)
+        factor_registry.record(factors, timings, symbols=len(codes), batch=True)
+    else:
+        scores = [calculate_signal_score(code, stock_history[code][-1]) for code in codes]
+    elapsed = time.perf_counter() - started
+    with lock:
+        for code, score in zip(codes, scores):
+            signal_scores[code] = score
+            if code in stock_ratios:  # cleared by a new cycle since it was analyzed: nothing to cache
+                analysis_cache[code] = (stock_ratios[code], score, volumes.get(code, 0))
+                if code in books:
+                    # Only now does the cache hold this book's analysis
+                    remember_book(code, *books[code])
+            if batched:
+                score_contributions.pop(code, None)  # explained from the history when asked
+        cycle_stats['batch_scored'] = cycle_stats.get('batch_scored', 0) + len(codes)
+        cycle_stats['batch_seconds'] = cycle_stats.get('batch_seconds', 0.0) + elapsed
+    for code, score in zip(codes, scores):
+        if batched and score > 30:
+            log_notification(f"{code} Score={score:.1f}: {score_explanation(code)} | "
+                             f"{format_zscores(stock_history[code].stats)}")
+    ready = [(code, pending[code]) for code in codes if pending[code] is not None]
+    if not publish:
+        scored_at.update(ready)
+        return ready
+    for code, received_at in ready:
+        publish_scored(code, received_at)
+    return ready
+
+async_engine = None  # created on first async cycle
+fetch_pool = FetchWorkerPool(MAX_WORKERS)  # started at PREP, reused every cycle
+overrun_batches = []  # batches cancelled at the cycle deadline with fetches still running
+shard_coordinator = None  # SHARD_WORKERS mode only; started at PREP
+
+def run_fetch_cycle(rows):
+    """
+    Fetch and analyze every row with the configured FETCH_ENGINE.
+
+    Waits no longer than the cycle deadline; returns the stock codes that
+    were still in flight when it passed.
+    """
+    global async_engine
+    timeout = max(0, cycle_deadline - time.monotonic()) if cycle_deadline is not None else None
+    if FETCH_ENGINE == "async":
+        if async_engine is None:
+            async_engine = AsyncFetchEngine(max_concurrency=ASYNC_MAX_CONCURRENCY)
+        results, late_rows = async_engine.run_batch(rows, fetch_and_store_one_async, timeout=timeout)
+        for row, err in results:
+            if err is not None:
+                log_notification(f"UNHANDLED {row[0]}: {err}")
+        return [row[0] for row in late_rows]
+
+    # A symbol whose fetch from an earlier cycle is still running is not fetched twice
+    # (two fetches would append to its history ring concurrently); it counts as late
+    busy = {row[0] for row in fetch_in_flight()}
+    batch = fetch_pool.submit_batch(fetch_and_store_one, [row for row in rows if row[0] not in busy])
+    if not batch.wait(timeout):
+        # Like the async engine at its timeout: nothing queued for this cycle runs after the deadline
+        fetch_pool.cancel_batch(batch)
+        overrun_batches.append(batch)
+    finished = set()
+    for row, err in list(batch.results):
+        finished.add(row[0])
+        if err is not None:
+            log_notification(f"UNHANDLED {row[0]}: {err}")
+    return [row[0] for row in rows if row[0] not in finished]
+
+def fetch_in_flight():
+    """Rows of cancelled thread-engine batches whose fetch is still running."""
+    running = []
+    for batch in list(overrun_batches):
+        jobs = batch.in_flight()
+        if jobs:
+            running.extend(jobs)
+        else:
+            overrun_batches.remove(batch)
+    return running
+
+def loop_interval():
+    """Seconds between trading cycles for the current polling mode."""
+    return POLL_TICK_SECONDS if ADAPTIVE_POLLING else INTERVAL_SECONDS
+
+def select_cycle_rows():
+    """
+    Rows to fetch this cycle: due symbols under adaptive polling, carried
+    retries first, then (with DISPATCH_ORDER=longest) the most expensive
+    symbols so they don't stretch the end of the cycle. Symbols whose
+    breaker is open are left out (they keep their last values as stale)
+    unless their half-open probe is due.
+    """
+    rows = stocks_list
+    if ADAPTIVE_POLLING:
+        due = set(poll_scheduler.due([row[0] for row in stocks_list]))
+        rows = [row for row in stocks_list if row[0] in due or row[0] in carried_retries]
+    allowed = []
+    for row in rows:
+        if depth_breakers.get(row[0]).allow_request():
+            allowed.append(row)
+        else:
+            breaker_skipped.add(row[0])
+    allowed.sort(key=lambda row: row[0] not in carried_retries)
+    workers = ASYNC_MAX_CONCURRENCY if FETCH_ENGINE == "async" else MAX_WORKERS
+    ordered, plan = cost_estimator.order(allowed, pinned=carried_retries, workers=workers)
+    dispatch_plan.clear()
+    dispatch_plan.update(plan)
+    return ordered if DISPATCH_ORDER == "longest" else allowed
+
+def format_clock_stats(c):
+    """One-line summary of cycle_clock.take_stats()."""
+    return (f"{c['cycles']} cycles | period avg {c['period_avg']:.2f}s max {c['period_max']:.2f}s | "
+            f"jitter avg {c['jitter_avg']*1000:.0f}ms max {c['jitter_max']*1000:.0f}ms | "
+            f"overruns {c['overruns']} ({c['missed_ticks']} ticks {CATCH_UP_POLICY}) | "
+            f"session overruns {c['session_overruns']}/{c['session_cycles']}")
+
+def begin_cycle():
+    """
+    Reset per-cycle counters, arm the deadline and retry budget, size the
+    rate ceiling to the active tokens, and clear this cycle's results.
+
+    Returns:
+        dict: stock_code -> (ratio, score, volume) from the previous cycle, used to carry stale symbols forward.
+    """
+    global cycle_number, cycle_deadline, retry_budget_left
+    with lock:
+        cycle_number += 1
+        last_values = {code: (stock_ratios[code], signal_scores.get(code, 0), volumes.get(code, 0))
+                       for code in stock_ratios}
+        cycle_stats.clear()
+        cycle_stats['carried_in'] = len(carried_retries)
+        retry_budget_left = CYCLE_RETRY_BUDGET
+        cycle_deadline = time.monotonic() + min(CYCLE_DEADLINE_SECONDS, 0.8 * loop_interval())
+        stale_symbols.clear()
+        unpolled_symbols.clear()
+        breaker_skipped.clear()
+        stock_ratios.clear()
+        signal_scores.clear()
+    apply_token_rate_ceiling()
+    return last_values
+
+def finish_cycle(rows, late_codes, last_values):
+    """
+    Carry symbols without a fresh snapshot forward with their last values:
+    polled-but-failed and breaker-skipped ones as stale, ones the adaptive
+    scheduler skipped as unpolled. With SCORING_ENGINE=vector the snapshots
+    no batch has scored yet are batch-scored first.
+    """
+    if vector_scoring:
+        score_pending_batch()
+    polled = {row[0] for row in rows} | breaker_skipped
+    transitions = depth_breakers.take_transitions()
+    with lock:
+        cycle_stats['breaker_transitions'] = transitions
+        cycle_stats['late'] = len(late_codes)
+        fresh = [code for code in polled if code in stock_ratios]
+        for code, (ratio, score, volume) in last_values.items():
+            if code in stock_ratios:
+                continue
+            stock_ratios[code] = ratio
+            signal_scores[code] = score
+            volumes[code] = volume
+            (stale_symbols if code in polled else unpolled_symbols).add(code)
+        cycle_stats['stale'] = len(stale_symbols)
+        cycle_stats['unpolled'] = len(unpolled_symbols)
+        cycle_stats['fresh'] = len(fresh)
+
+    if ADAPTIVE_POLLING:
+        polled -= breaker_skipped
+        for code in fresh:
+            history = stock_history.get(code)
+            if not history:
+                continue
+            snap = history[-1]
+            empty_book = snap['bid_levels'] == 0 or snap['ask_levels'] == 0
+            poll_scheduler.observe(code, signal_scores.get(code, 0), stock_ratios.get(code, 0),
+                                   snap['mid_price'], empty_book)
+        poll_scheduler.mark_polled(polled)
+
+def format_cycle_stats():
+    """One-line summary of the current cycle's fetch counters."""
+    s = cycle_stats
+    return (f"fresh {s.get('fresh', 0)} | late {s.get('late', 0)} | stale {s.get('stale', 0)} | "
+            f"unpolled {s.get('unpolled', 0)} | "
+            f"retried {s.get('retried', 0)} ({s.get('retries', 0)} retries, budget left {retry_budget_left}) | "
+            f"carried to next cycle {s.get('carried', 0)}")
+
+def format_dispatch_stats(fetch_elapsed):
+    """Dispatch order and its predicted effect on the fetch makespan, next to the measured one."""
+    if not cost_estimator.known():
+        return f"{DISPATCH_ORDER} | no cost estimates yet"
+    ordered, csv_order = dispatch_plan.get('ordered', 0.0), dispatch_plan.get('input', 0.0)
+    change = f" ({(ordered - csv_order) / csv_order * 100:+.0f}%)" if csv_order else ""
+    line = f"predicted makespan {ordered:.2f}s longest-first vs {csv_order:.2f}s CSV order{change}"
+    if DISPATCH_ORDER != "longest":
+        line = f"CSV order (DISPATCH_ORDER={DISPATCH_ORDER}) | " + line
+    return line + f" | actual {fetch_elapsed:.2f}s"
+
+def format_token_stats(stats=None):
+    """Token pool states and per-token request/429 counters (token_pool.stats() by default)."""
+    stats = token_pool.stats() if stats is None else stats
+    states = [entry['state'] for entry in stats.values()]
+    line = (f"{len(stats)} tokens: {states.count(ACTIVE)} active, {states.count(THROTTLED)} throttled, "
+            f"{states.count(EXPIRED)} expired")
+    for label, entry in stats.items():
+        line += (f" | {label} {entry['state']} {entry['requests']} req, {entry['throttled']}x429"
+                 + (f", {entry['rejected']}x401/403" if entry['rejected'] else ""))
+    return line
+
+def format_breaker_stats():
+    """Open / half-open breakers and this cycle's transitions."""
+    open_codes = depth_breakers.names_in_state(OPEN)
+    half_open = depth_breakers.names_in_state(HALF_OPEN)
+    transitions = cycle_stats.get('breaker_transitions', [])
+    line = f"open {len(open_codes)}"
+    if open_codes:
+        line += f" ({', '.join(open_codes[:10])}{', ...' if len(open_codes) > 10 else ''})"
+    line += f" | half-open {len(half_open)} | skipped {len(breaker_skipped)} | tripped {cycle_stats.get('breaker_tripped', 0)}"
+    if transitions:
+        line += " | " + ", ".join(f"{code} {old}->{new}" for code, old, new, _ in transitions)
+    return line
+
+def format_poll_stats():
+    """Adaptive polling tiers and planned request rate."""
+    p = poll_scheduler.stats()
+    tiers = ", ".join(f"{name} {count}" for name, count in sorted(p['tiers'].items()))
+    stretched = f" (intervals stretched x{p['stretch']:.2f})" if p['stretch'] > 1.01 else ""
+    return f"{tiers} | planned {p['planned_rate']:.1f}/{p['budget']:.1f} req/s{stretched}"
+
+def format_change_stats():
+    """Changed vs unchanged books this cycle, failed analyses and the analysis time skipped."""
+    s = cycle_stats
+    unchanged = s.get('unchanged', 0)
+    avg_cost = analysis_seconds['total'] / analysis_seconds['count'] if analysis_seconds['count'] else 0
+    line = (f"changed {s.get('changed', 0)} | unchanged {unchanged} ({s.get('not_modified', 0)} via 304) | "
+            f"analysis skipped ~{unchanged * avg_cost * 1000:.1f}ms")
+    if s.get('analysis_failed'):
+        line += f" | analysis failed {s['analysis_failed']}"
+    return line
+
+def format_latency_stats():
+    """Pooled p50/p95, the timeout they imply, and hedging since the previous call."""
+    stats = latency_tracker.percentiles()
+    if stats is None:
+        line = f"warming up | timeout {REQUEST_TIMEOUT}s"
+    else:
+        line = (f"p50 {stats[0]*1000:.0f}ms | p95 {stats[1]*1000:.0f}ms | "
+                f"timeout {latency_tracker.timeout_for():.1f}s")
+    if HEDGED_REQUESTS:
+        h = hedge_budget.take_stats()
+        line += (f" | hedged {h['hedges']} (won {h['hedge_wins']}, "
+                 f"+{h['extra_load']*100:.1f}% load, cap {HEDGE_MAX_EXTRA_LOAD*100:.0f}%, "
+                 f"{h['in_flight']} pairs unfinished)")
+    return line
+
+def format_rate_limit_stats(m):
+    """One-line summary of api_limiter.take_metrics()."""
+    return (f"rate {m['rate']:.1f} req/s | sustainable ~{m['sustainable_rate']:.1f} req/s | "
+            f"actual {m['throughput']:.1f} req/s | 429s {m['throttled']} | waited {m['waited']:.1f}s")
+
+def init_shard_worker(worker_count):
+    """
+    Set up a SHARD_WORKERS worker process: each worker gets an equal share of
+    the API rate so the processes together stay within the configured limits.
+    """
+    global api_limiter, rate_limit_share, rate_ceiling_tokens
+    init_http()  # the worker's own pools; its tokens come from the coordinator with every cycle
+    rate_limit_share = 1.0 / worker_count
+    rate_ceiling_tokens = 1
+    api_limiter = AdaptiveRateLimiter(initial_rate=RATE_LIMIT_INITIAL / worker_count,
+                                      min_rate=RATE_LIMIT_MIN / worker_count,
+                                      max_rate=RATE_LIMIT_MAX / worker_count, burst=MAX_WORKERS)
+    if FETCH_ENGINE == "thread":
+        fetch_pool.start()
+
+def run_shard_cycle(rows, tokens=None):
+    """
+    Worker side of SHARD_WORKERS mode: fetch and score this worker's shard
+    with the normal cycle functions, and return what the coordinator merges.
+    """
+    global stocks_list, token_expired
+    if tokens:
+        # The coordinator's token list; tokens this worker saw rejected stay retired here
+        token_pool.update(tokens)
+        if token_expired and not token_pool.all_expired:
+            token_expired = False
+    started = time.perf_counter()
+    shard_codes = {row[0] for row in rows}
+    with lock:
+        # Symbols that moved to another worker must not be carried forward here
+        for code in [code for code in stock_ratios if code not in shard_codes]:
+            stock_ratios.pop(code, None)
+            signal_scores.pop(code, None)
+    stocks_list = rows
+    poll_scheduler.register(list(shard_codes))
+    last_values = begin_cycle()
+    cycle_rows = select_cycle_rows()
+    late_codes = run_fetch_cycle(cycle_rows)
+    finish_cycle(cycle_rows, late_codes, last_values)
+    with lock:
+        fresh = [code for code in stock_ratios if code not in stale_symbols and code not in unpolled_symbols]
+        quotes = {}
+        for code in fresh:
+            quote = quote_cache.peek(code)
+            if quote is not None:
+                quotes[code] = (quote.bid, quote.ask)
+        return {
+            'stock_ratios': dict(stock_ratios),
+            'signal_scores': dict(signal_scores),
+            'volumes': {code: volumes[code] for code in stock_ratios if code in volumes},
+            'stale': list(stale_symbols),
+            'unpolled': list(unpolled_symbols),
+            'breaker_skipped': list(breaker_skipped),
+            'late': list(late_codes),
+            'polled': len(cycle_rows),
+            'quotes': quotes,
+            'cycle_stats': {name: value for name, value in cycle_stats.items() if isinstance(value, (int, float))},
+            'token_expired': token_expired,
+            'tokens': token_pool.stats(),
+            'seconds': time.perf_counter() - started,
+        }
+
+def start_shard_workers():
+    global shard_coordinator
+    shard_coordinator = ShardCoordinator(SHARD_WORKERS, "price_depth", "init_shard_worker", "run_shard_cycle",
+                                         shutdown_name="shutdown_fetch_engines", init_args=(SHARD_WORKERS,))
+    shard_coordinator.start()
+    print(f"🧩 Started {len(shard_coordinator.ready_ids())}/{SHARD_WORKERS} shard workers")
+
+def run_sharded_cycle():
+    """
+    Coordinator side of SHARD_WORKERS mode: run one cycle on every worker and
+    merge their results into this process's globals for process_notifications.
+
+    Returns:
+        int: symbols fetched this cycle.
+        list: codes that were late or whose worker did not answer.
+    """
+    global token_expired
+    if shard_coordinator is None:
+        start_shard_workers()
+    timeout = min(CYCLE_DEADLINE_SECONDS, 0.8 * loop_interval()) + 1.0
+    payloads, unserved = shard_coordinator.run_cycle(stocks_list, timeout, tokens=token_pool.tokens())
+    with lock:
+        previous = {code: (stock_ratios[code], signal_scores.get(code, 0), volumes.get(code, 0))
+                    for code in stock_ratios}
+        for collection in (stock_ratios, signal_scores, stale_symbols, unpolled_symbols, breaker_skipped, cycle_stats):
+            collection.clear()
+        polled, late_codes, token_stats = 0, [], {}
+        for payload in payloads:
+            stock_ratios.update(payload['stock_ratios'])
+            signal_scores.update(payload['signal_scores'])
+            volumes.update(payload['volumes'])
+            stale_symbols.update(payload['stale'])
+            unpolled_symbols.update(payload['unpolled'])
+            breaker_skipped.update(payload['breaker_skipped'])
+            late_codes.extend(payload['late'])
+            polled += payload['polled']
+            # Each worker rotates its own copy of the pool; add up its counters and keep the worst state
+            for label, entry in payload['tokens'].items():
+                merged = token_stats.setdefault(label, {'state': ACTIVE, 'requests': 0, 'throttled': 0, 'rejected': 0})
+                for name in ('requests', 'throttled', 'rejected'):
+                    merged[name] += entry[name]
+                if TOKEN_STATE_RANK[entry['state']] > TOKEN_STATE_RANK[merged['state']]:
+                    merged['state'] = entry['state']
+            for name, value in payload['cycle_stats'].items():
+                cycle_stats[name] = cycle_stats.get(name, 0) + value
+            if payload['token_expired']:
+                token_expired = True
+        # Symbols of a worker that did not answer keep their last values, as stale
+        for row in unserved:
+            code = row[0]
+            late_codes.append(code)
+            if code in previous and code not in stock_ratios:
+                stock_ratios[code], signal_scores[code], volumes[code] = previous[code]
+                stale_symbols.add(code)
+        cycle_stats['stale'] = len(stale_symbols)
+        cycle_stats['late'] = len(late_codes)
+        shard_token_stats.clear()
+        shard_token_stats.update(token_stats)
+    for payload in payloads:
+        for code, (bid, ask) in payload['quotes'].items():
+            quote_cache.put(code, bid, ask)
+    return polled, late_codes
+
+def format_shard_stats():
+    """Shard sizes and the slowest worker of the latest cycle."""
+    last = shard_coordinator.last_cycle
+    sizes = "/".join(str(last[w]['symbols']) for w in sorted(last))
+    slowest = max((c['seconds'] for c in last.values()), default=0.0)
+    return (f"{len(shard_coordinator.ready_ids())}/{SHARD_WORKERS} workers | symbols {sizes or '-'} | "
+            f"slowest {slowest:.2f}s | restarts {shard_coordinator.restarts}")
+
+def screen_one(row):
+    """Cheap tier: one getBook5 request for `row`, cached as a quote and fed to the funnel."""
+    code = row[0]
+    stock_data = request_book5(code)
+    if not stock_data:
+        return
+    quote = quote_from_book5(stock_data)
+    quote_cache.put(code, quote.bid, quote.ask, quote.last, source="getBook5")
+    bid_volume = sum(parse_number(level.get('volume')) for level in stock_data.get('bids') or [])
+    ask_volume = sum(parse_number(level.get('volume')) for level in stock_data.get('asks') or [])
+    reason = screening_funnel.screen(code, bid_volume, ask_volume, quote.price)
+    if reason is not None:
+        log_notification(f"🪜 Promoted {code} to full depth ({reason})")
+
+def sync_funnel_rows():
+    """stocks_list = core symbols + promoted ones; newly promoted symbols join adaptive polling."""
+    global stocks_list
+    rows = core_stocks + screening_funnel.promoted_rows()
+    monitored = {row[0] for row in stocks_list}
+    poll_scheduler.register([row[0] for row in rows if row[0] not in monitored])
+    stocks_list = rows
+
+def run_screening_pass():
+    """
+    Screen this cycle's slice of the universe on the fetch workers, sized so
+    every symbol is screened about once per SCREEN_PASS_SECONDS, then add
+    the promoted symbols to stocks_list. After half an interval the screens
+    still queued are cancelled, so they never hold up the depth fetches
+    behind them; their symbols lead the next slice. Screens already running
+    finish in the background and count next cycle.
+    """
+    per_cycle = -(-screening_funnel.universe_size * loop_interval() // SCREEN_PASS_SECONDS)
+    rows = screening_funnel.next_slice(int(per_cycle))
+    if rows:
+        batch = fetch_pool.submit_batch(screen_one, rows)
+        started = len(rows)
+        if not batch.wait(0.5 * loop_interval()):
+            running = {row[0] for row in fetch_pool.cancel_batch(batch)}
+            done = {row[0] for row, _ in list(batch.results)}
+            unscreened = [row[0] for row in rows if row[0] not in done and row[0] not in running]
+            screening_funnel.give_back(unscreened)
+            started -= len(unscreened)
+        for row, err in list(batch.results):
+            if err is not None:
+                log_notification(f"SCREEN {row[0]}: {err}")
+        funnel_requests['screen'] += started
+    sync_funnel_rows()
+
+def update_funnel(polled):
+    """
+    After the depth cycle: a promoted symbol with at least a MEDIUM reading
+    (score >= 65, ratio > 1) restarts its cooldown; ones quiet for
+    FUNNEL_COOLDOWN_SECONDS are demoted and their per-symbol state dropped.
+    Also counts the depth requests against polling the whole universe at depth.
+    """
+    for row in screening_funnel.promoted_rows():
+        code = row[0]
+        if code in stock_ratios and code not in stale_symbols and code not in unpolled_symbols:
+            screening_funnel.observe_depth(code, signal_scores.get(code, 0) >= 65 and stock_ratios[code] > 1)
+    demoted = screening_funnel.demote_due()
+    if demoted:
+        with lock:
+            for code in demoted:
+                for table in (stock_ratios, signal_scores, volumes, previous_ratios, stock_history,
+                              analysis_cache, book_fingerprints, book_validators, pending_fingerprints, carried_retries):
+                    table.pop(code, None)
+        poll_scheduler.unregister(demoted)
+        log_notification(f"🪜 Demoted {', '.join(demoted)} after {FUNNEL_COOLDOWN_SECONDS}s without a signal")
+    # Polling everything at depth would fetch the same share of a larger list
+    funnel_requests['depth'] += polled
+    if stocks_list:
+        funnel_requests['all_depth'] += polled * (len(core_stocks) + screening_funnel.universe_size) / len(stocks_list)
+    sync_funnel_rows()
+
+def format_funnel_stats():
+    """Funnel size, promotion churn since the previous call and session request savings."""
+    f = screening_funnel.take_stats()
+    made = funnel_requests['screen'] + funnel_requests['depth']
+    baseline = funnel_requests['all_depth']
+    saving = f" ({(made - baseline) / baseline * 100:+.0f}%)" if baseline else ""
+    return (f"universe {f['universe']} + core {len(core_stocks)} | promoted {f['promoted_now']} "
+            f"(+{f['promoted']}/-{f['demoted']}, capped {f['capped']}) | screened {f['screened']} | "
+            f"session churn {f['totals']['promoted'] + f['totals']['demoted']} | "
+            f"requests {made} ({funnel_requests['depth']} depth + {funnel_requests['screen']} getBook5) "
+            f"vs ~{baseline:.0f} all at depth{saving}")
+
+def format_history_stats():
+    """Symbols with history, snapshots kept per symbol and ring-buffer memory per symbol."""
+    return (f"{len(stock_history)} symbols x {HISTORY_SIZE} snapshots, "
+            f"{stock_history.memory_per_symbol() / 1024:.1f} KB/symbol")
+
+def validate_token_on_depth():
+    """
+    One depth request for the first symbol with the next token, handled
+    like any other response (rate limiter, breaker and token pool included):
+    a 401/403 with no live token left sets token_expired (and alerts), a 200
+    seeds that symbol's first snapshot.
+
+    Returns:
+        str: "ok" (accepted), "rate_limited" (429), "rotated" (that token was
+             rejected, others are still live), "expired" (no live token left),
+             "failed" (any other status) or "unreachable" (no response)
+    """
+    if not stocks_list:
+        return "unreachable"
+    row = stocks_list[0]
+    api_limiter.acquire()
+    request_start = time.monotonic()
+    try:
+        response = depth_get(row[0], depth_url(row))
+    except Exception as e:
+        record_breaker_result(row[0], net_err=e)
+        log_notification(f"🌅 Warm-up token check failed: {e}")
+        return "unreachable"
+    status = response.status_code
+    record_rate_limit(status, time.monotonic() - request_start)
+    record_breaker_result(row[0], status)
+    handle_depth_response(row[0], status, response.content, 1, response.headers)
+    if token_expired:
+        return "expired"
+    if status in (200, 304):
+        return "ok"
+    if status == 429:
+        return "rate_limited"
+    if status in (401, 403):
+        return "rotated"
+    return "failed"
+
+def run_prep_warmup():
+    """
+    PREP-window warm-up, called every PREP tick: check the token against the
+    depth endpoint once, then during the last PREP_SEED_SECONDS run full
+    fetch cycles without notifications. Those open the pooled (or HTTP/2)
+    connections, warm the latency, cost and breaker state, and fill
+    stock_history, so scores are meaningful from the first trading cycle.
+    """
+    global previous_ratios
+    if not prep_warmup['token_checked']:
+        outcome = validate_token_on_depth()
+        # Only a definite answer ends the check; the others are retried on the next PREP tick
+        if outcome in ("ok", "expired"):
+            prep_warmup['token_checked'] = True
+        labels = {"ok": "accepted", "expired": "expired", "rate_limited": "rate limited, retrying",
+                  "rotated": f"token rejected, {token_pool.live_count()} still live, retrying",
+                  "failed": "endpoint error, retrying", "unreachable": "endpoint unreachable"}
+        print(f"🌅 Warm-up token check: {labels[outcome]} | Pools: {http_session.format_pool_stats()}")
+        if outcome != "ok":
+            return
+
+    opening = datetime.combine(datetime.now().date(), TRADING_START_TIME)
+    if (opening - datetime.now()).total_seconds() > PREP_SEED_SECONDS:
+        return
+    if screening_funnel is not None:
+        run_screening_pass()  # screens before the open give the move test a reference price
+    started = time.perf_counter()
+    if SHARD_WORKERS:
+        polled, late_codes = run_sharded_cycle()
+    else:
+        last_values = begin_cycle()
+        rows = select_cycle_rows()
+        late_codes = run_fetch_cycle(rows)
+        finish_cycle(rows, late_codes, last_values)
+        polled = len(rows)
+    # The first trading cycle measures ratio changes against the last pre-open snapshot
+    previous_ratios = stock_ratios.copy()
+    prep_warmup['snapshots'] += 1
+    seeded = sum(1 for history in stock_history.values() if len(history) >= 2)
+    print(f"🌅 Pre-open snapshot {prep_warmup['snapshots']}: fetched {polled} stocks in "
+          f"{time.perf_counter() - started:.2f}s | {seeded}/{len(stocks_list)} symbols scoreable | "
+          f"late {len(late_codes)} | History: {format_history_stats()} | Pools: {http_session.format_pool_stats()}")
+
+def shutdown_fetch_engines():
+    """Stop the worker pool, the async loop and pooled connections."""
+    global async_engine, hedge_executor, shard_coordinator
+    if shard_coordinator is not None:
+        shard_coordinator.shutdown()
+        shard_coordinator = None
+    fetch_pool.shutdown()
+    if alert_pipeline.running:
+        alert_pipeline.drain(ALERT_DRAIN_SECONDS)
+        alert_pipeline.shutdown()
+    if hedge_executor is not None:
+        hedge_executor.shutdown(wait=False)
+        hedge_executor = None
+    if async_engine is not None:
+        async_engine.close()
+        async_engine = None
+    quote_cache.close()
+    http_session.close_all()
+
 def fetch_stock_data(stock):  # backward compatibility wrapper
     try:
         fetch_and_store_one(stock if isinstance(stock, (list, tuple)) else [stock])
     except Exception as e:
         log_notification(f"Wrapper error {stock}: {e}")
 
+def evaluate_symbol(stock_code, score, ratio, prev_ratio, current_time):
+    """
+    Per-symbol alert rules for one fresh snapshot: cooldown, STRONG, MEDIUM
+    and ratio tracking lines. Call with alert_lock held, then
+    capture_alert_price after releasing it for a STRONG result.
+
+    Returns:
+        tuple: (notify_type, change_pct, msg); notify_type is "STRONG" when an alert must be delivered
+    """
+    # Check cooldown period
+    last_rec_time = last_recommendations.get(stock_code)
+    if last_rec_time:
+        time_diff = (current_time - last_rec_time).total_seconds() / 60
+        if time_diff < cooldown_minutes:
+            return None, 0, ""  # Skip if still in cooldown
+    
+    notify_type = None
+    change_pct = 0
+    msg = ""
+    
+    # STRONG RECOMMEND: Very high composite score + ratio > 1 (raised threshold for higher selectivity)
+    if score >= 75 and ratio > 1.2:  # More selective: higher score and ratio thresholds
+        # Double-check ratio consistency to prevent false alerts
+        current_ratio_check = stock_ratios.get(stock_code, 0)
+        if current_ratio_check <= 1.2:
+            print(f"⚠️ Data inconsistency detected for {stock_code}: calculated ratio={ratio:.2f}, current ratio={current_ratio_check:.2f}")
+            return None, 0, ""  # Skip this alert due to data inconsistency
+            
+        change_pct = (ratio - prev_ratio) / prev_ratio * 100 if prev_ratio else 0
+        msg = f"STRONG RECOMMEND: {stock_code}: Score={score:.1f}, Ratio={ratio:.2f}, Change={change_pct:+.2f}%"
+        notify_type = "STRONG"
+        last_recommendations[stock_code] = current_time
+        
+    # TAKE CARE alerts are now DISABLED - commented out
+    # elif prev_ratio is not None and prev_ratio > 1 and ratio < 1:
+    #     change_pct = (ratio - prev_ratio) / prev_ratio * 100
+    #     msg = f"TAKE CARE: {stock_code}: Ratio dropped below 1! Previous={prev_ratio:.2f}, Now={ratio:.2f}, Score={score:.1f}"
+    #     notify_type = "TAKE_CARE"
+    #     take_care_alerts.append(stock_code)
+    #     last_recommendations[stock_code] = current_time
+        
+    # High potential signals (logged but no alerts) - raised threshold
+    elif score >= 65 and ratio > 1:
+        change_pct = (ratio - prev_ratio) / prev_ratio * 100 if prev_ratio else 0
+        msg = f"MEDIUM SIGNAL: {stock_code}: Score={score:.1f}, Ratio={ratio:.2f}, Change={change_pct:+.2f}%"
+        
+    # Basic ratio tracking (existing logic for compatibility)
+    elif ratio > 1:
+        change_pct = (ratio - prev_ratio) / prev_ratio * 100 if prev_ratio else 0
+        msg = f"{stock_code}: Ratio={ratio:.2f}, Score={score:.1f}, Change={change_pct:+.2f}%" if prev_ratio is not None else f"{stock_code}: Ratio={ratio:.2f}, Score={score:.1f}, Change=N/A (first record)"
+    
+    if msg:
+        print(msg)
+        log_notification(msg)
+    return notify_type, change_pct, msg
+
+def capture_alert_price(stock_code, current_time, score, ratio):
+    """
+    Capture the price of a STRONG alert for tracking performance. Called
+    without alert_lock: the quote this cycle's depth fetch cached is almost
+    always there, but a miss waits on getBook5.
+    """
+    try:
+        quote = quote_cache.get(stock_code)
+        current_price = quote.price
+        with alert_lock:
+            strong_recommendations[stock_code] = {
+                'alert_time': current_time,
+                'alert_price': current_price,
+                'price_source': quote.source,
+                'score': score,
+                'ratio': ratio
+            }
+        print(f"📊 Captured price for {stock_code}: {current_price:.3f} ({quote.source}, {quote.age():.1f}s old)")
+    except Exception as e:
+        print(f"⚠️ Could not capture price for {stock_code}: {e}")
+
+def deliver_alert(alert):
+    """Notify stage: Telegram (and a toast) for one STRONG alert; records response-to-sent latency."""
+    stock_code, notify_type, score, ratio, change_pct, msg, received_at = alert
+    send_telegram_notification(stock_code, notify_type, score, ratio, change_pct,
+                               reasons=score_explanation(stock_code) if TELEGRAM_ENABLED else None)
+    # Toast notification for high-confidence signals only
+    if toaster:
+        toaster.show_toast("Stock Notification", msg, duration=8, threaded=True)
+    if received_at is not None:
+        alert_latency.record('delivered', time.monotonic() - received_at)
+
+def evaluate_scored(item):
+    """Evaluate stage: alert rules for one symbol the moment its snapshot is scored."""
+    stock_code, received_at = item
+    with lock:
+        score = signal_scores.get(stock_code)
+        ratio = stock_ratios.get(stock_code, 0)
+    if score is None:
+        return None  # cleared by the next cycle before it got here; the cycle end evaluates it
+    current_time = datetime.now()
+    with alert_lock:
+        notify_type, change_pct, msg = evaluate_symbol(stock_code, score, ratio, previous_ratios.get(stock_code),
+                                                       current_time)
+        streamed_alerts['evaluated'].add(stock_code)
+        if notify_type == "STRONG":
+            streamed_alerts['strong'].append(stock_code)
+    if notify_type == "STRONG":
+        capture_alert_price(stock_code, current_time, score, ratio)
+    alert_latency.record('decided', time.monotonic() - received_at)
+    if notify_type is None:
+        return None
+    return [(stock_code, notify_type, score, ratio, change_pct, msg, received_at)]
+
+def score_stage_batch(stock_code):
+    """
+    Batch-score stage (SCORING_ENGINE=vector): one NumPy batch over every
+    symbol analyzed so far, passed on to evaluation. Symbols arriving while a
+    batch runs queue up and form the next one; their later items find
+    nothing left to score.
+    """
+    return score_pending_batch(publish=False)
+
+def on_alert_pipeline_error(stage, item, err):
+    log_notification(f"UNHANDLED {stage} {item if isinstance(item, str) else item[0]}: {err}")
+
+# fetch workers -> [batch-score ->] evaluate -> notify; Telegram round trips never hold up evaluation
+alert_pipeline = StagedPipeline(([("batch-score", score_stage_batch, 1)] if vector_scoring else [])
+                                + [("alert-eval", evaluate_scored, 1), ("alert-notify", deliver_alert, 2)],
+                                on_error=on_alert_pipeline_error)
+
+def format_alert_stats():
+    """Where alerts were evaluated, and response-to-decision / response-to-sent latency since the previous call."""
+    s = alert_latency.take_stats()
+    line = "streamed as scored" if alert_stream_live else "at cycle end"
+    if s['decided']:
+        count, p50, worst = s['decided']
+        line += f" | response->decision p50 {p50*1000:.0f}ms max {worst*1000:.0f}ms ({count} symbols)"
+    if s['delivered']:
+        count, p50, worst = s['delivered']
+        line += f" | response->sent p50 {p50*1000:.0f}ms max {worst*1000:.0f}ms ({count} alerts)"
+    return line
+
 # Call the function
 def process_notifications():
     global previous_ratios
@@ -644,80 +1868,38 @@ def process_notifications():
     current_time = datetime.now()
     
     # Enhanced notification logic based on composite scores
-    strong_recommendations = []
+    strong_alerts = []
     take_care_alerts = []
     
+    # Streamed symbols were already evaluated (and alerted) as they were scored; only the summary is left
+    streamed = set()
+    if alert_stream_live:
+        if not alert_pipeline.drain(ALERT_DRAIN_SECONDS):
+            print(f"⚠️ Alert pipeline still busy after {ALERT_DRAIN_SECONDS}s: {alert_pipeline.queue_depths()}")
+        with alert_lock:
+            streamed, strong_alerts = streamed_alerts['evaluated'], streamed_alerts['strong']
+            streamed_alerts['evaluated'], streamed_alerts['strong'] = set(), []
+    
     for stock_code, score in signal_scores.items():
+        if stock_code in streamed:
+            continue
         ratio = stock_ratios.get(stock_code, 0)
         prev_ratio = prev_snapshot.get(stock_code)
         
-        # Check cooldown period
-        last_rec_time = last_recommendations.get(stock_code)
-        if last_rec_time:
-            time_diff = (current_time - last_rec_time).total_seconds() / 60
-            if time_diff < cooldown_minutes:
-                continue  # Skip if still in cooldown
-        
-        notify_type = None
-        msg = ""
-        
-        # STRONG RECOMMEND: Very high composite score + ratio > 1 (raised threshold for higher selectivity)
-        if score >= 75 and ratio > 1.2:  # More selective: higher score and ratio thresholds
-            # Double-check ratio consistency to prevent false alerts
-            current_ratio_check = stock_ratios.get(stock_code, 0)
-            if current_ratio_check <= 1.2:
-                print(f"⚠️ Data inconsistency detected for {stock_code}: calculated ratio={ratio:.2f}, current ratio={current_ratio_check:.2f}")
-                continue  # Skip this alert due to data inconsistency
-                
-            change_pct = (ratio - prev_ratio) / prev_ratio * 100 if prev_ratio else 0
-            msg = f"STRONG RECOMMEND: {stock_code}: Score={score:.1f}, Ratio={ratio:.2f}, Change={change_pct:+.2f}%"
-            notify_type = "STRONG"
-            last_recommendations[stock_code] = current_time
-            
-            # Capture price for tracking performance
-            try:
-                current_price = get_current_stock_price(stock_code)
-                strong_recommendations[stock_code] = {
-                    'alert_time': current_time,
-                    'alert_price': current_price,
-                    'score': score,
-                    'ratio': ratio
-                }
-                print(f"📊 Captured price for {stock_code}: {current_price:.3f}")
-            except Exception as e:
-                print(f"⚠️ Could not capture price for {stock_code}: {e}")
-            
-            # Send to Telegram
-            send_telegram_notification(stock_code, "STRONG", score, ratio, change_pct)
-            
-        # TAKE CARE alerts are now DISABLED - commented out
-        # elif prev_ratio is not None and prev_ratio > 1 and ratio < 1:
-        #     change_pct = (ratio - prev_ratio) / prev_ratio * 100
-        #     msg = f"TAKE CARE: {stock_code}: Ratio dropped below 1! Previous={prev_ratio:.2f}, Now={ratio:.2f}, Score={score:.1f}"
-        #     notify_type = "TAKE_CARE"
-        #     take_care_alerts.append(stock_code)
-        #     last_recommendations[stock_code] = current_time
-        #     
-        #     # Send to Telegram
-        #     send_telegram_notification(stock_code, "TAKE_CARE", score, ratio, change_pct)
-            
-        # High potential signals (logged but no alerts) - raised threshold
-        elif score >= 65 and ratio > 1:
-            change_pct = (ratio - prev_ratio) / prev_ratio * 100 if prev_ratio else 0
-            msg = f"MEDIUM SIGNAL: {stock_code}: Score={score:.1f}, Ratio={ratio:.2f}, Change={change_pct:+.2f}%"
-            
-        # Basic ratio tracking (existing logic for compatibility)
-        elif ratio > 1:
-            change_pct = (ratio - prev_ratio) / prev_ratio * 100 if prev_ratio else 0
-            msg = f"{stock_code}: Ratio={ratio:.2f}, Score={score:.1f}, Change={change_pct:+.2f}%" if prev_ratio is not None else f"{stock_code}: Ratio={ratio:.2f}, Score={score:.1f}, Change=N/A (first record)"
+        # Stale/unpolled symbols carry earlier values; don't alert on old data
+        if stock_code in stale_symbols or stock_code in unpolled_symbols:
+            continue
         
-        if msg:
-            print(msg)
-            log_notification(msg)
-            
-        # Toast notification for high-confidence signals only
-        if toaster and notify_type == "STRONG":
-            toaster.show_toast("Stock Notification", msg, duration=8, threaded=True)
+        with alert_lock:
+            notify_type, change_pct, msg = evaluate_symbol(stock_code, score, ratio, prev_ratio, current_time)
+        if notify_type == "STRONG":
+            capture_alert_price(stock_code, current_time, score, ratio)
+        received_at = scored_at.get(stock_code)
+        if received_at is not None:
+            alert_latency.record('decided', time.monotonic() - received_at)
+        if notify_type == "STRONG":
+            strong_alerts.append(stock_code)
+            deliver_alert((stock_code, notify_type, score, ratio, change_pct, msg, received_at))
 
     # Track positive changes
     for stock_code, ratio in stock_ratios.items():
@@ -732,8 +1914,8 @@ def process_notifications():
     # Enhanced Summary with score-based insights
     print(f"\n=== Summary of Tracked Stocks ({len(stock_ratios)} total) ===")
     
-    if strong_recommendations:
-        strong_rec_list = list(strong_recommendations.keys())
+    if strong_alerts:
+        strong_rec_list = strong_alerts
         print(f"🚀 STRONG RECOMMENDATIONS ({len(strong_rec_list)}): {', '.join(strong_rec_list)}")
     
     # TAKE CARE alerts are now disabled
@@ -756,15 +1938,17 @@ def process_notifications():
     avg_score = statistics.mean(signal_scores.values()) if signal_scores else 0
     
     print(f"📈 Market Overview: {high_ratio_count}/{len(stock_ratios)} stocks with ratio > 1, Avg Score: {avg_score:.1f}")
+    print(f"📣 Alerts: {format_alert_stats()}")
     
     # Send market summary to Telegram (every 6 cycles or if significant activity)
     if not hasattr(process_notifications, 'cycle_count'):
         process_notifications.cycle_count = 0
     process_notifications.cycle_count += 1
     
-    # Send summary if there's activity or every 6th cycle (every minute at 10s intervals)
-    if (process_notifications.cycle_count % 6 == 0 or 
-        len(strong_recommendations) > 0):
+    # Send summary if there's activity or roughly every minute (6th cycle at 10s intervals)
+    cycles_per_summary = max(1, round(60 / loop_interval()))
+    if (process_notifications.cycle_count % cycles_per_summary == 0 or 
+        len(strong_alerts) > 0):
         
         # Prepare top stocks data for Telegram
         telegram_top_stocks = []
@@ -775,7 +1959,7 @@ def process_notifications():
             telegram_top_stocks.append((stock_code, score, ratio, change_pct))
         
         send_telegram_summary(
-            len(strong_recommendations), 
+            len(strong_alerts), 
             len(take_care_alerts), 
             telegram_top_stocks, 
             len(stock_ratios), 
@@ -788,10 +1972,19 @@ def show_system_status():
     """Display minimal system status."""
     print(f"� Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"📈 Monitoring {len(stocks_list)} stocks: {', '.join([stock[0] for stock in stocks_list[:10]])}{', ...' if len(stocks_list) > 10 else ''}")
+    print(f"⚙️ Fetch engine: {FETCH_ENGINE} | Adaptive polling: {'on' if ADAPTIVE_POLLING else 'off'} | "
+          f"Hedged requests: {'on' if HEDGED_REQUESTS else 'off'} | "
+          f"HTTP/2: {'on' if http_session.uses_http2(DEPTH_API_BASE_URL) else 'off'} | "
+          f"Tokens: {token_pool.live_count()} | "
+          f"Dispatch: {DISPATCH_ORDER} | PREP warm-up: {'on' if PREP_WARMUP else 'off'} | "
+          f"Shard workers: {SHARD_WORKERS or 'off'} | "
+          f"Alerts: {'streamed' if STREAMING_ALERTS and not SHARD_WORKERS else 'cycle end'} | "
+          f"Scoring: {'vector' if vector_scoring else 'scalar'} | "
+          f"Funnel: {f'{screening_funnel.universe_size} screened via getBook5' if screening_funnel else 'off'}")
     print("=" * 60)
 
 def main_loop():
-    global token_expired, TOKEN, headers
+    global token_expired, token_expiry_notified, alert_stream_live
     show_system_status()
     
     # Send start-of-day message with stock list
@@ -799,16 +1992,20 @@ def main_loop():
     
     print("Starting enhanced stock monitoring...")
     
+    # Cycles start on fixed wall-clock ticks instead of sleeping a fixed time after each cycle
+    cycle_clock = FixedRateScheduler(loop_interval(), catch_up=CATCH_UP_POLICY)
+    trading_cycles = 0
+    
     # Token refresh counter
     token_check_counter = 0
     day_started = False  # Track if we've sent start-of-day message
     
     while True:
         if token_expired:
-            print("💔 Token expired. Waiting for new token via Telegram...")
+            print("💔 Every token expired. Waiting for new token via Telegram...")
             
             # Send Telegram notification about token expiration (once)
-            if not hasattr(token_expired, '_notified'):
+            if not token_expiry_notified:
                 if TELEGRAM_ENABLED:
                     try:
                         expiry_message = f"""
@@ -824,19 +2021,14 @@ def main_loop():
                         print("📱 Token expiry notification sent")
                     except Exception as e:
                         print(f"❌ Failed to send notification: {e}")
-                token_expired._notified = True
+                token_expiry_notified = True
             
             # Wait for new token from Telegram
             if TOKEN_MANAGER_ENABLED:
                 print("⏳ Checking for new token...")
                 check_for_new_token()
-                new_token = get_api_token()
                 
-                if new_token and new_token != TOKEN:
-                    TOKEN = new_token
-                    headers = {"Authorization": f"Bearer {TOKEN}"}
-                    token_expired = False
-                    delattr(token_expired, '_notified')  # Reset notification flag
+                if refresh_token_pool():
                     print(f"✅ New token received! Resuming monitoring...")
                     
                     # Send success notification
@@ -857,25 +2049,23 @@ def main_loop():
                             print(f"❌ Failed to send success notification: {e}")
                     
                     log_notification("✅ Token updated - monitoring resumed")
+                    cycle_clock.reset()
                     continue
                 else:
                     print("⏳ No new token found. Waiting 30 seconds...")
                     time.sleep(30)
+                    cycle_clock.reset()
                     continue
             else:
                 print("❌ Token manager not available. Cannot auto-update token.")
                 time.sleep(60)  # Wait longer without token manager
+                cycle_clock.reset()
                 continue
         
-        # Check for token updates every 10 cycles (roughly every 1.5 minutes)
-        if TOKEN_MANAGER_ENABLED and token_check_counter % 10 == 0:
+        # Check for token updates roughly every 1.5 minutes (10 cycles at 10s intervals)
+        if TOKEN_MANAGER_ENABLED and token_check_counter % max(1, round(100 / loop_interval())) == 0:
             check_for_new_token()
-            updated_token = get_api_token()
-            if updated_token and updated_token != TOKEN:
-                TOKEN = updated_token
-                headers = {"Authorization": f"Bearer {TOKEN}"}
-                print(f"🔄 Token refreshed: {TOKEN[:20]}...")
-                log_notification(f"🔄 Token refreshed from Telegram")
+            refresh_token_pool()
         
         token_check_counter += 1
         
@@ -891,23 +2081,71 @@ def main_loop():
                 if not day_started:
                     send_start_of_day_message()
                     day_started = True
+                if SHARD_WORKERS and shard_coordinator is None:
+                    start_shard_workers()
+                elif not SHARD_WORKERS and FETCH_ENGINE == "thread" and not fetch_pool.running:
+                    fetch_pool.start()
+                    print(f"🧵 Started {fetch_pool.num_workers} fetch workers")
+                if PREP_WARMUP and not token_expired:
+                    run_prep_warmup()
                 
             elif TRADING_START_TIME <= now <= TRADING_END_TIME:
                 # Active trading phase: Full monitoring
                 print(f"📈 Active trading - {now.strftime('%H:%M:%S')}")
-                with lock:
-                    stock_ratios.clear()
-                    signal_scores.clear()
-                with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-                    futures = {executor.submit(fetch_and_store_one, row): row[0] for row in stocks_list}
-                    for fut in concurrent.futures.as_completed(futures):
-                        code = futures[fut]
-                        try:
-                            fut.result()
-                        except Exception as e:
-                            log_notification(f"UNHANDLED {code}: {e}")
+                # Sharded cycles are scored in other processes; their alerts are evaluated at cycle end
+                alert_stream_live = STREAMING_ALERTS and not SHARD_WORKERS
+                if screening_funnel is not None:
+                    run_screening_pass()
+                cycle_start = time.perf_counter()
+                if SHARD_WORKERS:
+                    polled, late_codes = run_sharded_cycle()
+                    fetch_elapsed = time.perf_counter() - cycle_start
+                    print(f"🔌 Fetched {polled} stocks in {fetch_elapsed:.2f}s | Shards: {format_shard_stats()}")
+                else:
+                    last_values = begin_cycle()
+                    rows = select_cycle_rows()
+                    late_codes = run_fetch_cycle(rows)
+                    finish_cycle(rows, late_codes, last_values)
+                    polled = len(rows)
+                    fetch_elapsed = time.perf_counter() - cycle_start
+                    print(f"🔌 Fetched {len(rows)} stocks in {fetch_elapsed:.2f}s | Pools: {http_session.format_pool_stats()}")
+                if screening_funnel is not None:
+                    update_funnel(polled)
+                    print(f"🪜 Funnel: {format_funnel_stats()}")
+                print(f"⏱️ Cycle: {format_cycle_stats()}")
+                print(f"♻️ Books: {format_change_stats()}")
+                if vector_scoring:
+                    print(f"🧮 Scoring: vector batch of {cycle_stats.get('batch_scored', 0)} symbols in "
+                          f"{cycle_stats.get('batch_seconds', 0.0) * 1000:.1f}ms")
+                print(f"🧩 Factors: {format_factor_stats()}")
+                if breaker_skipped or cycle_stats.get('breaker_transitions') or depth_breakers.names_in_state(OPEN):
+                    print(f"🧯 Breakers: {format_breaker_stats()}")
+                token_stats = shard_token_stats if SHARD_WORKERS else token_pool.stats()
+                if len(token_stats) > 1 or any(entry['state'] != ACTIVE for entry in token_stats.values()):
+                    print(f"🔑 Tokens: {format_token_stats(token_stats)}")
+                if not SHARD_WORKERS:
+                    # Latency, dispatch, polling and rate-limiter state live in the worker processes when sharded
+                    print(f"🐢 Latency: {format_latency_stats()}")
+                    print(f"📐 Dispatch: {format_dispatch_stats(fetch_elapsed)}")
+                    if ADAPTIVE_POLLING:
+                        print(f"🎚️ Polling: {format_poll_stats()}")
+                    rate_metrics = api_limiter.take_metrics()
+                    print(f"🚦 Rate limiter: {format_rate_limit_stats(rate_metrics)}")
+                    if rate_metrics['throttled']:
+                        log_notification(f"🚦 Rate limiter: {format_rate_limit_stats(rate_metrics)}")
+                if late_codes or stale_symbols:
+                    log_notification(f"⏱️ Cycle: {format_cycle_stats()} | stale: {', '.join(sorted(stale_symbols))}")
+                if fetch_pool.running:
+                    ws = fetch_pool.take_stats()
+                    print(f"🧵 Workers: {ws['workers']} | utilization {ws['utilization']*100:.0f}% | "
+                          f"peak queue depth {ws['peak_queue_depth']} | jobs {ws['jobs_done']}")
                 process_notifications()
                 
+                # Cycle timing review roughly once a minute
+                trading_cycles += 1
+                if trading_cycles % max(1, round(60 / loop_interval())) == 0:
+                    log_notification(f"🕰️ Cycle timing: {format_clock_stats(cycle_clock.take_stats())}")
+                
             elif TRADING_END_TIME < now <= SYSTEM_END_TIME:
                 # Summary phase: Final analysis and wrap-up
                 print(f"📊 Summary phase - {now.strftime('%H:%M:%S')}")
@@ -917,7 +2155,17 @@ def main_loop():
                     send_end_of_day_summary()
                     send_end_of_day_summary.sent = True
                     print("🏁 End of trading day. System shutting down.")
+                    log_notification(f"🔌 Session connection pools: {http_session.format_pool_stats()}")
+                    log_notification(f"🕰️ Cycle timing: {format_clock_stats(cycle_clock.take_stats())}")
+                    log_notification(f"🔑 Tokens: {format_token_stats(shard_token_stats if SHARD_WORKERS else None)}")
+                    log_notification(f"🗃️ History: {format_history_stats()}")
+                    if screening_funnel is not None:
+                        log_notification(f"🪜 Funnel: {format_funnel_stats()}")
+                    q = quote_cache.take_stats()
+                    log_notification(f"💱 Quote cache: {q['hits']} hits, {q['misses']} misses "
+                                     f"({q['coalesced']} coalesced) over {q['cached']} symbols")
                     log_notification("🏁 End of trading day - system shutdown")
+                    shutdown_fetch_engines()
                     break  # Exit the main loop
                 
         else:
@@ -929,9 +2177,32 @@ def main_loop():
             # Reset day_started flag for next day
             if now < PREP_START_TIME:
                 day_started = False
+                prep_warmup.update(token_checked=False, snapshots=0)
                 
-        time.sleep(INTERVAL_SECONDS)
+        tick = cycle_clock.wait_next()
+        if tick['overrun']:
+            print(f"🕰️ Cycle overran its {loop_interval()}s slot ({tick['missed_ticks']} tick(s) {CATCH_UP_POLICY})")
+            log_notification(f"🕰️ Cycle overrun: {tick['missed_ticks']} tick(s) {CATCH_UP_POLICY}")
+
+def init():
+    """
+    Start-up side effects of running the monitor, kept out of import so shard
+    workers, benchmarks and tests can import this module without them:
+    connection pools, the Telegram configuration report and (blocking until
+    one arrives) the API token.
+    """
+    global TOKEN
+    init_http()
+    if TELEGRAM_ENABLED:
+        report_config()
+    if not TOKEN_MANAGER_ENABLED:
+        print("⚠️ Using static token (no token manager)")
+        return
+    TOKEN = wait_for_token_at_startup()
+    if TOKEN not in token_pool.tokens():
+        token_pool.update([TOKEN] + token_pool.tokens())
 
 if __name__ == "__main__":
+    init()
     main_loop()
 
@@ -0,0 +1,155 @@
+"""
+Quote Cache
+Best bid/ask per symbol, filled from every market-depth fetch, so alerts and
+the end-of-day summary read prices without extra HTTP calls. Misses go to a
+loader with single-flight de-duplication and run in parallel.
+"""
+
+import concurrent.futures
+import math
+import threading
+import time
+
+
+class Quote:
+    """One price observation plus where and when it came from."""
+
+    __slots__ = ("bid", "ask", "last", "source", "fetched_at")
+
+    def __init__(self, bid=0.0, ask=0.0, last=None, source="depth", fetched_at=None):
+        self.bid = bid if bid and math.isfinite(bid) else 0.0
+        self.ask = ask if ask and math.isfinite(ask) else 0.0
+        self.last = last
+        self.source = source
+        self.fetched_at = time.monotonic() if fetched_at is None else fetched_at
+
+    @property
+    def price(self):
+        """Last trade if known, else the bid/ask midpoint, else whichever side exists (None if neither)."""
+        if self.last:
+            return self.last
+        if self.bid > 0 and self.ask > 0:
+            return (self.bid + self.ask) / 2
+        return self.bid or self.ask or None
+
+    def age(self, now=None):
+        return (time.monotonic() if now is None else now) - self.fetched_at
+
+
+class QuoteCache:
+    """
+    Thread-safe symbol -> Quote map with a TTL.
+
+    get()/get_many() return cached quotes younger than max_age (default ttl);
+    anything older or missing is fetched with loader(code) -> Quote or None.
+    Concurrent lookups of the same symbol share one loader call.
+    """
+
+    def __init__(self, ttl=30.0, loader=None, max_workers=8):
+        self.ttl = ttl
+        self.loader = loader
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._quotes = {}
+        self._inflight = {}     # code -> Future of the loader call in progress
+        self._executor = None
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+
+    def put(self, code, bid, ask, last=None, source="depth"):
+        quote = Quote(bid, ask, last, source)
+        with self._lock:
+            self._quotes[code] = quote
+        return quote
+
+    def touch(self, code):
+        """Mark a quote as re-confirmed now (its book was fetched again and had not changed)."""
+        with self._lock:
+            quote = self._quotes.get(code)
+            if quote is not None:
+                quote.fetched_at = time.monotonic()
+
+    def peek(self, code):
+        """Cached quote regardless of age (None if never seen); never loads."""
+        with self._lock:
+            return self._quotes.get(code)
+
+    def _fresh(self, code, max_age):
+        quote = self._quotes.get(code)
+        if quote is not None and quote.age() <= max_age:
+            return quote
+        return None
+
+    def _load(self, code):
+        """Single-flight loader call: the first caller fetches, the rest wait on its future."""
+        with self._lock:
+            future = self._inflight.get(code)
+            owner = future is None
+            if owner:
+                future = self._inflight[code] = concurrent.futures.Future()
+            else:
+                self._coalesced += 1
+        if not owner:
+            return future.result()
+        try:
+            quote = self.loader(code) if self.loader else None
+        except Exception:
+            quote = None
+        with self._lock:
+            if quote is not None:
+                self._quotes[code] = quote
+            del self._inflight[code]
+        future.set_result(quote)
+        return quote
+
+    def get(self, code, max_age=None):
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            quote = self._fresh(code, max_age)
+            if quote is not None:
+                self._hits += 1
+                return quote
+            self._misses += 1
+        return self._load(code)
+
+    def get_many(self, codes, max_age=None):
+        """
+        Quotes for many symbols; misses are loaded in parallel.
+
+        Returns:
+            dict: code -> Quote (None where neither the cache nor the loader had one)
+        """
+        max_age = self.ttl if max_age is None else max_age
+        result, misses = {}, []
+        with self._lock:
+            for code in codes:
+                quote = self._fresh(code, max_age)
+                if quote is not None:
+                    self._hits += 1
+                    result[code] = quote
+                else:
+                    self._misses += 1
+                    misses.append(code)
+            if misses and self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="quote-load")
+        if len(misses) == 1:
+            result[misses[0]] = self._load(misses[0])
+        elif misses:
+            for code, quote in zip(misses, self._executor.map(self._load, misses)):
+                result[code] = quote
+        return result
+
+    def take_stats(self):
+        """Hit/miss counters since the previous call."""
+        with self._lock:
+            stats = {'hits': self._hits, 'misses': self._misses,
+                     'coalesced': self._coalesced, 'cached': len(self._quotes)}
+            self._hits = self._misses = self._coalesced = 0
+        return stats
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -0,0 +1,142 @@
+"""
+Adaptive Rate Limiter
+Process-wide token bucket whose rate follows AIMD: additive increase while
+requests succeed, multiplicative decrease on HTTP 429.
+"""
+
+import threading
+import time
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket shared by every worker thread and the async engine.
+
+    reserve() hands out a slot and returns how long the caller must wait
+    before sending, so the same limiter works for blocking and asyncio code.
+    """
+
+    def __init__(self, initial_rate=20.0, min_rate=1.0, max_rate=100.0, burst=12,
+                 additive_step=1.0, decrease_factor=0.5, decrease_cooldown=1.0,
+                 latency_factor=3.0, clock=time.monotonic):
+        self.rate = float(initial_rate)
+        self.min_rate = float(min_rate)
+        self.max_rate = float(max_rate)
+        self.burst = float(burst)
+        self.additive_step = additive_step          # req/s gained per second of clean traffic
+        self.decrease_factor = decrease_factor      # rate multiplier on a 429
+        self.decrease_cooldown = decrease_cooldown  # one cut per burst of 429s
+        self.latency_factor = latency_factor        # latency > factor * baseline holds the rate
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._last_refill = clock()
+        self._last_decrease = 0.0
+        self._baseline_latency = None
+        self._ceiling = None    # EWMA of the rates at which the API throttled us
+
+        # Counters since the last take_metrics()
+        self._granted = 0
+        self._throttled = 0
+        self._waited = 0.0
+        self._window_start = clock()
+
+    def reserve(self):
+        """Take one request slot; returns seconds to wait before sending."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+            self._last_refill = now
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self._granted += 1
+            self._waited += delay
+            return delay
+
+    def try_acquire(self):
+        """Take a slot only if one is free right now (for optional extra requests such as hedges)."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+            self._last_refill = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            self._granted += 1
+            return True
+
+    def acquire(self):
+        """Blocking reserve()."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def on_success(self, latency=None):
+        """Additive increase, held back while latency is well above its baseline."""
+        with self._lock:
+            if latency is not None:
+                if self._baseline_latency is None:
+                    self._baseline_latency = latency
+                else:
+                    # Baseline tracks fast responses quickly and slow ones slowly
+                    alpha = 0.3 if latency < self._baseline_latency else 0.02
+                    self._baseline_latency += alpha * (latency - self._baseline_latency)
+                if latency > self.latency_factor * self._baseline_latency:
+                    return
+            self.rate = min(self.max_rate, self.rate + self.additive_step / self.rate)
+
+    def on_throttle(self):
+        """Multiplicative decrease on a 429 (at most once per decrease_cooldown)."""
+        with self._lock:
+            self._throttled += 1
+            now = self._clock()
+            if now - self._last_decrease < self.decrease_cooldown:
+                return
+            self._last_decrease = now
+            self._ceiling = self.rate if self._ceiling is None else 0.7 * self._ceiling + 0.3 * self.rate
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            self._tokens = min(self._tokens, 0.0)
+
+    def rescale(self, max_rate, factor=1.0):
+        """
+        Move the ceiling to max_rate and scale the current rate and the learned
+        throttle ceiling by `factor` (e.g. when API tokens join or leave).
+        """
+        with self._lock:
+            self.max_rate = float(max_rate)
+            self.rate = min(self.max_rate, max(self.min_rate, self.rate * factor))
+            if self._ceiling is not None:
+                self._ceiling *= factor
+
+    def sustainable_rate(self):
+        """
+        Best estimate of the highest rate the API tolerates: the AIMD sawtooth
+        averages decrease_factor..1 of the throttle ceiling, so report its midpoint.
+        """
+        with self._lock:
+            if self._ceiling is None:
+                return self.rate
+            return self._ceiling * (1 + self.decrease_factor) / 2
+
+    def take_metrics(self):
+        """Live limiter metrics for the window since the previous call."""
+        sustainable = self.sustainable_rate()
+        with self._lock:
+            now = self._clock()
+            window = max(now - self._window_start, 1e-9)
+            metrics = {
+                'rate': self.rate,
+                'sustainable_rate': sustainable,
+                'ceiling': self._ceiling,
+                'granted': self._granted,
+                'throttled': self._throttled,
+                'waited': self._waited,
+                'throughput': self._granted / window,
+            }
+            self._granted = 0
+            self._throttled = 0
+            self._waited = 0.0
+            self._window_start = now
+        return metrics
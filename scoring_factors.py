@@ -0,0 +1,219 @@
+"""
+Scoring Factors
+The factors of price_depth.calculate_signal_score as registered objects.
+Each factor measures one value from a symbol's history and newest snapshot;
+its declared threshold, weight and cap turn that value into points, the
+same way for the per-symbol scorer and the NumPy batch engine. Explanation
+strings are only built when a log line or an alert asks for them.
+"""
+
+import itertools
+import threading
+import time
+
+from batch_scoring import np
+
+
+class Factor:
+    """
+    One scoring factor.
+
+    points = sign * min(cap, (value - threshold) * weight) when value > threshold, else 0.
+    measure(history, snapshot) returns the value (None when the factor does
+    not apply); measure_batch(features) returns one value per symbol from
+    batch_scoring.gather() features (NaN where it does not apply), or is
+    None when the factor has no batch form. explain(value, points) formats
+    one contribution for logs and alerts.
+    """
+
+    __slots__ = ("name", "threshold", "weight", "cap", "sign", "measure", "measure_batch", "explain")
+
+    def __init__(self, name, measure, threshold, weight, cap, explain, sign=1, measure_batch=None):
+        self.name = name
+        self.measure = measure
+        self.threshold = threshold
+        self.weight = weight
+        self.cap = cap
+        self.sign = sign
+        self.measure_batch = measure_batch
+        self.explain = explain
+
+    def points(self, value):
+        if value is None or not value > self.threshold:
+            return 0
+        return self.sign * min(self.cap, (value - self.threshold) * self.weight)
+
+
+class FactorRegistry:
+    """
+    Ordered factors plus their CPU time. `factors` (and `plan`, the same
+    factors unpacked for run_factors) are immutable tuples replaced on every
+    change, so the scoring loop reads them without a lock. Factor order is
+    the order points are added, which keeps float sums identical between the
+    scalar and batch paths.
+
+    Per-symbol scores are timed one call in `sample_every`, which keeps the
+    clock reads off most calls; batch scores are always timed.
+    """
+
+    def __init__(self, factors=(), sample_every=16):
+        self.sample_every = max(1, sample_every)
+        self._lock = threading.Lock()
+        self._ns = {}      # name -> [timed symbols, nanoseconds] since take_stats
+        self._calls = itertools.count(1)   # per-symbol scores; next() is atomic, so no lock per call
+        self._calls_seen = 0
+        self._batch_scored = 0
+        self._set(tuple(factors))
+
+    def _set(self, factors):
+        self.plan = tuple((f, f.measure, f.threshold, f.weight, f.cap, f.sign) for f in factors)
+        self.factors = factors
+
+    def register(self, factor, before=None):
+        """Add a factor (replacing one with the same name), at the end or before the named factor."""
+        with self._lock:
+            factors = [f for f in self.factors if f.name != factor.name]
+            names = [f.name for f in factors]
+            factors.insert(names.index(before) if before in names else len(factors), factor)
+            self._set(tuple(factors))
+
+    def unregister(self, name):
+        with self._lock:
+            self._set(tuple(f for f in self.factors if f.name != name))
+
+    def sample(self):
+        """Count one per-symbol score; True when it should be timed."""
+        return next(self._calls) % self.sample_every == 0
+
+    def vectorizable(self):
+        """True when every factor has a batch form."""
+        return all(f.measure_batch is not None for f in self.factors)
+
+    def record(self, factors, timings, symbols=1, batch=False):
+        """
+        Add one timed pass: timings[i] nanoseconds spent in factors[i] for
+        `symbols` symbols (a batch pass also counts them as scored).
+        """
+        with self._lock:
+            if batch:
+                self._batch_scored += symbols
+            for factor, ns in zip(factors, timings):
+                entry = self._ns.setdefault(factor.name, [0, 0])
+                entry[0] += symbols
+                entry[1] += ns
+
+    def take_stats(self):
+        """
+        Factor cost since the previous call.
+
+        Returns:
+            dict: 'scored' symbols, 'factors' {name: nanoseconds per timed symbol} in registry order
+        """
+        with self._lock:
+            calls = next(self._calls)   # this read uses up one count
+            scored = calls - self._calls_seen - 1 + self._batch_scored
+            ns = self._ns
+            self._ns, self._calls_seen, self._batch_scored = {}, calls, 0
+            order = [f.name for f in self.factors]
+        per_symbol = {name: ns[name][1] / ns[name][0] for name in order if name in ns and ns[name][0]}
+        return {'scored': scored, 'factors': per_symbol}
+
+
+def explain(contributions):
+    """Comma-separated explanations of (factor, value, points) contributions."""
+    return ", ".join(factor.explain(value, points) for factor, value, points in contributions)
+
+
+def run_factors(plan, history, snapshot, timings=None):
+    """
+    Run every factor of a FactorRegistry.plan once, with Factor.points()
+    inlined. Nanoseconds per factor are appended to `timings` when given.
+
+    Returns:
+        score: sum of the points in factor order
+        list: (factor, value, points) for factors that scored
+    """
+    score = 0
+    contributions = []
+    if timings is None:
+        for factor, measure, threshold, weight, cap, sign in plan:
+            value = measure(history, snapshot)
+            if value is not None and value > threshold:
+                points = sign * min(cap, (value - threshold) * weight)
+                score += points
+                contributions.append((factor, value, points))
+        return score, contributions
+    clock = time.perf_counter_ns
+    for factor, measure, threshold, weight, cap, sign in plan:
+        started = clock()
+        value = measure(history, snapshot)
+        if value is not None and value > threshold:
+            points = sign * min(cap, (value - threshold) * weight)
+            score += points
+            contributions.append((factor, value, points))
+        timings.append(clock() - started)
+    return score, contributions
+
+
+# The seven built-in factors, in the order their points have always been added
+
+def _velocity(history, snapshot):
+    if len(history) >= 3:
+        return (history.value(-1, 'ratio') - history.value(-3, 'ratio')) / 3
+    return None
+
+
+def _velocity_batch(f):
+    return np.where(f['length'] >= 3, (f['ratios'][:, -1] - f['ratios'][:, -3]) / 3, np.nan)
+
+
+def _momentum(history, snapshot):
+    prev_mid = history.value(-2, 'mid_price')
+    curr_mid = snapshot.get('mid_price', 0)
+    if prev_mid > 0 and curr_mid > 0:
+        return (curr_mid - prev_mid) / prev_mid
+    return None
+
+
+def _momentum_batch(f):
+    prev_mid, mid = f['prev_mid'], f['mid']
+    return np.where((prev_mid > 0) & (mid > 0), (mid - prev_mid) / prev_mid, np.nan)
+
+
+def _consistency_batch(f):
+    ratios = f['ratios']
+    rising = np.all(ratios[:, :-1] <= ratios[:, 1:], axis=1)
+    return np.where((f['length'] >= 4) & rising, 1.0, np.nan)
+
+
+DEFAULT_FACTORS = (
+    # Basic ratio strength (0-25)
+    Factor("ratio", lambda history, snapshot: snapshot['ratio'], threshold=1, weight=25, cap=25,
+           explain=lambda value, points: f"Ratio={value:.2f} (+{points:.1f})",
+           measure_batch=lambda f: f['ratios'][:, -1]),
+    # Ratio velocity over the last 3 snapshots (0-20)
+    Factor("velocity", _velocity, threshold=0, weight=50, cap=20,
+           explain=lambda value, points: f"Velocity={value:.3f} (+{points:.1f})",
+           measure_batch=_velocity_batch),
+    # Weighted imbalance (0-20)
+    Factor("imbalance", lambda history, snapshot: snapshot.get('weighted_imbalance', 1), threshold=1, weight=20, cap=20,
+           explain=lambda value, points: f"Imbalance={value:.2f} (+{points:.1f})",
+           measure_batch=lambda f: f['imbalance']),
+    # Price momentum against the previous snapshot (0-15)
+    Factor("momentum", _momentum, threshold=0, weight=1000, cap=15,
+           explain=lambda value, points: f"PriceMomentum={value*100:.2f}% (+{points:.1f})",
+           measure_batch=_momentum_batch),
+    # Spread penalty (0 to -10)
+    Factor("spread", lambda history, snapshot: snapshot.get('spread_pct', 0), threshold=2, weight=2, cap=10, sign=-1,
+           explain=lambda value, points: f"SpreadPenalty={value:.2f}% ({points:.1f})",
+           measure_batch=lambda f: f['spread_pct']),
+    # Activity/depth bonus (0-10)
+    Factor("depth", lambda history, snapshot: snapshot.get('bid_levels', 0) + snapshot.get('ask_levels', 0),
+           threshold=10, weight=0.5, cap=10,
+           explain=lambda value, points: f"Depth={value} (+{points:.1f})",
+           measure_batch=lambda f: f['levels']),
+    # Consistency: ratio non-decreasing over the last 4 snapshots (10), from the running count
+    Factor("consistency", lambda history, snapshot: 1 if history.stats.run >= 4 else None, threshold=0, weight=10, cap=10,
+           explain=lambda value, points: f"Consistency (+{points})",
+           measure_batch=_consistency_batch),
+)
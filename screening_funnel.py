@@ -0,0 +1,145 @@
+"""
+Screening Funnel
+Two-tier monitoring for a symbol universe too large to poll at full depth:
+a cheap getBook5 screen walks the universe in rotating slices, symbols
+that pass it are promoted to the full market-depth tier, and promoted
+symbols are demoted again once they have stayed quiet for a cooldown.
+"""
+
+import threading
+import time
+
+
+class ScreeningFunnel:
+    """
+    Promotion/demotion bookkeeping; the caller does the requests.
+
+    A screened symbol passes when its top-5 bid/ask volume ratio reaches
+    min_ratio or its price moved at least min_move_pct since its previous
+    screen. Core symbols are always at full depth and never screened.
+    At most max_promoted symbols are promoted at a time; passes beyond that
+    are counted as 'capped' and retried on the next screen.
+    """
+
+    def __init__(self, universe_rows, core_codes=(), min_ratio=1.5, min_move_pct=1.0, cooldown=300.0,
+                 max_promoted=100, clock=time.monotonic):
+        self.min_ratio = min_ratio
+        self.min_move_pct = min_move_pct
+        self.cooldown = cooldown
+        self.max_promoted = max_promoted
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._core = set(core_codes)
+        self._rows = {row[0]: row for row in universe_rows if row[0] not in self._core}
+        self._cursor = 0
+        self._carried = []      # codes handed back unscreened; first in the next slice
+        self._last_price = {}   # code -> price at its previous screen
+        self._promoted = {}     # code -> time it was last promoted or seen hot at full depth
+        self._reasons = {}      # code -> why it was promoted
+        self._totals = {'screened': 0, 'promoted': 0, 'demoted': 0, 'capped': 0}
+        self._period = dict.fromkeys(self._totals, 0)
+
+    @property
+    def universe_size(self):
+        """Symbols the screen covers (the universe minus the core list)."""
+        return len(self._rows)
+
+    def next_slice(self, size):
+        """
+        Up to `size` unpromoted rows to screen next, continuing where the
+        previous slice stopped so the whole universe is covered in turn.
+        """
+        with self._lock:
+            codes = list(self._rows)
+            picked = []
+            carried, self._carried = self._carried, []
+            for code in carried:
+                if len(picked) < size and code not in self._promoted:
+                    picked.append(self._rows[code])
+            for _ in range(len(codes)):
+                if len(picked) >= size:
+                    break
+                code = codes[self._cursor % len(codes)]
+                self._cursor += 1
+                if code not in self._promoted:
+                    picked.append(self._rows[code])
+            return picked
+
+    def give_back(self, codes):
+        """Codes from a slice that were not screened after all; the next slice starts with them."""
+        with self._lock:
+            self._carried.extend(code for code in codes if code in self._rows)
+
+    def screen(self, code, bid_volume, ask_volume, price):
+        """
+        Feed one getBook5 result.
+
+        Returns:
+            str: the promotion reason if `code` was promoted, else None
+        """
+        ratio = bid_volume / ask_volume if ask_volume else 0.0
+        with self._lock:
+            self._count('screened')
+            previous = self._last_price.get(code)
+            if price:
+                self._last_price[code] = price
+            if code in self._promoted or code not in self._rows:
+                return None
+            reason = None
+            if ratio >= self.min_ratio:
+                reason = f"book ratio {ratio:.2f}"
+            elif previous and price and abs(price - previous) / previous * 100 >= self.min_move_pct:
+                reason = f"moved {(price - previous) / previous * 100:+.1f}%"
+            if reason is None:
+                return None
+            if len(self._promoted) >= self.max_promoted:
+                self._count('capped')
+                return None
+            self._promoted[code] = self._clock()
+            self._reasons[code] = reason
+            self._count('promoted')
+            return reason
+
+    def observe_depth(self, code, hot):
+        """A full-depth result for a promoted symbol; a hot one restarts its cooldown."""
+        if hot:
+            with self._lock:
+                if code in self._promoted:
+                    self._promoted[code] = self._clock()
+
+    def demote_due(self):
+        """Demote every promoted symbol that has not been hot for `cooldown` seconds; returns their codes."""
+        now = self._clock()
+        with self._lock:
+            due = [code for code, since in self._promoted.items() if now - since >= self.cooldown]
+            for code in due:
+                del self._promoted[code]
+                self._reasons.pop(code, None)
+                self._count('demoted')
+            return due
+
+    def promoted_rows(self):
+        """Promoted rows in universe order."""
+        with self._lock:
+            return [row for code, row in self._rows.items() if code in self._promoted]
+
+    def reasons(self):
+        with self._lock:
+            return dict(self._reasons)
+
+    def _count(self, name):
+        self._totals[name] += 1
+        self._period[name] += 1
+
+    def take_stats(self):
+        """
+        Counters since the previous call plus session totals.
+
+        Returns:
+            dict: {'universe', 'promoted_now', 'screened', 'promoted', 'demoted',
+                   'capped', 'totals': {...same counters for the session}}
+        """
+        with self._lock:
+            period, self._period = self._period, dict.fromkeys(self._totals, 0)
+            return dict(period, universe=len(self._rows), promoted_now=len(self._promoted),
+                        totals=dict(self._totals))
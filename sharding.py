@@ -0,0 +1,216 @@
+"""
+Symbol Sharding Across Processes
+Coordinator/worker mode: the symbol list is split over N local worker
+processes with rendezvous hashing, each worker fetches and scores its shard,
+and the coordinator merges the results. Dead workers are restarted and their
+symbols are served by the surviving workers until they are back.
+"""
+
+import hashlib
+import importlib
+import multiprocessing
+import multiprocessing.connection
+import sys
+import time
+import traceback
+
+
+def shard_owner(code, worker_ids):
+    """
+    Rendezvous (highest-random-weight) hashing: every worker scores the code
+    and the highest score owns it. Removing a worker only moves its own
+    symbols, and they move back when it returns.
+    """
+    def weight(worker_id):
+        digest = hashlib.blake2b(f"{worker_id}:{code}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big")
+    return max(worker_ids, key=weight)
+
+
+def partition(rows, worker_ids):
+    """Split rows (code first) into {worker_id: [rows]} by shard_owner, keeping input order."""
+    shards = {worker_id: [] for worker_id in worker_ids}
+    if not worker_ids:
+        return shards
+    for row in rows:
+        shards[shard_owner(row[0], worker_ids)].append(row)
+    return shards
+
+
+def _load_module(module_name):
+    # A spawned child has already run the coordinator's script as __mp_main__;
+    # reuse it rather than importing (and initialising) the same file twice
+    main = sys.modules.get("__main__")
+    if getattr(main, "__file__", "").endswith(f"{module_name}.py"):
+        return main
+    return importlib.import_module(module_name)
+
+
+def _worker_main(worker_id, conn, module_name, init_name, cycle_name, shutdown_name, init_args):
+    module = _load_module(module_name)
+    getattr(module, init_name)(*init_args)
+    conn.send(("ready", None, None))
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+            if message[0] == "stop":
+                break
+            _, cycle_id, rows, options = message
+            try:
+                result = getattr(module, cycle_name)(rows, **options)
+                conn.send(("result", cycle_id, result))
+            except Exception:
+                conn.send(("error", cycle_id, traceback.format_exc()))
+    finally:
+        if shutdown_name:
+            getattr(module, shutdown_name)()
+
+
+class _Worker:
+    """Coordinator-side handle for one worker process."""
+
+    __slots__ = ("worker_id", "process", "conn", "ready", "missed")
+
+    def __init__(self, worker_id, process, conn):
+        self.worker_id = worker_id
+        self.process = process
+        self.conn = conn
+        self.ready = False     # set when the worker has finished init_name
+        self.missed = 0        # consecutive cycles without a reply
+
+
+class ShardCoordinator:
+    """
+    Runs `module.cycle_name(rows, **options)` on N worker processes, one
+    shard each, and collects the returned payloads.
+
+    Workers are started with `module.init_name(*init_args)`. A worker that
+    exits, or misses `max_missed` cycles in a row, is restarted; while it
+    is not ready its symbols are partitioned over the ready workers.
+    """
+
+    def __init__(self, num_workers, module_name, init_name, cycle_name, shutdown_name=None,
+                 init_args=(), max_missed=3, start_method="spawn"):
+        self.num_workers = num_workers
+        self.module_name = module_name
+        self.init_name = init_name
+        self.cycle_name = cycle_name
+        self.shutdown_name = shutdown_name
+        self.init_args = tuple(init_args)
+        self.max_missed = max_missed
+        self._ctx = multiprocessing.get_context(start_method)
+        self._workers = {}
+        self._cycle_id = 0
+        self.restarts = 0
+        self.last_cycle = {}    # worker_id -> {'symbols', 'seconds'} for the latest cycle
+
+    def _spawn(self, worker_id):
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main, name=f"shard-worker-{worker_id}", daemon=True,
+            args=(worker_id, child_conn, self.module_name, self.init_name, self.cycle_name,
+                  self.shutdown_name, self.init_args))
+        process.start()
+        child_conn.close()
+        self._workers[worker_id] = _Worker(worker_id, process, parent_conn)
+
+    def start(self, ready_timeout=60):
+        """Start every worker and wait (up to ready_timeout) until they have initialised."""
+        for worker_id in range(self.num_workers):
+            self._spawn(worker_id)
+        deadline = time.monotonic() + ready_timeout
+        while not all(w.ready for w in self._workers.values()) and time.monotonic() < deadline:
+            self._drain(timeout=max(0.0, deadline - time.monotonic()))
+        return self
+
+    def _restart(self, worker, reason):
+        print(f"🧩 Restarting shard worker {worker.worker_id}: {reason}")
+        if worker.process.is_alive():
+            worker.process.terminate()
+        worker.process.join(timeout=5)
+        worker.conn.close()
+        self.restarts += 1
+        self._spawn(worker.worker_id)
+
+    def _drain(self, timeout=0.0, results=None):
+        """Read whatever the workers sent; restart dead ones. Results for the current cycle go to `results`."""
+        conns = {w.conn: w for w in self._workers.values()}
+        for conn in multiprocessing.connection.wait(list(conns), timeout=timeout):
+            worker = conns[conn]
+            try:
+                kind, cycle_id, payload = conn.recv()
+            except (EOFError, OSError):
+                if results is not None:
+                    results[worker.worker_id] = ("error", f"worker exited with code {worker.process.exitcode}")
+                self._restart(worker, f"exited with code {worker.process.exitcode}")
+                continue
+            if kind == "ready":
+                worker.ready = True
+            elif cycle_id == self._cycle_id and results is not None:
+                results[worker.worker_id] = (kind, payload)
+            # Replies to earlier cycles arrive after we stopped waiting; drop them
+
+    def ready_ids(self):
+        return sorted(w.worker_id for w in self._workers.values() if w.ready)
+
+    def run_cycle(self, rows, timeout, **options):
+        """
+        Send every ready worker its shard and wait up to `timeout` seconds.
+
+        Returns:
+            list: payloads returned by the workers that answered in time.
+            list: rows whose worker failed, timed out or was not ready.
+        """
+        self._cycle_id += 1
+        ready = self.ready_ids()
+        shards = partition(rows, ready)
+        sent = set()
+        for worker_id, shard in shards.items():
+            worker = self._workers[worker_id]
+            try:
+                worker.conn.send(("cycle", self._cycle_id, shard, options))
+                sent.add(worker_id)
+            except (BrokenPipeError, OSError):
+                self._restart(worker, "pipe closed")
+
+        results = {}
+        deadline = time.monotonic() + timeout
+        while len(results) < len(sent) and time.monotonic() < deadline:
+            self._drain(timeout=max(0.0, deadline - time.monotonic()), results=results)
+
+        payloads, unserved = [], []
+        self.last_cycle = {}
+        for worker_id, shard in shards.items():
+            outcome = results.get(worker_id)
+            worker = self._workers[worker_id]
+            if outcome is not None and outcome[0] == "result":
+                worker.missed = 0
+                payloads.append(outcome[1])
+                self.last_cycle[worker_id] = {'symbols': len(shard), 'seconds': outcome[1].get('seconds', 0.0)}
+                continue
+            unserved.extend(shard)
+            if outcome is not None:
+                print(f"🧩 Shard worker {worker_id} failed: {outcome[1].strip().splitlines()[-1]}")
+            elif worker_id in sent:
+                worker.missed += 1
+                if worker.missed >= self.max_missed and worker.ready:
+                    self._restart(worker, f"no reply for {worker.missed} cycles")
+        if not ready:
+            unserved = list(rows)
+        return payloads, unserved
+
+    def shutdown(self, timeout=5):
+        for worker in self._workers.values():
+            try:
+                worker.conn.send(("stop",))
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self._workers.values():
+            worker.process.join(timeout=timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.conn.close()
+        self._workers.clear()
@@ -0,0 +1,17 @@
+"""
+Synthetic Data
+Random snapshot histories shaped like analyze_bid_ask's, shared by the
+benchmarks and the tests so both exercise the scorer on the same inputs.
+"""
+
+
+def synthetic_history(rng, length):
+    """Snapshot dicts shaped like analyze_bid_ask's, hitting every factor's edge cases (flat ratios, zero mids, wide spreads)."""
+    history, ratio, mid = [], rng.uniform(0.5, 2.0), rng.choice([0.0, rng.uniform(1, 100)])
+    for _ in range(length):
+        ratio = rng.choice([ratio, ratio + rng.uniform(-0.2, 0.3), rng.uniform(0.0, 3.0)])
+        mid = rng.choice([mid, mid * (1 + rng.uniform(-0.02, 0.02)), 0.0])
+        history.append({'ratio': ratio, 'weighted_imbalance': rng.choice([1.0, rng.uniform(0.0, 3.0)]),
+                        'mid_price': mid, 'spread_pct': rng.choice([0.0, rng.uniform(0, 8)]),
+                        'bid_levels': rng.randint(0, 30), 'ask_levels': rng.randint(0, 30)})
+    return history
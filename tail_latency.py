@@ -0,0 +1,239 @@
+"""
+Tail-Latency Controls
+Rolling per-endpoint latency percentiles that size request timeouts, and
+hedged requests: when a call runs past its endpoint's p95 a duplicate is
+sent and the first response wins, within a cap on the extra load.
+"""
+
+import asyncio
+import concurrent.futures
+import math
+import threading
+from collections import deque
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted sequence (None if empty)."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class LatencyTracker:
+    """
+    Last `window` response times per endpoint plus a pooled window over all
+    endpoints, used until an endpoint has `min_samples` of its own.
+
+    Timeout = p95 * timeout_multiplier, clamped to [min_timeout, max_timeout];
+    max_timeout is used until there is any latency data at all.
+    """
+
+    def __init__(self, window=50, min_samples=5, timeout_multiplier=3.0, min_timeout=1.0, max_timeout=5.0):
+        self.window = window
+        self.min_samples = min_samples
+        self.timeout_multiplier = timeout_multiplier
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self._lock = threading.Lock()
+        self._samples = {}   # key -> deque of seconds
+        self._pooled = deque(maxlen=window * 10)
+
+    def record(self, key, latency):
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(latency)
+            self._pooled.append(latency)
+
+    def record_timeout(self, key, elapsed, timeout):
+        """A call that timed out took at least `timeout`: counted as such, so the tail it hit stays in p95."""
+        self.record(key, max(elapsed, timeout))
+
+    def percentiles(self, key=None):
+        """(p50, p95) for `key` (pooled when key is None or has too few samples); None without data."""
+        with self._lock:
+            samples = self._samples.get(key) if key is not None else None
+            if samples is None or len(samples) < self.min_samples:
+                samples = self._pooled
+            if len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+        return percentile(ordered, 0.50), percentile(ordered, 0.95)
+
+    def timeout_for(self, key=None):
+        stats = self.percentiles(key)
+        if stats is None:
+            return self.max_timeout
+        return min(self.max_timeout, max(self.min_timeout, stats[1] * self.timeout_multiplier))
+
+    def hedge_delay(self, key=None):
+        """Seconds to wait before hedging a call to `key` (its p95), or None without data."""
+        stats = self.percentiles(key)
+        return stats[1] if stats is not None else None
+
+
+class HedgeBudget:
+    """
+    Caps hedges at `max_extra_ratio` per primary request: every primary
+    earns that fraction of a hedge token, and a hedge spends a whole one.
+
+    With max_in_flight, at most that many hedged pairs may be unfinished at
+    once. A pair holds its slot until both calls have ended, so calls that
+    lost and keep running until their timeout count against it too.
+    """
+
+    def __init__(self, max_extra_ratio=0.1, burst=5, max_in_flight=None):
+        self.max_extra_ratio = max_extra_ratio
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        self._tokens = 0.0
+        self._in_flight = 0
+        self._primaries = 0
+        self._hedges = 0
+        self._hedge_wins = 0
+
+    def on_primary(self):
+        with self._lock:
+            self._primaries += 1
+            self._tokens = min(self.burst, self._tokens + self.max_extra_ratio)
+
+    def try_spend(self, extra_check=None):
+        """
+        Take a hedge token if one is available, a pair slot is free and
+        extra_check() (e.g. the rate limiter) agrees; release() the slot once
+        both calls of the pair have ended.
+        """
+        with self._lock:
+            if self._tokens < 1 or (self.max_in_flight is not None and self._in_flight >= self.max_in_flight):
+                return False
+            if extra_check is not None and not extra_check():
+                return False
+            self._tokens -= 1
+            self._hedges += 1
+            self._in_flight += 1
+            return True
+
+    def can_spend(self):
+        """Whether a hedge token and a pair slot are free now (try_spend may still refuse); takes nothing."""
+        with self._lock:
+            return self._tokens >= 1 and (self.max_in_flight is None or self._in_flight < self.max_in_flight)
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def record_win(self):
+        with self._lock:
+            self._hedge_wins += 1
+
+    def take_stats(self):
+        """Hedge counters since the previous call."""
+        with self._lock:
+            stats = {
+                'primaries': self._primaries,
+                'hedges': self._hedges,
+                'hedge_wins': self._hedge_wins,
+                'extra_load': self._hedges / self._primaries if self._primaries else 0.0,
+                'in_flight': self._in_flight,
+            }
+            self._primaries = self._hedges = self._hedge_wins = 0
+        return stats
+
+
+def _first_success(done):
+    """Pick a successful future from `done`; None if they all failed."""
+    for future in done:
+        if future.exception() is None:
+            return future
+    return None
+
+
+def _release_when_done(futures, budget):
+    """Give the pair's budget slot back once every future in `futures` has ended."""
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def on_done(_):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            budget.release()
+
+    for future in futures:
+        future.add_done_callback(on_done)
+
+
+def hedged_call(executor, fn, hedge_delay, budget, extra_check=None):
+    """
+    Blocking hedged call: run fn(False), and if it has not returned after
+    `hedge_delay` seconds run the duplicate fn(True) on `executor`. The first
+    successful result wins. A losing call that has not started yet is
+    cancelled; one already running can't be interrupted, so it finishes in
+    the background (within its request timeout) while holding the pair's
+    budget slot, which bounds how much of the executor losers can occupy.
+
+    When no duplicate could be sent (no hedge_delay yet, or no hedge token or
+    pair slot free) fn(False) runs inline on the calling thread. Otherwise it
+    goes to `executor` as well: a primary running on this thread could not be
+    abandoned when the duplicate wins.
+
+    Returns:
+        tuple: (result, hedge_won)
+    """
+    budget.on_primary()
+    if hedge_delay is None or not budget.can_spend():
+        return fn(False), False
+    futures = [executor.submit(fn, False)]
+    done, _ = concurrent.futures.wait(futures, timeout=hedge_delay)
+    if not done and budget.try_spend(extra_check):
+        futures.append(executor.submit(fn, True))
+        _release_when_done(futures, budget)
+    pending = set(futures)
+    while pending:
+        done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        winner = _first_success(done)
+        if winner is not None:
+            for future in pending:
+                future.cancel()
+            hedge_won = winner is not futures[0]
+            if hedge_won:
+                budget.record_win()
+            return winner.result(), hedge_won
+    return futures[0].result(), False  # every attempt failed: surface the primary's error
+
+
+async def hedged_await(make_coro, hedge_delay, budget, extra_check=None):
+    """
+    asyncio counterpart of hedged_call (make_coro(hedge) builds each request);
+    the losing request is cancelled.
+
+    Returns:
+        tuple: (result, hedge_won)
+    """
+    budget.on_primary()
+    if hedge_delay is None or not budget.can_spend():
+        return await make_coro(False), False
+    tasks = [asyncio.ensure_future(make_coro(False))]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+        if not done and budget.try_spend(extra_check):
+            tasks.append(asyncio.ensure_future(make_coro(True)))
+            _release_when_done(tasks, budget)
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = _first_success(done)
+            if winner is not None:
+                hedge_won = winner is not tasks[0]
+                if hedge_won:
+                    budget.record_win()
+                return winner.result(), hedge_won
+        return tasks[0].result(), False  # every attempt failed: surface the primary's error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -4,8 +4,9 @@ This script demonstrates how to send messages to Telegram using a bot.
 """
 
 import os
-import requests
+import http_session
 import json
+import html
 from datetime import datetime
 
 # Telegram Bot Configuration
@@ -13,8 +14,10 @@ from datetime import datetime
 BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN", "8369324693:AAFXewPCtGDs0rMLSZwtO5miaXxcCyRvtrM")
 CHAT_GROUP_ID = os.environ.get("TELEGRAM_CHAT_GROUP_ID", "-1003165147844")
 
-print(f"🔧 BOT_TOKEN loaded: {'✅ from environment' if 'TELEGRAM_BOT_TOKEN' in os.environ else '⚠️ using fallback'}")
-print(f"🔧 CHAT_GROUP_ID loaded: {'✅ from environment' if 'TELEGRAM_CHAT_GROUP_ID' in os.environ else '⚠️ using fallback'}")
+def report_config():
+    """Print where the bot token and chat id came from (called at start-up, not on import)."""
+    print(f"🔧 BOT_TOKEN loaded: {'✅ from environment' if 'TELEGRAM_BOT_TOKEN' in os.environ else '⚠️ using fallback'}")
+    print(f"🔧 CHAT_GROUP_ID loaded: {'✅ from environment' if 'TELEGRAM_CHAT_GROUP_ID' in os.environ else '⚠️ using fallback'}")
 
 def send_telegram_message(message, parse_mode="HTML"):
     """
@@ -36,7 +39,7 @@ def send_telegram_message(message, parse_mode="HTML"):
             'parse_mode': parse_mode
         }
         
-        response = requests.post(url, json=payload, timeout=10)
+        response = http_session.post(url, json=payload, timeout=10)
         
         if response.status_code == 200:
             print(f"✅ Message sent successfully to Telegram")
@@ -50,7 +53,7 @@ def send_telegram_message(message, parse_mode="HTML"):
         print(f"❌ Error sending Telegram message: {e}")
         return False
 
-def format_stock_alert(stock_code, alert_type, score, ratio, change_pct):
+def format_stock_alert(stock_code, alert_type, score, ratio, change_pct, reasons=None):
     """
     Format a stock alert message for Telegram with HTML formatting.
     
@@ -60,6 +63,7 @@ def format_stock_alert(stock_code, alert_type, score, ratio, change_pct):
         score (float): Composite signal score
         ratio (float): Bid/ask ratio
         change_pct (float): Percentage change
+        reasons (str): Factor breakdown of the score, shown on STRONG alerts when given
     
     Returns:
         str: Formatted HTML message
@@ -85,7 +89,7 @@ def format_stock_alert(stock_code, alert_type, score, ratio, change_pct):
 📈 <b>Ratio:</b> {ratio:.2f}
 📋 <b>Change:</b> {change_pct:+.2f}%
 🕐 <b>Time:</b> {timestamp}
-
+{f"🧩 <b>Why:</b> {html.escape(reasons)}" if reasons else ""}
 <i>High-confidence trading signal detected!</i>
         """
     elif alert_type == "TAKE_CARE":
@@ -162,6 +166,7 @@ def test_telegram_connection():
 # Example usage and testing
 if __name__ == "__main__":
     print("=== Telegram Bot Test ===")
+    report_config()
     
     # Check if bot token and chat group ID are configured
     if BOT_TOKEN == "YOUR_BOT_TOKEN_HERE" or CHAT_GROUP_ID == "YOUR_CHAT_GROUP_ID_HERE":
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+# Tests import the flat top-level modules from the project folder, with file logging silenced
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("NOTIFICATION_LOG", os.devnull)
+
+
+@pytest.fixture(scope="session")
+def monitor():
+    """The price_depth module itself: importing it has no start-up side effects, so nothing needs patching."""
+    import price_depth
+    return price_depth
+
+
+@pytest.fixture
+def history_store(monitor, monkeypatch):
+    """An empty HistoryStore standing in for the monitor's stock_history."""
+    from history_store import HistoryStore
+    store = HistoryStore(monitor.HISTORY_SIZE)
+    monkeypatch.setattr(monitor, "stock_history", store)
+    return store
+
+
+@pytest.fixture
+def market_server():
+    """Factory for mock_server instances (start_mock_server options), all stopped after the test."""
+    from mock_server import start_mock_server
+    servers = []
+
+    def start(**options):
+        server = start_mock_server(**options)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
@@ -0,0 +1,16 @@
+"""Minimal shard worker module for the ShardCoordinator tests: echoes its shard, or dies on request."""
+
+import os
+
+worker_count = None
+
+
+def init(count):
+    global worker_count
+    worker_count = count
+
+
+def cycle(rows, crash=None):
+    if crash is not None and any(row[0] == crash for row in rows):
+        os._exit(3)
+    return {'codes': [row[0] for row in rows], 'workers': worker_count, 'seconds': 0.0}
@@ -0,0 +1,48 @@
+"""
+Alert Price Capture Tests
+A STRONG alert's price is captured after alert_lock is released, so a
+getBook5 miss never holds up the other evaluations behind that lock.
+"""
+
+from quote_cache import Quote, QuoteCache
+
+
+def strong_symbol(monitor, monkeypatch, quote_cache):
+    monkeypatch.setattr(monitor, "quote_cache", quote_cache)
+    monkeypatch.setattr(monitor, "signal_scores", {"EQ1": 80.0})
+    monkeypatch.setattr(monitor, "stock_ratios", {"EQ1": 1.5})
+    monkeypatch.setattr(monitor, "previous_ratios", {"EQ1": 1.2})
+    monkeypatch.setattr(monitor, "last_recommendations", {})
+    monkeypatch.setattr(monitor, "strong_recommendations", {})
+    monkeypatch.setattr(monitor, "streamed_alerts", {'evaluated': set(), 'strong': []})
+
+
+def test_quote_miss_loads_without_alert_lock(monitor, monkeypatch):
+    lock_held = []
+
+    def loader(code):
+        lock_held.append(monitor.alert_lock.locked())
+        return Quote(9.9, 10.1, source="getBook5")
+
+    strong_symbol(monitor, monkeypatch, QuoteCache(loader=loader))
+
+    alerts = monitor.evaluate_scored(("EQ1", 0.0))
+
+    assert [alert[1] for alert in alerts] == ["STRONG"]
+    assert lock_held == [False]
+    rec = monitor.strong_recommendations["EQ1"]
+    assert (rec['alert_price'], rec['price_source']) == (10.0, "getBook5")
+
+
+def test_cached_depth_quote_is_captured_without_loading(monitor, monkeypatch):
+    def loader(code):
+        raise AssertionError("getBook5 called for a symbol with a fresh depth quote")
+
+    quote_cache = QuoteCache(loader=loader)
+    quote_cache.put("EQ1", 9.0, 9.2)
+    strong_symbol(monitor, monkeypatch, quote_cache)
+
+    monitor.evaluate_scored(("EQ1", 0.0))
+
+    assert monitor.strong_recommendations["EQ1"]['alert_price'] == 9.1
+    assert monitor.streamed_alerts['strong'] == ["EQ1"]
@@ -0,0 +1,88 @@
+"""
+Alert Pipeline Tests
+StagedPipeline fan-out between stages, submitting to a named stage,
+drain and error handling, plus the AlertLatency percentiles.
+"""
+
+import threading
+
+import pytest
+
+from alert_pipeline import AlertLatency, StagedPipeline
+
+
+@pytest.fixture
+def pipelines():
+    started = []
+    yield started.append
+    for pipeline in started:
+        pipeline.shutdown()
+
+
+def test_items_flow_through_every_stage(pipelines):
+    delivered, lock = [], threading.Lock()
+
+    def deliver(item):
+        with lock:
+            delivered.append(item)
+
+    pipeline = StagedPipeline([("evaluate", lambda n: [n, n * 10] if n % 2 else None, 2),
+                               ("notify", deliver, 1)])
+    pipelines(pipeline)
+    for n in range(5):
+        pipeline.submit(n)
+
+    assert pipeline.drain(2)
+    assert sorted(delivered) == [1, 3, 10, 30]
+    assert pipeline.processed() == {"evaluate": 5, "notify": 4}
+    assert pipeline.queue_depths() == {"evaluate": 0, "notify": 0}
+
+
+def test_submit_to_a_named_stage_skips_the_earlier_ones(pipelines):
+    seen = []
+    pipeline = StagedPipeline([("score", lambda item: [("scored", item)], 1), ("evaluate", seen.append, 1)])
+    pipelines(pipeline)
+    pipeline.submit("A")
+    pipeline.submit(("ready", "B"), stage="evaluate")
+
+    assert pipeline.drain(2)
+    assert sorted(seen) == [("ready", "B"), ("scored", "A")]
+
+
+def test_handler_errors_are_reported_and_the_item_dropped(pipelines):
+    errors = []
+
+    def evaluate(item):
+        if item == "bad":
+            raise ValueError(item)
+        return [item]
+
+    out = []
+    pipeline = StagedPipeline([("evaluate", evaluate, 1), ("notify", out.append, 1)],
+                              on_error=lambda stage, item, err: errors.append((stage, item, type(err))))
+    pipelines(pipeline)
+    for item in ("ok", "bad"):
+        pipeline.submit(item)
+
+    assert pipeline.drain(2)
+    assert out == ["ok"] and errors == [("evaluate", "bad", ValueError)]
+
+
+def test_drain_times_out_while_a_stage_is_busy(pipelines):
+    release = threading.Event()
+    pipeline = StagedPipeline([("slow", lambda item: release.wait(2), 1)])
+    pipelines(pipeline)
+    pipeline.submit("A")
+    assert not pipeline.drain(0.05)
+    release.set()
+    assert pipeline.drain(2)
+
+
+def test_alert_latency_percentiles_since_the_previous_call():
+    latency = AlertLatency(window=3)
+    for seconds in (0.4, 0.1, 0.2, 0.3):
+        latency.record('decided', seconds)
+    latency.record('delivered', 0.5)
+
+    assert latency.take_stats() == {'decided': (3, 0.2, 0.3), 'delivered': (1, 0.5, 0.5)}
+    assert latency.take_stats() == {'decided': None, 'delivered': None}
@@ -0,0 +1,67 @@
+"""
+Async Fetch Engine Tests
+AsyncFetchEngine against mock_server: bounded concurrency, per-job errors,
+and jobs still running at the batch timeout being cancelled and reported.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from async_fetch import AsyncFetchEngine
+
+
+@pytest.fixture
+def engine():
+    engine = AsyncFetchEngine(max_concurrency=2)
+    yield engine
+    engine.close()
+
+
+def test_get_returns_status_body_and_headers(engine, market_server):
+    server = market_server(latency="fixed:1", etags=False)
+
+    async def fetch(job, eng):
+        return await eng.get(server.depth_url + job, timeout=5)
+
+    status, body, headers = engine._call(fetch("id-1", engine))
+
+    assert status == 200 and body.startswith(b"{")
+    assert headers.get("Content-Type", "").startswith("application/json")
+
+
+def test_concurrency_is_bounded(engine, market_server):
+    server = market_server(latency="fixed:100", etags=False)
+    statuses = []
+
+    async def job_coro(job, eng):
+        statuses.append((await eng.get(server.depth_url + job, timeout=5))[0])
+
+    start = time.monotonic()
+    results, late = engine.run_batch([f"id-{i}" for i in range(4)], job_coro)
+
+    assert late == [] and [error for _, error in results] == [None] * 4
+    assert statuses == [200] * 4
+    # Four 100ms requests through two slots take two rounds
+    assert time.monotonic() - start >= 0.19
+
+
+def test_errors_are_collected_and_late_jobs_cancelled(engine):
+    cancelled = []
+
+    async def job_coro(job, eng):
+        if job == "bad":
+            raise ValueError(job)
+        if job == "slow":
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(job)
+                raise
+
+    results, late = engine.run_batch(["ok", "bad", "slow"], job_coro, timeout=0.2)
+
+    assert sorted(job for job, _ in results) == ["bad", "ok"]
+    assert isinstance(dict(results)["bad"], ValueError)
+    assert late == ["slow"] and cancelled == ["slow"]
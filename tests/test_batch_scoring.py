@@ -0,0 +1,99 @@
+"""
+Batch Scoring Tests
+The NumPy batch engine against calculate_signal_score: every score must be
+bit-for-bit identical, for the snapshot-dict and ring-buffer paths, with
+the built-in factors and with an extra registered factor.
+"""
+
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import batch_scoring
+from scoring_factors import Factor
+from synthetic_data import synthetic_history
+
+TIGHT_SPREAD = Factor("tight_spread", lambda history, snapshot: 1 - snapshot.get('spread_pct', 0), threshold=0.5,
+                      weight=10, cap=5, explain=lambda value, points: f"TightSpread (+{points:.1f})",
+                      measure_batch=lambda f: 1 - f['spread_pct'])
+
+
+def fill(store, histories):
+    codes = [f"EQ{i}" for i in range(len(histories))]
+    for code, history in zip(codes, histories):
+        for snapshot in history:
+            store.append(code, snapshot)
+    return codes
+
+
+@pytest.mark.parametrize("extra", [None, TIGHT_SPREAD], ids=["built-in", "registered"])
+def test_batch_scores_match_scalar_bit_for_bit(monitor, history_store, extra):
+    rng = random.Random(7)
+    histories = [synthetic_history(rng, rng.randint(0, monitor.HISTORY_SIZE * 2)) for _ in range(3000)]
+    codes = fill(history_store, histories)
+    if extra is not None:
+        monitor.factor_registry.register(extra)
+    try:
+        factors = monitor.factor_registry.factors
+        assert monitor.factor_registry.vectorizable()
+        scalar = [float(monitor.calculate_signal_score(code, h[-1])) if h else 0.0 for code, h in zip(codes, histories)]
+        stored = [code for code in codes if code in history_store]
+        from_store = dict(zip(stored, batch_scoring.score_store(history_store, stored, factors)))
+        from_dicts = batch_scoring.score_histories([h[-monitor.HISTORY_SIZE:] for h in histories], factors)
+    finally:
+        monitor.factor_registry.unregister("tight_spread")
+    for code, expected, dict_score in zip(codes, scalar, from_dicts):
+        assert float(dict_score).hex() == expected.hex(), code
+        assert float(from_store.get(code, 0.0)).hex() == expected.hex(), code
+
+
+def test_factor_without_batch_form_is_not_vectorizable(monitor):
+    monitor.factor_registry.register(Factor("scalar_only", lambda history, snapshot: None, threshold=0, weight=1, cap=1,
+                                       explain=lambda value, points: ""))
+    try:
+        assert not monitor.factor_registry.vectorizable()
+    finally:
+        monitor.factor_registry.unregister("scalar_only")
+    assert monitor.factor_registry.vectorizable()
+
+
+def test_pending_batch_scores_and_returns_published_symbols(monitor, history_store, monkeypatch):
+    rng = random.Random(11)
+    codes = fill(history_store, [synthetic_history(rng, monitor.HISTORY_SIZE) for _ in range(3)])
+    monkeypatch.setattr(monitor, "pending_scores", {codes[0]: 1.0, codes[1]: None, codes[2]: 2.0})
+    monkeypatch.setattr(monitor, "stock_ratios", {code: history_store[code][-1]['ratio'] for code in codes[:2]})
+    monkeypatch.setattr(monitor, "signal_scores", {})
+    monkeypatch.setattr(monitor, "analysis_cache", {})
+    monkeypatch.setattr(monitor, "scored_at", {})
+
+    ready = monitor.score_pending_batch(publish=False)
+
+    assert ready == [(codes[0], 1.0), (codes[2], 2.0)]
+    assert monitor.pending_scores == {}
+    assert monitor.scored_at == {codes[0]: 1.0, codes[2]: 2.0}
+    for code in codes:
+        assert monitor.signal_scores[code] == monitor.calculate_signal_score(code, history_store[code][-1])
+    # No ratio (cleared by a new cycle since it was analyzed): scored, but not cached with a made-up ratio
+    assert set(monitor.analysis_cache) == set(codes[:2])
+
+
+def test_fingerprint_is_stored_only_with_its_cached_analysis(monitor, history_store, monkeypatch):
+    rng = random.Random(13)
+    codes = fill(history_store, [synthetic_history(rng, monitor.HISTORY_SIZE) for _ in range(2)])
+    monkeypatch.setattr(monitor, "pending_scores", {code: None for code in codes})
+    monkeypatch.setattr(monitor, "pending_fingerprints", {code: ("new", {'ETag': '"2"'}) for code in codes})
+    monkeypatch.setattr(monitor, "book_fingerprints", {code: "old" for code in codes})
+    monkeypatch.setattr(monitor, "book_validators", {code: {'ETag': '"1"'} for code in codes})
+    monkeypatch.setattr(monitor, "stock_ratios", {codes[0]: 1.5})
+    monkeypatch.setattr(monitor, "signal_scores", {})
+    monkeypatch.setattr(monitor, "analysis_cache", {codes[1]: (0.9, 10.0, 100)})
+
+    monitor.score_pending_batch(publish=False)
+
+    assert monitor.book_fingerprints == {codes[0]: "new", codes[1]: "old"}
+    assert monitor.book_validators == {codes[0]: {'ETag': '"2"'}, codes[1]: {'ETag': '"1"'}}
+    # Skipped: the old analysis stays under the old fingerprint, so the new payload is analyzed again
+    assert monitor.analysis_cache[codes[1]] == (0.9, 10.0, 100)
+    assert monitor.pending_fingerprints == {}
@@ -0,0 +1,87 @@
+"""
+Book Reducer Tests
+SideFold and reduce_book against computing every metric with its own pass
+over the ladder: best price over every level (unsorted ladders included),
+top-level sums bit for bit, and registered side metrics.
+"""
+
+import random
+
+import pytest
+
+from book_reducer import LEVEL_WEIGHTS, TOP_LEVELS, SideFold, reduce_book, register_side_metric, _side_metrics
+from depth_decoder import book_from_dict
+from mock_server import make_depth_payload
+
+
+def separate_passes(side, is_bid):
+    prices, volumes = list(side.prices), list(side.volumes)
+    top = list(zip(prices, volumes))[:TOP_LEVELS]
+    return {
+        'best': (max(prices) if is_bid else min(prices)) if prices else 0,
+        'levels': len(prices),
+        'top_levels': len(top),
+        'top_volume': sum(v for _, v in top),
+        'weighted_volume': sum(v * w for (_, v), w in zip(top, LEVEL_WEIGHTS)),
+        'top_notional': sum(p * v for p, v in top),
+    }
+
+
+def books():
+    rng = random.Random(5)
+    for levels in (0, 1, 3, 5, 6, 40):
+        payload = make_depth_payload(levels, seed=levels, mid=rng.uniform(1, 100))
+        yield book_from_dict(payload)
+        for side in ("bids_per_price", "asks_per_price"):
+            rng.shuffle(payload[side])  # the API doesn't promise sorted ladders
+        yield book_from_dict(payload)
+
+
+@pytest.mark.parametrize("book", list(books()))
+def test_side_fold_matches_separate_passes(book):
+    for side, is_bid in ((book.bids, True), (book.asks, False)):
+        fold = SideFold(side, is_bid)
+        expected = separate_passes(side, is_bid)
+        got = {name: getattr(fold, name) for name in expected}
+        assert {k: float(v).hex() for k, v in got.items()} == {k: float(v).hex() for k, v in expected.items()}
+        assert fold.side is side
+
+
+def test_best_price_below_the_top_levels_is_found():
+    payload = make_depth_payload(8, seed=1, mid=10.0)
+    payload["bids_per_price"][7]["order_price"] = 11.0
+    payload["asks_per_price"][6]["order_price"] = 1.0
+    book = book_from_dict(payload)
+    assert SideFold(book.bids, True).best == 11.0
+    assert SideFold(book.asks, False).best == 1.0
+
+
+def test_reduce_book_derives_spread_ratio_and_imbalance():
+    book = book_from_dict(make_depth_payload(10, seed=2, mid=50.0))
+    m = reduce_book(book)
+    bid, ask = SideFold(book.bids, True), SideFold(book.asks, False)
+    assert (m.best_bid, m.best_ask) == (bid.best, ask.best)
+    assert m.mid_price == (bid.best + ask.best) / 2
+    assert m.spread == ask.best - bid.best
+    assert m.spread_pct == m.spread / m.mid_price * 100
+    assert m.ratio == book.total_bids / book.total_asks
+    assert m.weighted_imbalance == bid.weighted_volume / ask.weighted_volume
+    assert (m.bid_levels, m.ask_levels, m.extra) == (10, 10, None)
+
+
+def test_one_sided_book_has_no_spread():
+    payload = make_depth_payload(5, seed=3)
+    payload["asks_per_price"] = []
+    payload["total_bids_and_asks"]["total_asks"] = 0
+    m = reduce_book(book_from_dict(payload))
+    assert (m.best_ask, m.mid_price, m.spread, m.spread_pct, m.ratio, m.weighted_imbalance) == (0, 0, 0, 0, 0, 0)
+
+
+def test_registered_side_metrics_read_the_fold():
+    register_side_metric("top_vwap", lambda fold: fold.top_notional / fold.top_volume if fold.top_volume else 0)
+    try:
+        book = book_from_dict(make_depth_payload(5, seed=4, mid=20.0))
+        bid_vwap, ask_vwap = reduce_book(book).extra["top_vwap"]
+    finally:
+        _side_metrics.pop("top_vwap")
+    assert bid_vwap < 20.0 < ask_vwap
@@ -0,0 +1,96 @@
+"""
+Circuit Breaker Tests
+BreakerRegistry on a fake clock: opening after consecutive failures, the
+half-open probe, doubling backoff up to its cap and recorded transitions.
+"""
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, BreakerRegistry
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_registry(**kwargs):
+    clock = FakeClock()
+    seen = []
+    registry = BreakerRegistry(on_transition=lambda *transition: seen.append(transition), clock=clock,
+                               failure_threshold=3, reset_timeout=10, max_reset_timeout=40, **kwargs)
+    return registry, clock, seen
+
+
+def test_opens_after_consecutive_failures_only():
+    registry, clock, _ = make_registry()
+    breaker = registry.get("EQ1")
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()  # resets the count
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow_request()
+    breaker.record_failure("HTTP 503")
+    assert breaker.is_open and not breaker.allow_request()
+    assert registry.names_in_state(OPEN) == ["EQ1"]
+
+
+def test_half_open_probe_closes_on_success():
+    registry, clock, _ = make_registry()
+    breaker = registry.get("EQ1")
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now = 9.9
+    assert not breaker.allow_request()
+    clock.now = 10.0
+    assert breaker.allow_request()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow_request()  # one probe at a time
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.reset_timeout == 10
+
+
+def test_failed_probes_double_the_backoff_up_to_the_cap():
+    registry, clock, _ = make_registry()
+    breaker = registry.get("EQ1")
+    for _ in range(3):
+        breaker.record_failure()
+    timeouts = []
+    for _ in range(4):
+        clock.now += breaker.reset_timeout
+        assert breaker.allow_request()
+        breaker.record_failure("timeout")
+        timeouts.append(breaker.reset_timeout)
+    assert timeouts == [20, 40, 40, 40]
+    assert breaker.is_open
+
+
+def test_unreported_probe_frees_its_slot_after_the_reset_timeout():
+    registry, clock, _ = make_registry()
+    breaker = registry.get("EQ1")
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now = 10.0
+    assert breaker.allow_request()
+    clock.now = 19.0
+    assert not breaker.allow_request()
+    clock.now = 20.0
+    assert breaker.allow_request()
+
+
+def test_registry_keeps_one_breaker_per_name_and_records_transitions():
+    registry, clock, seen = make_registry()
+    assert registry.get("EQ1") is registry.get("EQ1")
+    for _ in range(3):
+        registry.get("EQ2").record_failure()
+    clock.now = 10.0
+    registry.get("EQ2").allow_request()
+    registry.get("EQ2").record_success()
+
+    states = [(old, new) for _, old, new, _ in registry.take_transitions()]
+    assert states == [(CLOSED, OPEN), (OPEN, HALF_OPEN), (HALF_OPEN, CLOSED)]
+    assert [name for name, *_ in seen] == ["EQ2"] * 3
+    assert registry.take_transitions() == []
+    assert registry.names_in_state(CLOSED) == ["EQ1", "EQ2"]
@@ -0,0 +1,84 @@
+"""
+Cycle Scheduler Tests
+FixedRateScheduler on a fake clock: ticks on the grid, and the skip and
+coalesce catch-up policies after an overrun.
+"""
+
+import pytest
+
+from cycle_scheduler import FixedRateScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def scheduler(catch_up, period=10.0):
+    clock = FakeClock()
+    # Wall clock on a period boundary, so the first tick is now
+    return FixedRateScheduler(period, catch_up, clock=clock, wall_clock=lambda: 0.0, sleep=clock.sleep), clock
+
+
+@pytest.mark.parametrize("catch_up", ["skip", "coalesce"])
+def test_cycles_start_on_the_grid_despite_work_time(catch_up):
+    s, clock = scheduler(catch_up)
+    starts = []
+    for work in (3.0, 9.5, 0.0, 7.25):
+        starts.append(s.wait_next()['started'])
+        clock.now += work
+    assert starts == [0.0, 10.0, 20.0, 30.0]
+    stats = s.take_stats()
+    assert (stats['cycles'], stats['overruns'], stats['missed_ticks']) == (4, 0, 0)
+    assert stats['period_avg'] == 10.0
+
+
+def test_skip_waits_for_the_next_future_tick():
+    s, clock = scheduler("skip")
+    s.wait_next()
+    clock.now = 25.0  # overran the tick at 10 and the one at 20
+    tick = s.wait_next()
+    assert (tick['overrun'], tick['missed_ticks'], tick['started']) == (True, 2, 30.0)
+    assert s.wait_next()['started'] == 40.0
+
+
+def test_coalesce_runs_one_catch_up_cycle_then_keeps_the_grid():
+    s, clock = scheduler("coalesce")
+    s.wait_next()
+    clock.now = 25.0
+    tick = s.wait_next()
+    assert (tick['overrun'], tick['missed_ticks'], tick['started']) == (True, 2, 25.0)
+    assert tick['jitter'] == 0.0  # late on purpose, measured against when it could start
+    assert s.wait_next()['started'] == 30.0
+
+
+def test_coalesce_counts_an_overrun_of_one_tick():
+    s, clock = scheduler("coalesce")
+    s.wait_next()
+    clock.now = 12.0
+    tick = s.wait_next()
+    assert (tick['overrun'], tick['missed_ticks'], tick['started']) == (True, 1, 12.0)
+    assert s.wait_next()['started'] == 20.0
+    stats = s.take_stats()
+    assert (stats['overruns'], stats['missed_ticks']) == (1, 1)
+
+
+def test_statistics_windows_stay_bounded():
+    clock = FakeClock()
+    s = FixedRateScheduler(1.0, clock=clock, wall_clock=lambda: 0.0, sleep=clock.sleep, window=5)
+    for _ in range(50):
+        s.wait_next()
+    assert len(s._periods) == len(s._jitters) == 5
+    stats = s.take_stats()
+    assert (stats['cycles'], stats['session_cycles'], stats['period_max']) == (50, 50, 1.0)
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        FixedRateScheduler(10, "burst")
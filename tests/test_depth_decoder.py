@@ -0,0 +1,58 @@
+"""
+Depth Decoder Tests
+decode_depth on JSON numbers, numeric strings and malformed levels: the
+fast paths must give the same arrays as parsing level by level, and values
+that are not finite are treated as missing.
+"""
+
+import json
+
+import pytest
+
+from depth_decoder import book_from_dict, decode_depth, parse_number
+
+
+def payload(bids, asks, totals=None):
+    return json.dumps({"total_bids_and_asks": totals or {"total_bids": 300, "total_asks": 200},
+                       "bids_per_price": bids, "asks_per_price": asks}).encode()
+
+
+def level(price, volume, split=1, cum=None):
+    return {"order_price": price, "volume_traded": volume, "split": split,
+            "volume_traded_cum_sum": volume if cum is None else cum}
+
+
+def test_numbers_and_numeric_strings_decode_alike():
+    numbers = decode_depth(payload([level(10.5, 100), level(10.4, 200)], [level(10.6, 50)]))
+    strings = decode_depth(payload([level("10.5", "100"), level("10.4", " 200 ")], [level("10.6", "5e1")]))
+    for book in (numbers, strings):
+        assert list(book.bids.prices) == [10.5, 10.4]
+        assert list(book.bids.volumes) == [100.0, 200.0]
+        assert list(book.asks.volumes) == [50.0]
+        assert (book.total_bids, book.total_asks) == (300.0, 200.0)
+
+
+@pytest.mark.parametrize("bad", ["nan", "inf", "-Infinity", "1e400", 10 ** 400, float("nan"), float("inf")],
+                         ids=["nan", "inf", "-inf", "1e400", "huge-int", "json-nan", "json-inf"])
+def test_non_finite_values_count_as_missing(bad):
+    # Raw NaN/Infinity and huge ints only get past the stdlib json backend (orjson rejects them)
+    book = book_from_dict({"bids_per_price": [level(10.5, bad), level(bad, 200)], "asks_per_price": [level(bad, 50)]})
+    assert list(book.bids.volumes) == [0.0, 200.0]
+    # A missing bid price sorts below every real bid, a missing ask above every real ask
+    assert list(book.bids.prices) == [10.5, 0.0]
+    assert list(book.asks.prices) == [float("inf")]
+
+
+def test_nulls_blanks_and_missing_keys_parse_level_by_level():
+    book = decode_depth(payload([level(None, ""), {"order_price": 10.1}], []))
+    assert list(book.bids.prices) == [0.0, 10.1]
+    assert list(book.bids.volumes) == [0.0, 0.0]
+    assert len(book.asks) == 0
+
+
+def test_parse_number():
+    assert parse_number("-1.5e2") == -150.0
+    assert parse_number(True) == 1.0
+    assert parse_number("abc", 7.0) == 7.0
+    assert parse_number(None) == 0.0
+    assert parse_number("nan", -1.0) == -1.0
@@ -0,0 +1,50 @@
+"""
+Dispatch Ordering Tests
+CostEstimator EWMA estimates, longest-expected-first ordering with pinned
+symbols, and the greedy makespan simulation behind the planned gain.
+"""
+
+import pytest
+
+from dispatch_order import CostEstimator, simulate_makespan
+
+
+def test_simulate_makespan():
+    assert simulate_makespan([], 4) == 0.0
+    assert simulate_makespan([1, 1, 1, 1], 2) == 2.0
+    # CSV order leaves the slow job for last; longest-first hides it behind the short ones
+    assert simulate_makespan([1, 1, 1, 1, 4], 2) == 6.0
+    assert simulate_makespan([4, 1, 1, 1, 1], 2) == 4.0
+    assert simulate_makespan([3, 2], 8) == 3.0
+
+
+def test_estimates_are_ewma_with_the_mean_for_unknown_symbols():
+    estimator = CostEstimator(alpha=0.5)
+    assert estimator.estimates(["A"]) == {"A": 0.0}
+    estimator.record_fetch("A", 1.0)
+    estimator.record_fetch("A", 3.0)
+    estimator.record_fetch("B", 4.0)
+    estimator.record_analysis("A", 0.5)
+
+    estimates = estimator.estimates(["A", "B", "NEW"])
+    assert estimates["A"] == 2.0 + 0.5
+    assert estimates["B"] == 4.0 + 0.5
+    assert estimates["NEW"] == pytest.approx(3.0 + 0.5)
+    assert estimator.known() == 2
+
+
+def test_order_is_longest_first_after_the_pinned_rows():
+    estimator = CostEstimator()
+    for code, seconds in (("A", 0.1), ("B", 0.9), ("C", 0.5), ("D", 0.2)):
+        estimator.record_fetch(code, seconds)
+    rows = [["A", "id-a"], ["B", "id-b"], ["C", "id-c"], ["D", "id-d"]]
+
+    ordered, plan = estimator.order(rows, pinned={"D"}, workers=2)
+
+    assert [row[0] for row in ordered] == ["D", "B", "C", "A"]
+    assert plan['ordered'] <= plan['input']
+
+
+def test_without_history_the_input_order_is_kept():
+    rows = [["C"], ["A"], ["B"]]
+    assert CostEstimator().order(rows)[0] == rows
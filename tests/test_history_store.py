@@ -0,0 +1,89 @@
+"""
+History Store Tests
+RollingStats kept by SnapshotRing appends against recomputing them from
+the window (Welford mean/std, least-squares slope, EWMA, run), across many
+evictions and resyncs, plus the ring's list-like views.
+"""
+
+import random
+import statistics
+
+import pytest
+
+from history_store import HistoryStore, RollingStats, SnapshotRing
+
+
+def least_squares_slope(values):
+    n = len(values)
+    mean_x, mean_y = (n - 1) / 2, sum(values) / n
+    return (sum((i - mean_x) * (y - mean_y) for i, y in enumerate(values))
+            / sum((i - mean_x) ** 2 for i in range(n)))
+
+
+def test_rolling_stats_match_recomputing_the_window():
+    rng = random.Random(3)
+    ring = SnapshotRing(20)
+    ratios, mids = [], []
+    for step in range(257):  # many evictions and resyncs, ending mid-ring
+        ratio, mid = rng.uniform(0.2, 3.0), rng.uniform(9.0, 11.0)
+        ring.append({'ratio': ratio, 'mid_price': mid})
+        ratios.append(ratio)
+        mids.append(mid)
+        window_ratios, window_mids = ratios[-20:], mids[-20:]
+        stats = ring.stats
+        assert stats.count == len(window_ratios)
+        assert stats.mean('ratio') == pytest.approx(statistics.fmean(window_ratios), rel=1e-9)
+        assert stats.mean('mid') == pytest.approx(statistics.fmean(window_mids), rel=1e-9)
+        if len(window_ratios) >= 2:
+            assert stats.std('ratio') == pytest.approx(statistics.stdev(window_ratios), rel=1e-7)
+            assert stats.std('mid') == pytest.approx(statistics.stdev(window_mids), rel=1e-7)
+            assert stats.slope() == pytest.approx(least_squares_slope(window_ratios), rel=1e-7, abs=1e-12)
+    assert list(ring.column('ratio', 20)) == ratios[-20:]
+
+
+def test_ewma_and_run_follow_every_snapshot():
+    stats = RollingStats(3)  # alpha = 0.5
+    expected_runs = []
+    for ratio in (1.0, 3.0, 3.0, 2.0, 4.0):
+        stats.push(ratio, ratio * 10)
+        expected_runs.append(stats.run)
+    assert expected_runs == [1, 2, 3, 1, 2]
+    # 1 -> 2 -> 2.5 -> 2.25 -> 3.125 (the EWMA is not limited to the window)
+    assert stats.ratio_ewma == 3.125
+    assert stats.mid_ewma == pytest.approx(31.25)
+
+
+def test_flat_window_has_no_spurious_deviation():
+    stats = RollingStats(10)
+    for _ in range(25):
+        stats.push(0.1 + 0.2, 7.3)
+    assert stats.std('ratio') == 0.0 and stats.std('mid') == 0.0
+    assert stats.zscores() == {'ratio': 0.0, 'mid': 0.0, 'slope': 0.0}
+    assert stats.slope() == pytest.approx(0.0, abs=1e-12)  # sliding sums carry rounding residue
+
+
+def test_zscores_against_the_window():
+    stats = RollingStats(4)
+    for ratio in (1.0, 2.0, 3.0, 4.0):
+        stats.push(ratio, 10.0)
+    std = statistics.stdev([1.0, 2.0, 3.0, 4.0])
+    z = stats.zscores()
+    assert z['ratio'] == pytest.approx((4.0 - 2.5) / std)
+    assert z['slope'] == pytest.approx(1.0 / std)
+    assert z['mid'] == 0.0
+
+
+def test_ring_behaves_like_a_bounded_deque_of_snapshots():
+    store = HistoryStore(3)
+    for i in range(5):
+        store.append("EQ1", {'ratio': float(i), 'bid_levels': i, 'unknown': 1})
+    ring = store["EQ1"]
+    assert len(ring) == 3 and "EQ1" in store and store.get("EQ2") is None
+    assert [s['ratio'] for s in ring] == [2.0, 3.0, 4.0]
+    assert ring[-1]['bid_levels'] == 4 and ring[0]['timestamp'] is None
+    assert [s['ratio'] for s in ring[-2:]] == [3.0, 4.0]
+    assert ring.value(-1, 'ratio') == 4.0
+    with pytest.raises(IndexError):
+        ring[3]
+    with pytest.raises(ValueError):
+        ring.window(4)
@@ -0,0 +1,72 @@
+"""
+HTTP/2 Transport Tests
+http_session against mock_server with h2c: GETs are multiplexed as HTTP/2
+streams, a host that can't speak h2 falls back to the HTTP/1.1 pool, and the
+monitor analyzes the same books over either transport.
+"""
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("h2")
+
+import http_session
+from rate_limiter import AdaptiveRateLimiter
+
+ROWS = [[f"SYM{i}", f"id-{i}"] for i in range(8)]
+
+
+def test_get_is_served_as_http2_streams(market_server):
+    server = market_server(latency="fixed:1", etags=False, http2=True)
+    assert http_session.enable_http2(server.depth_url)
+
+    responses = [http_session.get(server.depth_url + f"id-{i}", timeout=5) for i in range(3)]
+
+    assert [r.status_code for r in responses] == [200] * 3
+    assert {r.http_version for r in responses} == {"HTTP/2"}
+    assert http_session.uses_http2(server.depth_url)
+    stats = http_session.get_http2_stats()[http_session._host_key(server.depth_url)]
+    assert stats['streams'] == 3 and 'fallback' not in stats
+    assert server.stats().get('h2_streams') == 3
+
+
+def test_http1_only_server_falls_back_to_the_pool(market_server):
+    server = market_server(latency="fixed:1", etags=False)
+    http_session.enable_http2(server.depth_url)
+    key = http_session._host_key(server.depth_url)
+
+    response = http_session.get(server.depth_url + "id-1", timeout=5)
+
+    assert response.status_code == 200
+    assert not http_session.uses_http2(server.depth_url)
+    assert 'fallback' in http_session.get_http2_stats()[key]
+    assert http_session.get_pool_stats()[key]['completed'] >= 1
+    # Later requests go straight to the pool
+    assert http_session.get(server.depth_url + "id-2", timeout=5).status_code == 200
+
+
+def analyze_all(monitor, monkeypatch, url):
+    monkeypatch.setattr(monitor, "price_depth_url", url)
+    for name in ("stock_ratios", "signal_scores", "volumes", "analysis_cache", "book_fingerprints",
+                 "book_validators", "scored_at"):
+        monkeypatch.setattr(monitor, name, {})
+    for row in ROWS:
+        monitor.fetch_and_store_one(row)
+    return dict(monitor.analysis_cache)
+
+
+def test_fetch_and_store_one_gives_the_same_analysis_over_both_transports(monitor, history_store, monkeypatch,
+                                                                          market_server):
+    monkeypatch.setattr(monitor, "api_limiter", AdaptiveRateLimiter(initial_rate=1e6, max_rate=1e6, burst=1e6))
+    monkeypatch.setattr(monitor, "HEDGED_REQUESTS", False)
+    plain = market_server(latency="fixed:1", etags=False, stocks=ROWS)
+    multiplexed = market_server(latency="fixed:1", etags=False, stocks=ROWS, http2=True)
+    http_session.enable_http2(multiplexed.depth_url)
+
+    over_http1 = analyze_all(monitor, monkeypatch, plain.depth_url)
+    history_store.clear()
+    over_http2 = analyze_all(monitor, monkeypatch, multiplexed.depth_url)
+
+    assert len(over_http1) == len(ROWS)
+    assert over_http2 == over_http1
+    assert http_session.get_http2_stats()[http_session._host_key(multiplexed.depth_url)]['streams'] == len(ROWS)
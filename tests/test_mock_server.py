@@ -0,0 +1,60 @@
+"""
+Mock Server Tests
+mock_server's books, validators and injected faults, which the benchmarks
+and the transport tests rely on.
+"""
+
+import pytest
+import requests
+
+from mock_server import QUOTE_PATH, make_depth_payload, parse_latency
+
+
+def get(url, **headers):
+    return requests.get(url, headers=headers, timeout=5)
+
+
+def test_depth_payload_is_deterministic_and_consistent():
+    a = make_depth_payload(5, seed="EQ1", mid=10.0)
+    assert a == make_depth_payload(5, seed="EQ1", mid=10.0)
+    bids, asks = a["bids_per_price"], a["asks_per_price"]
+    assert [b["order_price"] for b in bids] == sorted((b["order_price"] for b in bids), reverse=True)
+    assert bids[0]["order_price"] < 10.0 < asks[0]["order_price"]
+    assert a["total_bids_and_asks"]["total_bids"] == bids[-1]["volume_traded_cum_sum"]
+    strings = make_depth_payload(5, seed="EQ1", mid=10.0, as_strings=True)
+    assert strings["bids_per_price"][0]["order_price"] == str(bids[0]["order_price"])
+
+
+def test_books_are_stable_and_answer_their_etag_with_304(market_server):
+    server = market_server(latency="fixed:0", stocks=[["EQ1", "id-1"]])
+    first = get(server.depth_url + "id-1")
+    assert first.status_code == 200 and first.headers["ETag"]
+    assert get(server.depth_url + "EQ1").content == first.content  # id and symbol serve the same book
+    assert get(server.depth_url + "id-1", **{"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+
+def test_quote_matches_the_depth_book(market_server):
+    server = market_server(latency="fixed:0", etags=False)
+    depth = get(server.depth_url + "EQ1").json()
+    quote = get(server.base_url + QUOTE_PATH + "?symbol=EQ1").json()["data"]
+    assert quote["symbol"] == "EQ1"
+    assert quote["bestBid"] == depth["bids_per_price"][0]["order_price"]
+    assert quote["bestAsk"] == depth["asks_per_price"][0]["order_price"]
+
+
+def test_injected_faults(market_server):
+    server = market_server(latency="fixed:0", dead_symbols=["DEAD"], revoked_tokens=["old"],
+                           rate_limit=2, rate_limit_per_token=True)
+    assert get(server.depth_url + "DEAD").status_code == 503
+    assert get(server.depth_url + "EQ1", Authorization="Bearer old").status_code == 401
+    statuses = [get(server.depth_url + "EQ1", Authorization="Bearer a").status_code for _ in range(4)]
+    assert statuses[:2] == [200, 200] and 429 in statuses[2:]
+    # Per-token limits: another token still has its own budget
+    assert get(server.depth_url + "EQ1", Authorization="Bearer b").status_code == 200
+    assert server.stats()[429] >= 1
+
+
+def test_parse_latency():
+    assert parse_latency("fixed:40")(None) == 0.04
+    with pytest.raises(ValueError):
+        parse_latency("gamma:1")
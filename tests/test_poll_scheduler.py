@@ -0,0 +1,69 @@
+"""
+Adaptive Polling Tests
+AdaptivePollScheduler tiers from score and book activity, due/mark_polled
+on explicit times, and the request budget stretching every interval.
+"""
+
+import pytest
+
+from poll_scheduler import AdaptivePollScheduler
+
+
+def make_scheduler(**kwargs):
+    options = dict(base_interval=10, min_interval=2, max_interval=60, request_budget=100.0,
+                   hot_score=60, active_score=40, move_threshold=0.05, dormant_after=3)
+    options.update(kwargs)
+    return AdaptivePollScheduler(**options)
+
+
+def test_tiers_follow_score_movement_and_empty_books():
+    s = make_scheduler()
+    s.register(["HOT", "ACT", "MOVE", "QUIET", "EMPTY"])
+    s.observe("HOT", 70, 1.0, 10.0, False)
+    s.observe("ACT", 45, 1.0, 10.0, False)
+    s.observe("MOVE", 10, 1.0, 10.0, False)
+    s.observe("MOVE", 10, 1.2, 10.0, False)  # ratio up 20%
+    for _ in range(4):
+        s.observe("QUIET", 10, 1.0, 10.0, False)
+    s.observe("EMPTY", 90, 0, 0, True)
+
+    assert s._tier == {"HOT": "hot", "ACT": "active", "MOVE": "active", "QUIET": "dormant", "EMPTY": "dormant"}
+    assert s._interval == {"HOT": 2, "ACT": 5, "MOVE": 5, "QUIET": 60, "EMPTY": 60}
+    assert s.stats()['tiers'] == {"hot": 1, "active": 2, "dormant": 2}
+
+
+def test_quiet_symbol_wakes_up_when_it_moves():
+    s = make_scheduler()
+    s.register(["A"])
+    for _ in range(4):
+        s.observe("A", 10, 1.0, 10.0, False)
+    assert s._tier["A"] == "dormant"
+    s.observe("A", 10, 1.0, 10.5, False)  # mid price moved
+    assert s._tier["A"] == "active"
+
+
+def test_due_and_mark_polled_use_the_given_clock():
+    s = make_scheduler()
+    s.register(["A", "B"])
+    s.observe("A", 70, 1.0, 10.0, False)
+    assert s.due(["A", "B"], now=1e9) == ["A", "B"]  # registered symbols are due at once
+
+    s.mark_polled(["A", "B"], now=1000.0)
+
+    assert s.due(["A", "B"], now=1001.0) == []
+    assert s.due(["A", "B"], now=1001.6) == ["A"]  # 2s interval, 0.5s tolerance
+    assert s.due(["B", "A"], now=1010.0) == ["B", "A"]
+
+
+def test_budget_stretches_every_interval():
+    s = make_scheduler(request_budget=1.0)
+    s.register([f"S{i}" for i in range(20)])  # 20 symbols at 10s = 2 requests/s
+
+    stats = s.stats()
+    assert stats['stretch'] == pytest.approx(2.0) and stats['planned_rate'] == pytest.approx(1.0)
+    s.mark_polled(["S0"], now=0.0)
+    assert s.due(["S0"], now=19.0, tolerance=0) == []
+    assert s.due(["S0"], now=20.1, tolerance=0) == ["S0"]
+
+    s.unregister([f"S{i}" for i in range(10)])
+    assert s.stats()['stretch'] == 1.0
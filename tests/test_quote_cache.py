@@ -0,0 +1,91 @@
+"""
+Quote Cache Tests
+QuoteCache hits within the TTL, single-flight loading of concurrent
+misses, parallel get_many and the Quote price fallbacks.
+"""
+
+import threading
+import time
+
+from quote_cache import Quote, QuoteCache
+
+
+def age(cache, code, seconds):
+    cache.peek(code).fetched_at = time.monotonic() - seconds
+
+
+def test_fresh_quotes_are_hits_and_stale_ones_reload():
+    loads = []
+    cache = QuoteCache(ttl=30, loader=lambda code: loads.append(code) or Quote(1.0, 1.2, source="getBook5"))
+    cache.put("A", 10.0, 10.2)
+
+    assert cache.get("A").source == "depth"
+    age(cache, "A", 31)
+    assert cache.get("A").source == "getBook5"
+    age(cache, "A", 31)
+    assert cache.get("A", max_age=float("inf")).source == "getBook5"  # any age accepted
+    assert loads == ["A"]
+    assert cache.take_stats() == {'hits': 2, 'misses': 1, 'coalesced': 0, 'cached': 1}
+
+
+def test_touch_renews_and_peek_never_loads():
+    cache = QuoteCache(ttl=30, loader=lambda code: Quote(1.0, 1.2))
+    cache.put("A", 10.0, 10.2)
+    age(cache, "A", 31)
+    cache.touch("A")
+    assert cache.peek("A").age() < 1
+    assert cache.peek("B") is None
+    assert cache.take_stats()['misses'] == 0
+
+
+def test_concurrent_misses_share_one_loader_call():
+    calls, release = [], threading.Event()
+
+    def loader(code):
+        calls.append(code)
+        release.wait(2)
+        return Quote(5.0, 5.2, source="getBook5")
+
+    cache = QuoteCache(loader=loader)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("A"))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    deadline = time.monotonic() + 2
+    while cache.take_stats()['coalesced'] < 4 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    release.set()
+    for t in threads:
+        t.join(2)
+
+    assert calls == ["A"]
+    assert len(results) == 5 and all(quote is results[0] for quote in results)
+
+
+def test_get_many_loads_misses_in_parallel_and_keeps_failures_as_none():
+    started, barrier = [], threading.Barrier(3, timeout=2)
+
+    def loader(code):
+        started.append(code)
+        barrier.wait()  # only returns once all three misses are loading at once
+        if code == "BAD":
+            raise ValueError("getBook5 down")
+        return Quote(1.0, 1.0, source="getBook5")
+
+    cache = QuoteCache(loader=loader, max_workers=4)
+    cache.put("HIT", 2.0, 2.0)
+    try:
+        quotes = cache.get_many(["HIT", "M1", "M2", "BAD"])
+    finally:
+        cache.close()
+
+    assert sorted(started) == ["BAD", "M1", "M2"]
+    assert quotes["HIT"].source == "depth" and quotes["M1"].source == "getBook5"
+    assert quotes["BAD"] is None and cache.peek("BAD") is None
+
+
+def test_quote_price_falls_back_from_last_to_mid_to_one_side():
+    assert Quote(10.0, 10.2, last=10.1).price == 10.1
+    assert Quote(10.0, 10.2).price == 10.1
+    assert Quote(0.0, 10.2).price == 10.2
+    assert Quote(float("nan"), float("inf")).price is None
@@ -0,0 +1,95 @@
+"""
+Rate Limiter Tests
+AdaptiveRateLimiter on a fake clock: token-bucket refill and waits,
+additive increase, multiplicative decrease on 429 with its cooldown, the
+latency hold and the learned throttle ceiling.
+"""
+
+import pytest
+
+from rate_limiter import AdaptiveRateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_limiter(**kwargs):
+    clock = FakeClock()
+    options = dict(initial_rate=10.0, min_rate=1.0, max_rate=20.0, burst=2, additive_step=1.0,
+                   decrease_factor=0.5, decrease_cooldown=1.0, clock=clock)
+    options.update(kwargs)
+    return AdaptiveRateLimiter(**options), clock
+
+
+def test_burst_then_waits_at_the_current_rate():
+    limiter, clock = make_limiter()
+    assert [limiter.reserve() for _ in range(2)] == [0.0, 0.0]
+    assert limiter.reserve() == pytest.approx(0.1)
+    assert limiter.reserve() == pytest.approx(0.2)
+    clock.now += 1.0  # refills 10 tokens, capped at the burst
+    assert [limiter.reserve() for _ in range(2)] == [0.0, 0.0]
+
+
+def test_try_acquire_never_waits():
+    limiter, clock = make_limiter()
+    assert limiter.try_acquire() and limiter.try_acquire()
+    assert not limiter.try_acquire()
+    clock.now += 0.1
+    assert limiter.try_acquire()
+    assert limiter.take_metrics()['granted'] == 3
+
+
+def test_additive_increase_up_to_max_rate():
+    limiter, _ = make_limiter()
+    limiter.on_success()
+    assert limiter.rate == pytest.approx(10.1)  # additive_step / rate per success
+    for _ in range(1000):
+        limiter.on_success()
+    assert limiter.rate == 20.0
+
+
+def test_throttle_halves_the_rate_once_per_cooldown():
+    limiter, clock = make_limiter()
+    limiter.on_throttle()
+    limiter.on_throttle()  # same burst of 429s
+    assert limiter.rate == 5.0
+    clock.now += 1.0
+    limiter.on_throttle()
+    assert limiter.rate == 2.5
+    for _ in range(5):
+        clock.now += 1.0
+        limiter.on_throttle()
+    assert limiter.rate == 1.0
+    metrics = limiter.take_metrics()
+    assert metrics['throttled'] == 8
+
+
+def test_throttle_empties_the_bucket():
+    limiter, _ = make_limiter()
+    limiter.on_throttle()
+    assert limiter.reserve() == pytest.approx(1 / 5.0)
+
+
+def test_slow_responses_hold_the_rate():
+    limiter, _ = make_limiter()
+    limiter.on_success(latency=0.1)  # sets the baseline
+    rate = limiter.rate
+    limiter.on_success(latency=0.5)
+    assert limiter.rate == rate
+    limiter.on_success(latency=0.1)
+    assert limiter.rate > rate
+
+
+def test_sustainable_rate_is_the_middle_of_the_sawtooth():
+    limiter, clock = make_limiter()
+    assert limiter.sustainable_rate() == 10.0
+    limiter.on_throttle()  # throttled at 10 req/s
+    assert limiter.sustainable_rate() == pytest.approx(10.0 * 0.75)
+    clock.now += 1.0
+    limiter.rescale(max_rate=40.0, factor=2.0)
+    assert limiter.rate == 10.0 and limiter.sustainable_rate() == pytest.approx(15.0)
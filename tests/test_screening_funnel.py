@@ -0,0 +1,80 @@
+"""
+Screening Funnel Tests
+ScreeningFunnel on a fake clock: rotating slices over the universe,
+promotion by book ratio or price move, the promotion cap and demotion
+after the cooldown.
+"""
+
+from screening_funnel import ScreeningFunnel
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+UNIVERSE = [[f"U{i}", f"id-{i}"] for i in range(6)]
+
+
+def make_funnel(**kwargs):
+    clock = FakeClock()
+    options = dict(core_codes=["U0"], min_ratio=1.5, min_move_pct=1.0, cooldown=300, max_promoted=10, clock=clock)
+    options.update(kwargs)
+    return ScreeningFunnel(UNIVERSE, **options), clock
+
+
+def codes(rows):
+    return [row[0] for row in rows]
+
+
+def test_slices_rotate_over_the_universe_without_core_symbols():
+    funnel, _ = make_funnel()
+    assert funnel.universe_size == 5
+    assert codes(funnel.next_slice(2)) == ["U1", "U2"]
+    assert codes(funnel.next_slice(2)) == ["U3", "U4"]
+    assert codes(funnel.next_slice(2)) == ["U5", "U1"]
+
+
+def test_given_back_codes_lead_the_next_slice():
+    funnel, _ = make_funnel()
+    funnel.next_slice(3)
+    funnel.give_back(["U3", "NOT-LISTED"])
+    assert codes(funnel.next_slice(2)) == ["U3", "U4"]
+
+
+def test_promotion_by_ratio_or_move_skips_promoted_symbols_in_slices():
+    funnel, _ = make_funnel()
+    assert funnel.screen("U1", 300, 100, 10.0) == "book ratio 3.00"
+    assert funnel.screen("U2", 100, 100, 10.0) is None
+    assert funnel.screen("U2", 100, 100, 10.2) == "moved +2.0%"
+    assert funnel.screen("U3", 100, 0, 10.0) is None  # no asks: no ratio
+    assert funnel.screen("U0", 900, 100, 10.0) is None  # core symbols are never promoted
+
+    assert codes(funnel.promoted_rows()) == ["U1", "U2"]
+    assert "U1" not in codes(funnel.next_slice(5))
+    stats = funnel.take_stats()
+    assert (stats['screened'], stats['promoted'], stats['promoted_now']) == (5, 2, 2)
+
+
+def test_promotions_are_capped():
+    funnel, _ = make_funnel(max_promoted=1)
+    funnel.screen("U1", 300, 100, 10.0)
+    assert funnel.screen("U2", 300, 100, 10.0) is None
+    assert funnel.take_stats()['capped'] == 1
+
+
+def test_quiet_symbols_are_demoted_after_the_cooldown():
+    funnel, clock = make_funnel()
+    funnel.screen("U1", 300, 100, 10.0)
+    funnel.screen("U2", 300, 100, 10.0)
+    clock.now = 200.0
+    funnel.observe_depth("U1", hot=True)  # restarts U1's cooldown
+    funnel.observe_depth("U2", hot=False)
+    clock.now = 300.0
+    assert funnel.demote_due() == ["U2"]
+    clock.now = 500.0
+    assert funnel.demote_due() == ["U1"]
+    assert funnel.reasons() == {} and funnel.take_stats()['totals']['demoted'] == 2
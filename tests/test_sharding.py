@@ -0,0 +1,59 @@
+"""
+Sharding Tests
+Rendezvous shard assignment (stable, balanced, minimal movement when a
+worker leaves) and a ShardCoordinator round trip with a worker restart.
+"""
+
+from collections import Counter
+
+import pytest
+
+from sharding import ShardCoordinator, partition, shard_owner
+
+ROWS = [[f"EQ{i:04d}", f"id-{i}"] for i in range(2000)]
+
+
+def test_partition_covers_every_row_once_in_input_order():
+    shards = partition(ROWS, [0, 1, 2, 3])
+    assert sorted(row[0] for shard in shards.values() for row in shard) == [row[0] for row in ROWS]
+    for worker_id, shard in shards.items():
+        assert shard == [row for row in ROWS if shard_owner(row[0], [0, 1, 2, 3]) == worker_id]
+    assert partition(ROWS, []) == {}
+
+
+def test_assignment_is_balanced_and_independent_of_worker_order():
+    owners = [shard_owner(row[0], [0, 1, 2, 3]) for row in ROWS]
+    assert owners == [shard_owner(row[0], [3, 1, 0, 2]) for row in ROWS]
+    for count in Counter(owners).values():
+        assert 400 <= count <= 600
+
+
+def test_losing_a_worker_only_moves_its_own_symbols():
+    before = {row[0]: shard_owner(row[0], [0, 1, 2, 3]) for row in ROWS}
+    after = {row[0]: shard_owner(row[0], [0, 1, 3]) for row in ROWS}
+    moved = {code for code in before if before[code] != after[code]}
+    assert moved == {code for code, owner in before.items() if owner == 2}
+    # ...and they all move back when it returns
+    assert {row[0]: shard_owner(row[0], [0, 1, 2, 3]) for row in ROWS} == before
+
+
+@pytest.fixture
+def coordinator():
+    coordinator = ShardCoordinator(2, "shard_cycle", "init", "cycle", init_args=(2,))
+    yield coordinator
+    coordinator.shutdown()
+
+
+def test_coordinator_merges_shards_and_restarts_a_dead_worker(coordinator):
+    rows = ROWS[:40]
+    coordinator.start(ready_timeout=60)
+    assert coordinator.ready_ids() == [0, 1]
+
+    payloads, unserved = coordinator.run_cycle(rows, timeout=30)
+    assert unserved == [] and {p['workers'] for p in payloads} == {2}
+    assert sorted(code for p in payloads for code in p['codes']) == [row[0] for row in rows]
+
+    victim = rows[0][0]
+    payloads, unserved = coordinator.run_cycle(rows, timeout=30, crash=victim)
+    lost = partition(rows, [0, 1])[shard_owner(victim, [0, 1])]
+    assert unserved == lost and coordinator.restarts == 1
@@ -0,0 +1,109 @@
+"""
+Tail-Latency Tests
+hedged_call and hedged_await: the first successful response wins, the
+duplicate is only sent when the budget allows, and a call that can't be
+hedged runs inline on the caller.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+import pytest
+
+from tail_latency import HedgeBudget, LatencyTracker, hedged_await, hedged_call
+
+
+@pytest.fixture
+def executor():
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+    yield executor
+    executor.shutdown(wait=True)
+
+
+def funded_budget(**kwargs):
+    budget = HedgeBudget(max_extra_ratio=1.0, **kwargs)
+    budget.on_primary()  # one hedge token banked
+    return budget
+
+
+def test_unhedgeable_call_runs_inline(executor):
+    threads = []
+
+    def fn(hedge):
+        threads.append(threading.current_thread())
+        return "ok"
+
+    assert hedged_call(executor, fn, None, funded_budget()) == ("ok", False)
+    assert hedged_call(executor, fn, 0.01, HedgeBudget(max_extra_ratio=0.1)) == ("ok", False)
+    assert threads == [threading.current_thread()] * 2
+
+
+def test_slow_primary_loses_to_hedge(executor):
+    release = threading.Event()
+
+    def fn(hedge):
+        if not hedge:
+            release.wait(2)
+            return "primary"
+        return "hedge"
+
+    budget = funded_budget()
+    try:
+        assert hedged_call(executor, fn, 0.01, budget) == ("hedge", True)
+    finally:
+        release.set()
+    stats = budget.take_stats()
+    assert (stats['hedges'], stats['hedge_wins']) == (1, 1)
+
+
+def test_pair_slot_held_until_loser_ends(executor):
+    release = threading.Event()
+
+    def fn(hedge):
+        if not hedge:
+            release.wait(2)
+        return hedge
+
+    budget = funded_budget(max_in_flight=1)
+    hedged_call(executor, fn, 0.01, budget)
+    assert not budget.can_spend()
+    release.set()
+    deadline = time.monotonic() + 2
+    while budget.take_stats()['in_flight'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert budget.take_stats()['in_flight'] == 0
+
+
+def test_extra_check_can_refuse_the_hedge(executor):
+    def fn(hedge):
+        time.sleep(0.05)
+        return hedge
+
+    assert hedged_call(executor, fn, 0.01, funded_budget(), extra_check=lambda: False) == (False, False)
+
+
+def test_hedged_await_cancels_the_loser():
+    started = []
+
+    async def make(hedge):
+        started.append(hedge)
+        await asyncio.sleep(0.001 if hedge else 2)
+        return hedge
+
+    async def run():
+        return await asyncio.wait_for(hedged_await(make, 0.01, funded_budget()), 1)
+
+    assert asyncio.run(run()) == (True, True)
+    assert started == [False, True]
+
+
+def test_timeouts_count_as_at_least_the_timeout():
+    tracker = LatencyTracker(window=10, min_samples=2, timeout_multiplier=2.0, min_timeout=0.1, max_timeout=5.0)
+    assert tracker.timeout_for("A") == 5.0
+    tracker.record("A", 0.2)
+    tracker.record_timeout("A", 0.5, 1.5)
+    assert tracker.percentiles("A") == (0.2, 1.5)
+    assert tracker.timeout_for("A") == 3.0
+    assert tracker.hedge_delay("A") == 1.5
@@ -0,0 +1,69 @@
+"""
+Warm-Up Token Check Tests
+validate_token_on_depth against mock_server: accepted, rate limited,
+rotated past a rejected token and expired once no token is left, and
+run_prep_warmup only ending the check on a definite answer.
+"""
+
+import pytest
+
+from circuit_breaker import BreakerRegistry
+from rate_limiter import AdaptiveRateLimiter
+from token_pool import TokenPool
+
+
+@pytest.fixture
+def warmup(monitor, history_store, monkeypatch, market_server):
+    server = market_server(latency="fixed:0", etags=False, revoked_tokens=["revoked", "startup"],
+                           require_auth=True)
+    monkeypatch.setattr(monitor, "price_depth_url", server.depth_url)
+    monkeypatch.setattr(monitor, "stocks_list", [["EQ1", "id-1"]])
+    monkeypatch.setattr(monitor, "api_limiter", AdaptiveRateLimiter(initial_rate=1e6, max_rate=1e6, burst=1e6))
+    monkeypatch.setattr(monitor, "depth_breakers", BreakerRegistry())
+    monkeypatch.setattr(monitor, "token_pool", TokenPool())
+    monkeypatch.setattr(monitor, "TOKEN", "startup")  # used once every pooled token is retired
+    monkeypatch.setattr(monitor, "token_expired", False)
+    monkeypatch.setattr(monitor, "HEDGED_REQUESTS", False)
+    monkeypatch.setattr(monitor, "TELEGRAM_ENABLED", False)
+    monkeypatch.setattr(monitor, "toaster", None)
+    monkeypatch.setattr(monitor, "prep_warmup", {'token_checked': False, 'snapshots': 0})
+    for name in ("stock_ratios", "signal_scores", "volumes", "analysis_cache", "book_fingerprints",
+                 "book_validators", "scored_at"):
+        monkeypatch.setattr(monitor, name, {})
+    return server
+
+
+def test_accepted_token_seeds_the_first_snapshot(monitor, warmup):
+    monitor.token_pool.update(["good"])
+    assert monitor.validate_token_on_depth() == "ok"
+    assert "EQ1" in monitor.analysis_cache
+
+
+def test_rejected_token_rotates_then_expires_when_none_is_left(monitor, warmup):
+    monitor.token_pool.update(["revoked", "good"])
+    assert monitor.validate_token_on_depth() == "rotated"
+    assert monitor.token_pool.live_count() == 1 and not monitor.token_expired
+    assert monitor.validate_token_on_depth() == "ok"
+
+    monitor.token_pool.update(["revoked"])
+    assert monitor.validate_token_on_depth() == "expired"
+    assert monitor.token_expired
+
+
+def test_rate_limited_check_is_retried_on_the_next_prep_tick(monitor, warmup, monkeypatch):
+    monitor.token_pool.update(["good"])
+    warmup.burst_every, warmup.burst_length = 1e-3, 1e9  # every request answered 429
+    assert monitor.validate_token_on_depth() == "rate_limited"
+
+    # Far from the open, so the warm-up stops after the check
+    monkeypatch.setattr(monitor, "PREP_SEED_SECONDS", -1e9)
+    monitor.run_prep_warmup()
+    assert not monitor.prep_warmup['token_checked']
+    warmup.burst_every = None
+    monitor.run_prep_warmup()  # the resting token is still used when it is the only one
+    assert monitor.prep_warmup['token_checked']
+
+
+def test_no_symbols_is_unreachable(monitor, warmup, monkeypatch):
+    monkeypatch.setattr(monitor, "stocks_list", [])
+    assert monitor.validate_token_on_depth() == "unreachable"
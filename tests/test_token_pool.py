@@ -0,0 +1,85 @@
+"""
+Token Pool Tests
+TokenPool on a fake clock: round-robin rotation, 429 rests with doubling
+cooldowns, 401/403 retirement and pool updates.
+"""
+
+from token_pool import ACTIVE, EXPIRED, THROTTLED, TokenPool, token_label
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_pool(tokens=("tok-a", "tok-b", "tok-c"), **kwargs):
+    clock = FakeClock()
+    seen = []
+    pool = TokenPool(tokens, throttle_cooldown=10, max_cooldown=25, clock=clock,
+                     on_transition=lambda *transition: seen.append(transition), **kwargs)
+    return pool, clock, seen
+
+
+def test_rotation_is_round_robin():
+    pool, _, _ = make_pool()
+    assert [pool.next_token() for _ in range(6)] == ["tok-a", "tok-b", "tok-c"] * 2
+    assert {label: s['requests'] for label, s in pool.stats().items()} == {
+        token_label(token): 2 for token in ("tok-a", "tok-b", "tok-c")}
+
+
+def test_throttled_token_rests_with_doubling_cooldown():
+    pool, clock, seen = make_pool(tokens=("tok-a", "tok-b"))
+    pool.record("tok-a", 429)
+    assert [pool.next_token() for _ in range(3)] == ["tok-b"] * 3
+    assert pool.count(THROTTLED) == 1 and pool.live_count() == 2
+
+    clock.now = 10.0
+    assert pool.count(ACTIVE) == 2
+    pool.record("tok-a", 429)  # second strike in a row: 20s
+    clock.now = 29.0
+    assert pool.count(THROTTLED) == 1
+    clock.now = 30.0
+    assert pool.count(THROTTLED) == 0
+    pool.record("tok-a", 429, retry_after="40")  # capped at max_cooldown
+    clock.now = 54.9
+    assert pool.count(THROTTLED) == 1
+    assert [state for _, _, state, _ in seen] == [THROTTLED, ACTIVE, THROTTLED, ACTIVE, THROTTLED]
+
+
+def test_success_clears_strikes():
+    pool, clock, _ = make_pool()
+    pool.record("tok-a", 429)
+    clock.now = 10.0
+    pool.record("tok-a", 200)
+    pool.record("tok-a", 429)
+    clock.now = 20.0
+    assert pool.count(THROTTLED) == 0  # back to a 10s rest
+
+
+def test_all_resting_uses_the_one_that_recovers_first():
+    pool, clock, _ = make_pool(tokens=("tok-a", "tok-b"))
+    pool.record("tok-a", 429, retry_after="20")
+    pool.record("tok-b", 429, retry_after="5")
+    assert pool.next_token() == "tok-b"
+
+
+def test_rejected_tokens_are_retired_until_replaced():
+    pool, _, _ = make_pool(tokens=("tok-a", "tok-b"))
+    pool.record("tok-a", 401)
+    assert pool.next_token() == "tok-b" and pool.live_count() == 1
+    pool.record("tok-b", 403)
+    assert pool.all_expired and pool.next_token() is None
+
+    pool.update(["tok-b", "tok-new", ""])
+    assert pool.tokens() == ["tok-b", "tok-new"]
+    assert pool.count(EXPIRED) == 1  # still retired while listed
+    assert pool.next_token() == "tok-new"
+    pool.record("unknown", 401)  # tokens no longer in the pool are ignored
+
+
+def test_labels_never_show_the_whole_token():
+    assert token_label("eyJhbGciOiJIUzI1NiJ9.secret-part") == "…t-part"
+    assert token_label(None) == "-"
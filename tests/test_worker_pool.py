@@ -0,0 +1,67 @@
+"""
+Worker Pool Tests
+FetchWorkerPool batches: every job runs once, and cancel_batch at a cycle
+deadline drops the queued jobs while the running ones finish.
+"""
+
+import threading
+
+import pytest
+
+from worker_pool import FetchWorkerPool
+
+
+@pytest.fixture
+def pool():
+    pool = FetchWorkerPool(1, name="test-worker")
+    yield pool
+    pool.shutdown(timeout=2)
+
+
+def test_batch_runs_every_job_and_records_errors(pool):
+    def job(n):
+        if n == 2:
+            raise ValueError("bad symbol")
+
+    batch = pool.submit_batch(job, range(4))
+
+    assert batch.wait(2)
+    assert sorted(n for n, _ in batch.results) == [0, 1, 2, 3]
+    assert [type(error) for n, error in batch.results if error] == [ValueError]
+    assert pool.take_stats()['jobs_done'] == 4
+
+
+def test_empty_batch_is_done_at_once(pool):
+    assert pool.submit_batch(lambda job: None, []).wait(0)
+
+
+def test_cancel_batch_drops_queued_jobs_and_reports_running_ones(pool):
+    started, release = threading.Event(), threading.Event()
+    ran = []
+
+    def job(code):
+        ran.append(code)
+        started.set()
+        release.wait(2)
+
+    batch = pool.submit_batch(job, ["A", "B", "C", "D"])
+    assert started.wait(2)
+
+    assert pool.cancel_batch(batch) == ["A"]
+    assert batch.cancelled and pool.queue_depth() == 0
+    assert batch.pending == 1
+    release.set()
+    assert batch.wait(2)
+    assert ran == ["A"] and [code for code, _ in batch.results] == ["A"]
+
+    # The next cycle's batch is not held up by the cancelled one
+    following = pool.submit_batch(ran.append, ["E"])
+    assert following.wait(2)
+    assert ran == ["A", "E"]
+
+
+def test_cancel_after_completion_changes_nothing(pool):
+    batch = pool.submit_batch(lambda job: None, ["A"])
+    assert batch.wait(2)
+    assert pool.cancel_batch(batch) == []
+    assert batch.pending == 0 and len(batch.results) == 1
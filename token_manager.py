@@ -3,7 +3,7 @@ Token Management System for Stock Analysis
 Captures new tokens from Telegram messages and updates the system automatically.
 """
 
-import requests
+import http_session
 import json
 import time
 import re
@@ -16,6 +16,8 @@ ADMIN_CHAT_ID = "819131470"  # Your chat ID
 
 # File to store the current API token
 TOKEN_FILE = "current_api_token.txt"
+# Extra tokens (other accounts) for the rotation pool, one per line
+TOKENS_FILE = os.environ.get("API_TOKENS_FILE", "api_tokens.txt")
 LAST_UPDATE_FILE = "last_telegram_update.txt"
 
 def get_telegram_updates():
@@ -34,7 +36,7 @@ def get_telegram_updates():
             'timeout': 10
         }
         
-        response = requests.get(url, params=params, timeout=15)
+        response = http_session.get(url, params=params, timeout=15)
         
         if response.status_code == 200:
             data = response.json()
@@ -95,6 +97,38 @@ def load_current_token():
     
     return None
 
+def load_pool_tokens():
+    """Extra pool tokens from TOKENS_FILE (blank lines and # comments skipped)."""
+    tokens = []
+    try:
+        if os.path.exists(TOKENS_FILE):
+            with open(TOKENS_FILE, 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith('#'):
+                        tokens.append(line)
+    except Exception as e:
+        print(f"❌ Error loading token pool: {e}")
+    return tokens
+
+def add_pool_token(token):
+    """Append a token to TOKENS_FILE (no-op if it is already there)."""
+    if token in load_pool_tokens():
+        return True
+    try:
+        with open(TOKENS_FILE, 'a') as f:
+            f.write(token + "\n")
+        print(f"✅ Token added to {TOKENS_FILE}")
+        return True
+    except Exception as e:
+        print(f"❌ Error adding pool token: {e}")
+        return False
+
+def load_token_pool():
+    """Every token to rotate through: the current token first, then TOKENS_FILE, de-duplicated."""
+    current = load_current_token()
+    return list(dict.fromkeys(([current] if current else []) + load_pool_tokens()))
+
 def send_confirmation(message):
     """Send confirmation message back to Telegram."""
     try:
@@ -104,7 +138,7 @@ def send_confirmation(message):
             'text': message,
             'parse_mode': 'HTML'
         }
-        response = requests.post(url, json=payload, timeout=10)
+        response = http_session.post(url, json=payload, timeout=10)
         return response.status_code == 200
     except:
         return False
@@ -138,7 +172,14 @@ def check_for_new_token():
                     # Check if this message contains a token
                     new_token = extract_token_from_message(text)
                     
-                    if new_token:
+                    if new_token and text.strip().upper().startswith('ADD'):
+                        # "ADD TOKEN: ..." adds another account to the rotation pool
+                        if add_pool_token(new_token):
+                            send_confirmation(f"✅ <b>Token added to pool</b>\n\n🔑 {new_token[:20]}...\n"
+                                              f"📊 <b>Pool size:</b> {len(load_token_pool())}")
+                        else:
+                            send_confirmation("❌ Failed to add token to the pool. Please try again.")
+                    elif new_token:
                         # Save the new token
                         if save_token(new_token):
                             # Send confirmation
@@ -0,0 +1,156 @@
+"""
+API Token Pool
+Round-robin rotation over several API tokens (accounts), so requests are
+spread across their rate limits. A token answered with 429 is rested for a
+cooldown and one answered with 401/403 is retired until it is replaced;
+the remaining tokens keep serving.
+"""
+
+import threading
+import time
+
+ACTIVE = "active"
+THROTTLED = "throttled"
+EXPIRED = "expired"
+
+
+def token_label(token):
+    """Short, log-safe name for a token (never log the whole credential)."""
+    return f"…{token[-6:]}" if token else "-"
+
+
+class _TokenState:
+    __slots__ = ("token", "state", "until", "requests", "throttled", "rejected", "strikes")
+
+    def __init__(self, token):
+        self.token = token
+        self.state = ACTIVE
+        self.until = 0.0       # end of the current rest while THROTTLED
+        self.requests = 0
+        self.throttled = 0     # 429 responses
+        self.rejected = 0      # 401/403 responses
+        self.strikes = 0       # consecutive 429s; each one doubles the rest
+
+
+class TokenPool:
+    """
+    Thread-safe token rotation.
+
+    next_token() hands out active tokens round-robin. When every token is
+    resting, the one that recovers first is used anyway (the rate limiter
+    and backoff slow the caller down); None only when all are expired.
+
+    on_transition(label, old_state, new_state, reason) is called outside
+    the lock on every state change.
+    """
+
+    def __init__(self, tokens=(), throttle_cooldown=30.0, max_cooldown=300.0, on_transition=None,
+                 clock=time.monotonic):
+        self.throttle_cooldown = throttle_cooldown
+        self.max_cooldown = max_cooldown
+        self.on_transition = on_transition
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._states = {}      # token -> _TokenState, in rotation order
+        self._cursor = 0
+        self.update(tokens)
+
+    def update(self, tokens):
+        """
+        Make the pool match `tokens`: new ones join as active, ones no longer
+        listed leave. A token that was already retired stays retired.
+        """
+        tokens = [t for t in dict.fromkeys(tokens) if t]
+        with self._lock:
+            self._states = {t: self._states.get(t) or _TokenState(t) for t in tokens}
+
+    def tokens(self):
+        with self._lock:
+            return list(self._states)
+
+    def _refresh(self, now):
+        """Return rested tokens to rotation; collects the transitions to report."""
+        transitions = []
+        for entry in self._states.values():
+            if entry.state == THROTTLED and now >= entry.until:
+                entry.state = ACTIVE
+                transitions.append((token_label(entry.token), THROTTLED, ACTIVE, "cooldown over"))
+        return transitions
+
+    def _notify(self, transitions):
+        if self.on_transition is not None:
+            for transition in transitions:
+                self.on_transition(*transition)
+
+    def next_token(self):
+        with self._lock:
+            transitions = self._refresh(self._clock())
+            entries = list(self._states.values())
+            active = [e for e in entries if e.state == ACTIVE]
+            if active:
+                entry = active[self._cursor % len(active)]
+                self._cursor += 1
+            else:
+                resting = [e for e in entries if e.state == THROTTLED]
+                entry = min(resting, key=lambda e: e.until) if resting else None
+            if entry is not None:
+                entry.requests += 1
+        self._notify(transitions)
+        return entry.token if entry is not None else None
+
+    def record(self, token, status, retry_after=None):
+        """
+        Feed the response status a token got. 429 rests it for Retry-After (or
+        throttle_cooldown), doubled per consecutive 429; 401/403 retires it;
+        anything else clears its strikes.
+        """
+        transition = None
+        with self._lock:
+            entry = self._states.get(token)
+            if entry is None:
+                return
+            if status == 429:
+                entry.throttled += 1
+                entry.strikes += 1
+                base = self.throttle_cooldown
+                try:
+                    base = float(retry_after) if retry_after is not None else base
+                except ValueError:
+                    pass  # HTTP-date form; keep our own cooldown
+                rest = min(self.max_cooldown, base * 2 ** (entry.strikes - 1))
+                entry.until = max(entry.until, self._clock() + rest)
+                if entry.state == ACTIVE:
+                    entry.state = THROTTLED
+                    transition = (token_label(token), ACTIVE, THROTTLED, f"429, resting {rest:.0f}s")
+            elif status in (401, 403):
+                entry.rejected += 1
+                if entry.state != EXPIRED:
+                    transition = (token_label(token), entry.state, EXPIRED, f"HTTP {status}")
+                    entry.state = EXPIRED
+            elif status < 500:
+                entry.strikes = 0
+        if transition is not None:
+            self._notify([transition])
+
+    def count(self, state):
+        with self._lock:
+            transitions = self._refresh(self._clock())
+            n = sum(1 for e in self._states.values() if e.state == state)
+        self._notify(transitions)
+        return n
+
+    def live_count(self):
+        """Tokens not retired (active or resting)."""
+        with self._lock:
+            return sum(1 for e in self._states.values() if e.state != EXPIRED)
+
+    @property
+    def all_expired(self):
+        return self.live_count() == 0
+
+    def stats(self):
+        """label -> {'state', 'requests', 'throttled', 'rejected'} per token, cumulative."""
+        with self._lock:
+            return {token_label(e.token): {'state': e.state, 'requests': e.requests,
+                                           'throttled': e.throttled, 'rejected': e.rejected}
+                    for e in self._states.values()}
@@ -0,0 +1,199 @@
+"""
+Persistent Fetch Worker Pool
+Long-lived worker threads that accept one batch of fetch jobs per trading cycle.
+"""
+
+import queue
+import threading
+import time
+
+_STOP = object()  # sentinel telling a worker to exit
+
+
+class Batch:
+    """
+    Handle for one submitted batch of jobs.
+
+    A cancelled batch starts no more jobs: queued ones are dropped without a
+    result, and jobs already running finish normally.
+    """
+
+    def __init__(self, jobs):
+        self.jobs = list(jobs)
+        self.results = []          # (job, exception or None) in completion order
+        self.cancelled = False
+        self._remaining = len(self.jobs)
+        self._running = set()      # indexes of jobs a worker has started
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        if not self.jobs:
+            self._done.set()
+
+    def _finish_one(self):
+        self._remaining -= 1
+        if self._remaining == 0:
+            self._done.set()
+
+    def _start(self, index):
+        """Claim job `index` for a worker; False (and the job is dropped) once the batch is cancelled."""
+        with self._lock:
+            if self.cancelled:
+                self._finish_one()
+                return False
+            self._running.add(index)
+            return True
+
+    def _complete(self, index, error):
+        with self._lock:
+            self._running.discard(index)
+            self.results.append((self.jobs[index], error))
+            self._finish_one()
+
+    def _drop(self, count):
+        """`count` queued jobs were removed without running."""
+        with self._lock:
+            for _ in range(count):
+                self._finish_one()
+
+    def cancel(self):
+        """Start no more jobs of this batch (see FetchWorkerPool.cancel_batch)."""
+        with self._lock:
+            self.cancelled = True
+
+    def in_flight(self):
+        """Jobs started but not finished yet."""
+        with self._lock:
+            return [self.jobs[i] for i in self._running]
+
+    @property
+    def pending(self):
+        with self._lock:
+            return self._remaining
+
+    def wait(self, timeout=None):
+        """Block until every job finished; returns False if `timeout` elapsed first."""
+        return self._done.wait(timeout)
+
+
+class FetchWorkerPool:
+    """
+    Fixed set of daemon threads fed from a single job queue.
+
+    Threads are started once (PREP phase) and reused for every cycle, so
+    thread creation and per-thread warm-up happen once per session.
+    """
+
+    def __init__(self, num_workers, name="fetch-worker"):
+        self.num_workers = num_workers
+        self.name = name
+        self._queue = queue.Queue()
+        self._threads = []
+        self._stats_lock = threading.Lock()
+        self._busy = 0
+        self._busy_seconds = 0.0
+        self._jobs_done = 0
+        self._peak_queue_depth = 0
+        self._window_start = time.monotonic()
+
+    @property
+    def running(self):
+        return bool(self._threads)
+
+    def start(self):
+        if self._threads:
+            return
+        for i in range(self.num_workers):
+            t = threading.Thread(target=self._worker, name=f"{self.name}-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        self._window_start = time.monotonic()
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch, fn, index = item
+            if not batch._start(index):
+                continue  # cancelled at its deadline; a later batch fetches the symbol again
+            started = time.monotonic()
+            with self._stats_lock:
+                self._busy += 1
+            error = None
+            try:
+                fn(batch.jobs[index])
+            except Exception as e:
+                error = e
+            finally:
+                with self._stats_lock:
+                    self._busy -= 1
+                    self._busy_seconds += time.monotonic() - started
+                    self._jobs_done += 1
+                batch._complete(index, error)
+
+    def submit_batch(self, fn, jobs):
+        """Queue fn(job) for every job and return a Batch to wait on."""
+        if not self._threads:
+            self.start()
+        batch = Batch(jobs)
+        for index in range(len(batch.jobs)):
+            self._queue.put((batch, fn, index))
+        with self._stats_lock:
+            self._peak_queue_depth = max(self._peak_queue_depth, self._queue.qsize())
+        return batch
+
+    def cancel_batch(self, batch):
+        """
+        Cancel `batch` and take its queued jobs out of the queue, so they
+        neither run in later cycles nor hold up later batches.
+
+        Returns:
+            list: jobs still running (they finish; their symbols are in flight)
+        """
+        batch.cancel()
+        with self._queue.mutex:
+            kept = [item for item in self._queue.queue if item is _STOP or item[0] is not batch]
+            dropped = len(self._queue.queue) - len(kept)
+            self._queue.queue.clear()
+            self._queue.queue.extend(kept)
+        batch._drop(dropped)
+        return batch.in_flight()
+
+    def queue_depth(self):
+        """Jobs waiting for a free worker."""
+        return self._queue.qsize()
+
+    def take_stats(self):
+        """
+        Return sizing stats for the window since the previous call and start a new window.
+
+        utilization is busy worker-seconds / (window seconds * workers).
+        """
+        now = time.monotonic()
+        with self._stats_lock:
+            window = max(now - self._window_start, 1e-9)
+            stats = {
+                'workers': self.num_workers,
+                'busy': self._busy,
+                'queue_depth': self._queue.qsize(),
+                'peak_queue_depth': self._peak_queue_depth,
+                'jobs_done': self._jobs_done,
+                'utilization': min(1.0, self._busy_seconds / (window * self.num_workers)),
+            }
+            self._busy_seconds = 0.0
+            self._jobs_done = 0
+            self._peak_queue_depth = self._queue.qsize()
+            self._window_start = now
+        return stats
+
+    def shutdown(self, wait=True, timeout=10):
+        """Let queued jobs drain, then stop every worker."""
+        if not self._threads:
+            return
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        if wait:
+            deadline = time.monotonic() + timeout
+            for t in self._threads:
+                t.join(max(0, deadline - time.monotonic()))
+        self._threads = []